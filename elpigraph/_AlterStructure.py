@@ -5,8 +5,10 @@ import copy
 import warnings
 from .src.graphs import ConstructGraph, GetSubGraph, GetBranches
 from .src.core import PartitionData
+from .src.autotune import TunedBlockSize
 from .src.distutils import PartialDistance
 from .src.reporting import project_point_onto_graph, project_point_onto_edge
+from .src.datacontext import GetSquaredX
 
 
 def ExtendLeaves(
@@ -18,6 +20,9 @@ def ExtendLeaves(
     DoSA_maxiter=2000,
     LeafIDs=None,
     TrimmingRadius=float("inf"),
+    PartData=None,
+    SquaredX=None,
+    DataContext=None,
     # PlotSelected=False,
 ):
     """
@@ -31,6 +36,11 @@ def ExtendLeaves(
     #' @param DoSA bollean, should optimization (via simulated annealing) be performed when Mode = "QuantDists"?
     #' @param Mode string, the mode used to extend the graph. "QuantCentroid" and "WeigthedCentroid" are currently implemented
     #' @param PlotSelected boolean, should a diagnostic plot be visualized
+    #' @param PartData tuple (partition, dists) of X on the nodes of PG computed with TrimmingRadius (e.g., PG["PartData"]).
+    #' If None, it will be computed
+    #' @param SquaredX rowSums(X^2) (e.g., PG["SquaredX"]), used if PartData has to be computed. If None, it will be computed
+    #' @param DataContext a dataset context created by MakeDataContext on X. If given, its cached rowSums(X^2)
+    #' are used when the partition has to be computed
     #'
     #' @return The extended ElPiGraph structure
     #'
@@ -88,13 +98,19 @@ def ExtendLeaves(
     NodesMat = np.hstack((LeafIDs[:, None], NeiVect[:, None]))
 
     # project data on the nodes
-    PD = PartitionData(
-        X=X,
-        NodePositions=TargetPG["NodePositions"],
-        MaxBlockSize=10000000,
-        TrimmingRadius=TrimmingRadius,
-        SquaredX=np.sum(X ** 2, axis=1, keepdims=1),
-    )
+    if PartData is None:
+        if SquaredX is None and DataContext is not None:
+            SquaredX = GetSquaredX(DataContext)
+        elif SquaredX is None:
+            SquaredX = np.sum(X ** 2, axis=1, keepdims=1)
+        PartData = PartitionData(
+            X=X,
+            NodePositions=TargetPG["NodePositions"],
+            MaxBlockSize=TunedBlockSize(),
+            TrimmingRadius=TrimmingRadius,
+            SquaredX=SquaredX,
+        )
+    PD = PartData
 
     # Keep track of the new nodes IDs
     NodeID = len(TargetPG["NodePositions"]) - 1
@@ -278,6 +294,8 @@ def ExtendLeaves(
     except:
         pass
     TargetPG["NodePositions"] = np.vstack((TargetPG["NodePositions"], NNPos))
+    # the partition of the original graph is not valid anymore
+    TargetPG.pop("PartData", None)
     TargetPG["Edges"] = [
         np.vstack((TargetPG["Edges"][0], NEdgs)),  # edges
         np.append(TargetPG["Edges"][1], np.repeat(np.nan, len(NEdgs))),  # lambdas
@@ -308,7 +326,14 @@ def ExtendLeaves(
 
 
 def CollapseBranches(
-    X, PG, Mode="PointNumber", ControlPar=5, TrimmingRadius=float("inf")
+    X,
+    PG,
+    Mode="PointNumber",
+    ControlPar=5,
+    TrimmingRadius=float("inf"),
+    PartData=None,
+    SquaredX=None,
+    DataContext=None,
 ):
     """
     #' Filter "small" branches 
@@ -320,6 +345,11 @@ def CollapseBranches(
     #' @param Mode string, the mode used to extend the graph. "PointNumber", "PointNumber_Extrema", "PointNumber_Leaves",
     #' "EdgesNumber", and "EdgesLength" are currently implemented
     #' @param PlotSelected boolean, should a diagnostic plot be visualized (currently not implemented)
+    #' @param PartData tuple (partition, dists) of X on the nodes of PG computed with TrimmingRadius (e.g., PG["PartData"]).
+    #' If None, it will be computed
+    #' @param SquaredX rowSums(X^2) (e.g., PG["SquaredX"]), used if PartData has to be computed. If None, it will be computed
+    #' @param DataContext a dataset context created by MakeDataContext on X. If given, its cached rowSums(X^2)
+    #' are used when the partition has to be computed
     #'
     #' @return a list with 2 values: Nodes (a matrix containing the new nodes positions) and Edges (a matrix describing the new edge structure)
     #'
@@ -352,13 +382,19 @@ def CollapseBranches(
     Leaves = np.where(np.array(Net.degree(mode="all")) == 1)[0]
 
     # get the partition
-    PartStruct = PartitionData(
-        X=X,
-        NodePositions=TargetPG["NodePositions"],
-        MaxBlockSize=100000000,
-        TrimmingRadius=TrimmingRadius,
-        SquaredX=np.sum(X ** 2, axis=1, keepdims=1),
-    )
+    if PartData is None:
+        if SquaredX is None and DataContext is not None:
+            SquaredX = GetSquaredX(DataContext)
+        elif SquaredX is None:
+            SquaredX = np.sum(X ** 2, axis=1, keepdims=1)
+        PartData = PartitionData(
+            X=X,
+            NodePositions=TargetPG["NodePositions"],
+            MaxBlockSize=TunedBlockSize(),
+            TrimmingRadius=TrimmingRadius,
+            SquaredX=SquaredX,
+        )
+    PartStruct = PartData
 
     # Project points onto the graph
     ProjStruct = project_point_onto_graph(
@@ -659,6 +695,9 @@ def ShiftBranching(
     Compensate=False,
     BrIds=None,
     TrimmingRadius=float("inf"),
+    PartData=None,
+    SquaredX=None,
+    DataContext=None,
 ):
     """
     #' Move branching nodes to areas with higher point density
@@ -671,6 +710,11 @@ def ShiftBranching(
     #' @param MaxShift positive integer, the maxium distance (as number of edges) to consider when exploring the branching point neighborhood
     #' @param Compensate booelan, should new points be included to compensate for olter one being removed (currently not implemented)
     #' @param BrIds integer vector, the id of the branching points to consider. Id not associted with node possessing degree > 2 will be ignored
+    #' @param PartData tuple (partition, dists) of X on the nodes of PG computed with TrimmingRadius (e.g., PG["PartData"]).
+    #' If None, it will be computed
+    #' @param SquaredX rowSums(X^2) (e.g., PG["SquaredX"]), used if PartData has to be computed. If None, it will be computed
+    #' @param DataContext a dataset context created by MakeDataContext on X. If given, its cached rowSums(X^2)
+    #' are used when the partition has to be computed
     #'
     #' @return a list with two components: NodePositions (Containing the new nodes positions) and Edges (containing the new edges)
     #'
@@ -691,13 +735,19 @@ def ShiftBranching(
     else:
         BrIds = set(BrIds).intersection(BrPoints)
 
-    PD = PartitionData(
-        X=X,
-        NodePositions=TargetPG["NodePositions"],
-        MaxBlockSize=100000000,
-        TrimmingRadius=TrimmingRadius,
-        SquaredX=np.sum(X ** 2, axis=1, keepdims=1),
-    )
+    if PartData is None:
+        if SquaredX is None and DataContext is not None:
+            SquaredX = GetSquaredX(DataContext)
+        elif SquaredX is None:
+            SquaredX = np.sum(X ** 2, axis=1, keepdims=1)
+        PartData = PartitionData(
+            X=X,
+            NodePositions=TargetPG["NodePositions"],
+            MaxBlockSize=TunedBlockSize(),
+            TrimmingRadius=TrimmingRadius,
+            SquaredX=SquaredX,
+        )
+    PD = PartData
 
     for br in BrIds:
 
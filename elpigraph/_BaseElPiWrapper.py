@@ -1,4 +1,5 @@
 import numpy as np
+import functools
 
 try:
     import cupy
@@ -8,10 +9,70 @@ from ._topologies import generateInitialConfiguration
 from .src.distutils import PartialDistance
 from .src.core import (
     Encode2ElasticMatrix,
+    PartitionData,
     PrimitiveElasticGraphEmbedment,
     PrimitiveElasticGraphEmbedment_cp,
 )
-from .src.BaseElPi import computeElasticPrincipalGraph
+from .src.BaseElPi import computeElasticPrincipalGraph, computeMultiresolutionGraph
+from .src.datacontext import CheckDataContext, GetSquaredX
+from .src.executors import (
+    MakeExecutor,
+    CloseExecutor,
+    ExecutorBroadcast,
+    ExecutorMap,
+    ReleaseBroadcasts,
+)
+from .src.scheduler import PlanWorkers
+from .src.autotune import GetAutotune, TunedBlockSize
+
+
+def _ComputeReplica(X, SelPoints, GraphSeed, DataContext, Multiresolution, Parameters):
+    """
+    # Construct the graph of a replica on the points SelPoints of X, the global random state
+    # being seeded with GraphSeed (if not None)
+    """
+    if GraphSeed is not None:
+        np.random.seed(GraphSeed)
+    if Multiresolution is None:
+        ComputeGraph = computeElasticPrincipalGraph
+    else:
+        ComputeGraph = functools.partial(
+            computeMultiresolutionGraph,
+            Levels=Multiresolution[0],
+            RepairSteps=Multiresolution[1],
+        )
+    return ComputeGraph(
+        Data=X[SelPoints, :],
+        DataContext=DataContext if np.all(SelPoints) else None,
+        **Parameters
+    )
+
+
+def _ReplicaNodeWeights(Graphs, Contexts):
+    """
+    # Number of points of the full data associated with each node of the replicas, the data
+    # of a replica being the context of its subset
+    """
+    return np.concatenate(
+        [
+            np.bincount(
+                PartitionData(
+                    Contexts[G["SubSetID"]]["X"],
+                    G["NodePositions"],
+                    TunedBlockSize(),
+                    GetSquaredX(Contexts[G["SubSetID"]]),
+                )[0].ravel(),
+                minlength=len(G["NodePositions"]),
+            )
+            for G in Graphs
+        ]
+    ).astype(float)
+
+
+def _ReplicaTask(Task, Shared):
+    Columns, SelPoints, GraphSeed, Multiresolution, Parameters = Task
+    X = Shared["X"][:, Columns]
+    return _ComputeReplica(X, SelPoints, GraphSeed, None, Multiresolution, Parameters)
 
 
 def computeElasticPrincipalGraphWithGrammars(
@@ -39,14 +100,18 @@ def computeElasticPrincipalGraphWithGrammars(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     #                                             drawAccuracyComplexity = True,
     #                                             drawPCAView = True,
     #                                             drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     nReps=1,
-    #                                              ParallelRep = False,
+    ParallelRep="auto",
+    ReplicaSeed=None,
+    ConsensusMode="Full",
+    ConsensusSteps=2,
     Subsets=list(),
     ProbPoint=1,
     Mode=1,
@@ -68,6 +133,36 @@ def computeElasticPrincipalGraphWithGrammars(
     DisplayWarnings=True,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    MultiresolutionLevels=None,
+    MultiresolutionSteps=1,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
 
     """
@@ -95,14 +190,28 @@ def computeElasticPrincipalGraphWithGrammars(
     #' @param ShowTimer boolean, should the time to construct the graph be computed and reported for each step?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If NULL all the components will be used
+    #' @param PCAAlgorithm string, the PCA of the dimensionality reduction when ReduceDimension is a fraction of variance or
+    #' retains more than 75% of the components, and of the "Density" initial configuration: "randomized" (see RandomizedPCA,
+    #' without the covariance matrix) or "full" (eigendecomposition of the covariance matrix)
     #' @param drawAccuracyComplexity boolean, should the accuracy VS complexity plot be reported?
     #' @param drawPCAView boolean, should a 2D plot of the points and pricipal curve be dranw for the final configuration?
     #' @param drawEnergy boolean, should changes of evergy VS the number of nodes be reported?
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param nReps integer, number of replica of the construction 
+    #' @param ParallelRep boolean or "auto", should parallel execution be performed on the replicas instead of the the grammar evaluations?
+    #' If True, the graphs of the replicas (and subsets) are constructed by a pool of n_cores processes sharing X, each using a single core.
+    #' "auto" uses the replicas when there are at least n_cores of them (never with GPU). The result does not depend on this parameter
+    #' @param ReplicaSeed integer, seed of the independent random streams of the replicas (one stream per replica and subset, used
+    #' to select the points and construct the graph). If None, it is drawn from the global random state
+    #' @param ConsensusMode string, how the consensus graph of the replicas (nReps > 1) is constructed. "Full" constructs a new graph
+    #' on the nodes of all the replicas. "Local" starts from the replica of lowest energy and only applies ConsensusSteps grammar
+    #' repair steps, the nodes of the replicas being weighted by the number of points they are associated with (returned in
+    #' ConsensusWeights)
+    #' @param ConsensusSteps integer, number of grammar repair steps of the "Local" consensus (0 only refits the node positions)
     #' @param ProbPoint real between 0 and 1, probability of inclusing of a single point for each computation
     #' @param Subsets list of column names (or column number). When specified a principal tree will be computed for each of the subsets specified.
     #' @param NumEdges integer, the maximum nulber of edges
@@ -139,6 +248,75 @@ def computeElasticPrincipalGraphWithGrammars(
     #' @param GrammarOrder character vector, the order of application of the grammars. It can be any combination of "Grow" and "Shrink"
     #' @param AvoidResampling booleand, should the sampling of initial conditions avoid reselecting the same points
     #' (or points neighbors if DensityRadius is specified)?
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param MultiresolutionLevels increasing integer vector or None. If not None, the graph is grown on a fixed random subsample of
+    #' MultiresolutionLevels[0] points and then refitted on the larger subsamples and finally on all the points, using only
+    #' MultiresolutionSteps grammar optimization steps per level (see computeMultiresolutionGraph)
+    #' @param MultiresolutionSteps integer, number of grammar optimization steps on each level after the first one (0 to only refit the nodes)
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, it replaces the
+    #' pool of n_cores processes: the replicas are constructed by the executor if ParallelRep (with its number of workers instead of
+    #' n_cores for "auto"), and the candidate embedments otherwise. The data is broadcast once to its workers per construction
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return A list of principal graph strucutures containing the trees constructed during the different replica of the algorithm.
     #' If the number of replicas is larger than 1. The the final element of the list is the "average tree", which is constructed by
@@ -149,12 +327,28 @@ def computeElasticPrincipalGraphWithGrammars(
     #'
     #'
     """
+    if (CheckpointFile is not None or ResumeFrom is not None) and (
+        nReps > 1 or len(Subsets) > 1 or MultiresolutionLevels is not None
+    ):
+        raise ValueError(
+            "Checkpoints can only be used for the construction of a single graph (nReps = 1, one subset, no MultiresolutionLevels)"
+        )
+
+    if ParallelRep is True and GPU:
+        raise ValueError("Replicas cannot be constructed in parallel on the GPU")
+
+    if ConsensusMode not in ("Full", "Local"):
+        raise ValueError("Consensus mode " + str(ConsensusMode) + " is not defined")
+
     # Be default we are using a predefined initial configuration
     ComputeIC = False
 
     # Generate a dummy subset is not specified
     if Subsets == list():
         Subsets = [np.array(range(X.shape[1]))]
+        InputContext = DataContext
+    else:
+        InputContext = None
 
     # Prepare the list to be returned
     ReturnList = list()
@@ -162,12 +356,39 @@ def computeElasticPrincipalGraphWithGrammars(
     # Copy the original matrix, this is needed in case of subsetting
     Base_X = X.copy()
 
+    nGraphs = nReps * len(Subsets)
+    if Executor is None:
+        Plan = PlanWorkers(X, NumNodes, nGraphs, n_cores, MemoryBudget)
+        nWorkers = Plan["Workers"]
+    else:
+        nWorkers = Executor["n_cores"]
+    if ParallelRep == "auto":
+        ParallelRep = (
+            nWorkers > 1
+            and nGraphs >= (n_cores if Executor is None else nWorkers)
+            and not GPU
+        )
+
+    # independent and reproducible random streams of the replicas, so that the
+    # result does not depend on the order in which the replicas are constructed
+    if nGraphs > 1:
+        if ReplicaSeed is None:
+            ReplicaSeed = np.random.randint(np.iinfo(np.int32).max)
+        Streams = np.random.SeedSequence(ReplicaSeed).spawn(nGraphs)
+        GlobalState = np.random.get_state()
+
+    # graphs to be constructed, as (subset, replica, selected points, seed, parameters)
+    Replicas = []
+    Contexts = []
+
     # For each subset
     for j in range(len(Subsets)):
 
         # Generate the appropriate matrix
         X = Base_X[:, Subsets[j]]
-        SquaredX = np.sum(X ** 2, axis=1, keepdims=1)
+        DataContext = CheckDataContext(InputContext, X)
+        Contexts.append(DataContext)
+        SquaredX = GetSquaredX(DataContext)
         if GPU:
             Xcp = cupy.asarray(X)
             SquaredXcp = Xcp.sum(axis=1, keepdims=1)
@@ -181,9 +402,15 @@ def computeElasticPrincipalGraphWithGrammars(
 
         for i in range(nReps):
 
+            if nGraphs > 1:
+                SetupSeed, GraphSeed = Streams[j * nReps + i].generate_state(2)
+                np.random.seed(SetupSeed)
+            else:
+                GraphSeed = None
+
             # Select the points to be used
             if ProbPoint < 1 and ProbPoint > 0:
-                SelPoints = np.random.uniform(len(X)) <= ProbPoint
+                SelPoints = np.random.uniform(size=len(X)) <= ProbPoint
             else:
                 SelPoints = np.array([True] * len(X))
 
@@ -204,6 +431,7 @@ def computeElasticPrincipalGraphWithGrammars(
                             Nodes=InitNodes,
                             Configuration=Configuration,
                             DensityRadius=DensityRadius,
+                            PCAAlgorithm=PCAAlgorithm,
                             verbose=verbose,
                         )
 
@@ -227,6 +455,7 @@ def computeElasticPrincipalGraphWithGrammars(
                             Nodes=InitNodes,
                             Configuration=Configuration,
                             DensityRadius=DensityRadius,
+                            PCAAlgorithm=PCAAlgorithm,
                             verbose=verbose,
                         )
 
@@ -237,6 +466,7 @@ def computeElasticPrincipalGraphWithGrammars(
                             Nodes=InitNodes,
                             Configuration=Configuration,
                             DensityRadius=DensityRadius,
+                            PCAAlgorithm=PCAAlgorithm,
                             verbose=verbose,
                         )
 
@@ -261,6 +491,7 @@ def computeElasticPrincipalGraphWithGrammars(
                             Nodes=InitNodes,
                             Configuration=Configuration,
                             DensityRadius=DensityRadius,
+                            PCAAlgorithm=PCAAlgorithm,
                             verbose=verbose,
                         )
 
@@ -309,6 +540,127 @@ def computeElasticPrincipalGraphWithGrammars(
             #    Intermediate_drawAccuracyComplexity = False
             #    Intermediate_drawEnergy = False
 
+            # Parameters of the construction (the graph is constructed below)
+            Parameters = dict(
+                NumNodes=NumNodes,
+                NumEdges=NumEdges,
+                InitNodePositions=InitNodePositions,
+                InitEdges=InitEdges,
+                ElasticMatrix=ElasticMatrix,
+                AdjustVect=AdjustVect,
+                GrowGrammars=GrowGrammars,
+                ShrinkGrammars=ShrinkGrammars,
+                GrammarOptimization=GrammarOptimization,
+                MaxSteps=MaxSteps,
+                GrammarOrder=GrammarOrder,
+                MaxNumberOfIterations=MaxNumberOfIterations,
+                TrimmingRadius=TrimmingRadius,
+                eps=eps,
+                Lambda=Lambda,
+                Mu=Mu,
+                Do_PCA=Do_PCA,
+                CenterData=CenterData,
+                ComputeMSEP=ComputeMSEP,
+                verbose=verbose,
+                ShowTimer=ShowTimer,
+                ReduceDimension=ReduceDimension,
+                PCAAlgorithm=PCAAlgorithm,
+                Mode=Mode,
+                FinalEnergy=FinalEnergy,
+                alpha=alpha,
+                beta=beta,  # gamma = gamma,
+                # drawAccuracyComplexity = Intermediate_drawAccuracyComplexity,
+                # drawPCAView = Intermediate_drawPCAView,
+                # drawEnergy = Intermediate_drawEnergy,
+                n_cores=n_cores,
+                # ClusType = ClusType,
+                MinParOp=MinParOp,
+                # FastSolve = FastSolve,
+                AvoidSolitary=AvoidSolitary,
+                EmbPointProb=EmbPointProb,
+                AdjustElasticMatrix=AdjustElasticMatrix,
+                AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
+                Lambda_Initial=Lambda_Initial,
+                Mu_Initial=Mu_Initial,
+                DisplayWarnings=DisplayWarnings,
+                StoreGraphEvolution=StoreGraphEvolution,
+                GPU=GPU,
+                Autotune=Autotune,
+                MemoryBudget=MemoryBudget,
+                Executor=Executor,
+                FastPath=FastPath,
+                CheckpointFile=CheckpointFile,
+                CheckpointEvery=CheckpointEvery,
+                ResumeFrom=ResumeFrom,
+                TimeBudget=TimeBudget,
+                MaxEvaluations=MaxEvaluations,
+                StoppingRule=StoppingRule,
+                StoppingWindow=StoppingWindow,
+                StoppingThreshold=StoppingThreshold,
+                HeldOutFraction=HeldOutFraction,
+                TopologyMemo=TopologyMemo,
+                GrowthBatch=GrowthBatch,
+                GrowthBatchAdaptive=GrowthBatchAdaptive,
+                ScreeningSize=ScreeningSize,
+                ScreeningFinalists=ScreeningFinalists,
+                ScreeningGap=ScreeningGap,
+                ShortlistSize=ShortlistSize,
+                ShortlistDiagnostics=ShortlistDiagnostics,
+                LazyGreedy=LazyGreedy,
+                LazyGreedyHops=LazyGreedyHops,
+                LazyGreedyMaxAge=LazyGreedyMaxAge,
+                Speculation=Speculation,
+                SpeculationStart=SpeculationStart,
+                PartitionStrategy=PartitionStrategy,
+            )
+            Replicas.append((j, i, SelPoints, GraphSeed, Parameters))
+
+            # Reset InitNodePositions for the next iteration
+            if ComputeIC:
+                InitNodePositions = None
+
+    if MultiresolutionLevels is None:
+        Multiresolution = None
+    else:
+        Multiresolution = (MultiresolutionLevels, MultiresolutionSteps)
+
+    if ParallelRep:
+        if verbose:
+            print("Constructing", nGraphs, "graphs on", nWorkers, "cores")
+        if Autotune:
+            # the workers inherit the configuration instead of running the benchmarks
+            GetAutotune()
+        if Executor is None:
+            RepExecutor = MakeExecutor(
+                "multiprocessing", nWorkers, BLASThreads=Plan["BLASThreads"]
+            )
+        else:
+            RepExecutor = Executor
+        try:
+            Graphs = ExecutorMap(
+                RepExecutor,
+                _ReplicaTask,
+                [
+                    (
+                        Subsets[j],
+                        SelPoints,
+                        GraphSeed,
+                        Multiresolution,
+                        dict(Parameters, n_cores=1, Executor=None),
+                    )
+                    for j, i, SelPoints, GraphSeed, Parameters in Replicas
+                ],
+                ExecutorBroadcast(RepExecutor, dict(X=Base_X)),
+                ChunkSize=1,
+            )
+        finally:
+            if Executor is None:
+                CloseExecutor(RepExecutor)
+            else:
+                ReleaseBroadcasts(RepExecutor)
+    else:
+        Graphs = []
+        for j, i, SelPoints, GraphSeed, Parameters in Replicas:
             if verbose:
                 print(
                     "Constructing tree",
@@ -320,66 +672,100 @@ def computeElasticPrincipalGraphWithGrammars(
                     "of",
                     len(Subsets),
                 )
-            # Run the ElPiGraph algorithm
-            ReturnList.append(
-                computeElasticPrincipalGraph(
-                    Data=X[SelPoints, :],
-                    NumNodes=NumNodes,
-                    NumEdges=NumEdges,
-                    InitNodePositions=InitNodePositions,
-                    InitEdges=InitEdges,
-                    ElasticMatrix=ElasticMatrix,
-                    AdjustVect=AdjustVect,
-                    GrowGrammars=GrowGrammars,
-                    ShrinkGrammars=ShrinkGrammars,
-                    GrammarOptimization=GrammarOptimization,
-                    MaxSteps=MaxSteps,
-                    GrammarOrder=GrammarOrder,
-                    MaxNumberOfIterations=MaxNumberOfIterations,
-                    TrimmingRadius=TrimmingRadius,
-                    eps=eps,
-                    Lambda=Lambda,
-                    Mu=Mu,
-                    Do_PCA=Do_PCA,
-                    CenterData=CenterData,
-                    ComputeMSEP=ComputeMSEP,
-                    verbose=verbose,
-                    ShowTimer=ShowTimer,
-                    ReduceDimension=ReduceDimension,
-                    Mode=Mode,
-                    FinalEnergy=FinalEnergy,
-                    alpha=alpha,
-                    beta=beta,  # gamma = gamma,
-                    # drawAccuracyComplexity = Intermediate_drawAccuracyComplexity,
-                    # drawPCAView = Intermediate_drawPCAView,
-                    # drawEnergy = Intermediate_drawEnergy,
-                    n_cores=n_cores,
-                    # ClusType = ClusType,
-                    MinParOp=MinParOp,
-                    # FastSolve = FastSolve,
-                    AvoidSolitary=AvoidSolitary,
-                    EmbPointProb=EmbPointProb,
-                    AdjustElasticMatrix=AdjustElasticMatrix,
-                    AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
-                    Lambda_Initial=Lambda_Initial,
-                    Mu_Initial=Mu_Initial,
-                    DisplayWarnings=DisplayWarnings,
-                    StoreGraphEvolution=StoreGraphEvolution,
-                    GPU=GPU,
+            Graphs.append(
+                _ComputeReplica(
+                    Base_X[:, Subsets[j]],
+                    SelPoints,
+                    GraphSeed,
+                    Contexts[j],
+                    Multiresolution,
+                    Parameters,
                 )
             )
 
-            # Save extra information
-            ReturnList[-1]["SubSetID"] = j
-            ReturnList[-1]["ReplicaID"] = i
-            ReturnList[-1]["ProbPoint"] = ProbPoint
+    for (j, i, SelPoints, GraphSeed, Parameters), Graph in zip(Replicas, Graphs):
+        ReturnList.append(Graph)
 
-            # Reset InitNodePositions for the next iteration
-            if ComputeIC:
-                InitNodePositions = None
+        # Save extra information
+        ReturnList[-1]["SubSetID"] = j
+        ReturnList[-1]["ReplicaID"] = i
+        ReturnList[-1]["ProbPoint"] = ProbPoint
+        if ProbPoint < 1 and ProbPoint > 0:
+            # the partition refers to the selected points only
+            ReturnList[-1]["PartData"] = None
+            ReturnList[-1]["SquaredX"] = None
+
+    if nGraphs > 1:
+        np.random.set_state(GlobalState)
 
     # Are we using bootstrapping (nReps > 1). If yes we compute the consensus tree
-    if nReps > 1:
+    if nReps > 1 and ConsensusMode == "Local":
+        if verbose:
+            print("Repairing the best tree on the nodes of the replicas")
+
+        # each node of the replicas is weighted by the number of points associated with it
+        AllPoints = np.concatenate(([i["NodePositions"] for i in ReturnList]))
+        Weights = _ReplicaNodeWeights(ReturnList, Contexts)
+
+        # the replica of lowest energy is the starting point of a few local grammar repair steps
+        Best = ReturnList[
+            int(np.argmin([float(i["FinalReport"]["ENERGY"]) for i in ReturnList]))
+        ]
+        nBest = len(Best["NodePositions"])
+        # a repair step pairs a growing and a shrinking grammar, so that the number of nodes is kept
+        nPairs = min(len(GrowGrammars), len(ShrinkGrammars))
+        if nPairs == 0:
+            ConsensusSteps = 0
+
+        # the consensus is fitted serially on the few nodes of the replicas, without the budgets,
+        # checkpoints and accelerations of the replicas
+        ReturnList.append(
+            computeElasticPrincipalGraph(
+                Data=AllPoints,
+                NumNodes=nBest,
+                InitNodePositions=Best["NodePositions"],
+                InitEdges=None,
+                ElasticMatrix=Best["ElasticMatrix"],
+                AdjustVect=[False] * nBest,
+                GrowGrammars=GrowGrammars[:nPairs],
+                ShrinkGrammars=ShrinkGrammars[:nPairs],
+                GrammarOrder=["Grow", "Shrink"],
+                GrammarOptimization=ConsensusSteps > 0,
+                MaxSteps=ConsensusSteps,
+                MaxNumberOfIterations=MaxNumberOfIterations,
+                TrimmingRadius=TrimmingRadius,
+                eps=eps,
+                Lambda=Lambda,
+                Mu=Mu,
+                Do_PCA=False,
+                CenterData=False,
+                ComputeMSEP=ComputeMSEP,
+                verbose=verbose,
+                ShowTimer=ShowTimer,
+                Mode=Mode,
+                FinalEnergy=FinalEnergy,
+                alpha=alpha,
+                beta=beta,
+                AvoidSolitary=AvoidSolitary,
+                EmbPointProb=EmbPointProb,
+                AdjustElasticMatrix=AdjustElasticMatrix,
+                DisplayWarnings=DisplayWarnings,
+                StoreGraphEvolution=StoreGraphEvolution,
+                GPU=GPU,
+                Autotune=Autotune,
+                PointWeights=Weights,
+            )
+        )
+        ReturnList[-1]["ConsensusWeights"] = Weights
+
+        ReturnList[-1]["SubSetID"] = j
+        ReturnList[-1]["ReplicaID"] = 0
+        ReturnList[-1]["ProbPoint"] = 1
+        # the consensus graph is fitted on the nodes of the replicas, not on X
+        ReturnList[-1]["PartData"] = None
+        ReturnList[-1]["SquaredX"] = None
+
+    elif nReps > 1:
         if verbose:
             print("Constructing average tree")
 
@@ -395,6 +781,7 @@ def computeElasticPrincipalGraphWithGrammars(
                 Nodes=InitNodes,
                 Configuration=Configuration,
                 DensityRadius=DensityRadius,
+                PCAAlgorithm=PCAAlgorithm,
                 verbose=verbose,
             )
 
@@ -474,6 +861,34 @@ def computeElasticPrincipalGraphWithGrammars(
                 DisplayWarnings=DisplayWarnings,
                 StoreGraphEvolution=StoreGraphEvolution,
                 GPU=GPU,
+                Autotune=Autotune,
+                MemoryBudget=MemoryBudget,
+                Executor=Executor,
+                FastPath=FastPath,
+                CheckpointFile=CheckpointFile,
+                CheckpointEvery=CheckpointEvery,
+                ResumeFrom=ResumeFrom,
+                TimeBudget=TimeBudget,
+                MaxEvaluations=MaxEvaluations,
+                StoppingRule=StoppingRule,
+                StoppingWindow=StoppingWindow,
+                StoppingThreshold=StoppingThreshold,
+                HeldOutFraction=HeldOutFraction,
+                TopologyMemo=TopologyMemo,
+                GrowthBatch=GrowthBatch,
+                GrowthBatchAdaptive=GrowthBatchAdaptive,
+                ScreeningSize=ScreeningSize,
+                ScreeningFinalists=ScreeningFinalists,
+                ScreeningGap=ScreeningGap,
+                ShortlistSize=ShortlistSize,
+                ShortlistDiagnostics=ShortlistDiagnostics,
+                LazyGreedy=LazyGreedy,
+                LazyGreedyHops=LazyGreedyHops,
+                LazyGreedyMaxAge=LazyGreedyMaxAge,
+                Speculation=Speculation,
+                SpeculationStart=SpeculationStart,
+                DataContext=None,
+                PartitionStrategy=PartitionStrategy,
             )
         )
 
@@ -481,6 +896,9 @@ def computeElasticPrincipalGraphWithGrammars(
         ReturnList[-1]["SubSetID"] = j
         ReturnList[-1]["ReplicaID"] = 0
         ReturnList[-1]["ProbPoint"] = 1
+        # the consensus graph is fitted on the nodes of the replicas, not on X
+        ReturnList[-1]["PartData"] = None
+        ReturnList[-1]["SquaredX"] = None
 
     return ReturnList
 
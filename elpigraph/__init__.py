@@ -1,6 +1,14 @@
 from ._AlterStructure import ExtendLeaves, CollapseBranches, ShiftBranching
 from ._BaseElPiWrapper import computeElasticPrincipalGraphWithGrammars
 from ._EMAdjustment import AdjustByConstant
+from .src.datacontext import (
+    MakeDataContext,
+    CloseDataContext,
+    ConfigurePreprocessingCache,
+    ClearPreprocessingCache,
+)
+from .src.executors import MakeExecutor, CloseExecutor
+from .src.autotune import GetAutotune, RunAutotune
 from ._topologies import (
     computeElasticPrincipalCircle,
     computeElasticPrincipalTree,
@@ -9,6 +17,8 @@ from ._topologies import (
     GrowLeaves,
     generateInitialConfiguration,
 )
+from ._sweep import sweepElasticPrincipalGraph
+from ._batch import computeElasticPrincipalGraphMany
 from . import src
 from . import plot
 from ._version import __version__
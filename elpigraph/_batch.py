@@ -0,0 +1,146 @@
+import time
+import heapq
+import traceback
+import numpy as np
+
+from ._topologies import computeElasticPrincipalTree
+from .src.executors import MakeExecutor, CloseExecutor
+from .src.scheduler import PlanWorkers
+
+
+def _ComputeChunk(Args):
+    """
+    # Construct the graphs of a chunk of datasets back to back. An error only
+    # affects the dataset raising it, its traceback is returned instead of the graphs
+    """
+    Topology, Chunk, verbose, GraphParameters = Args
+    Results = []
+    for i, X, Seed in Chunk:
+        t = time.time()
+        try:
+            np.random.seed(Seed)
+            Graphs = Topology(X, verbose=verbose, **GraphParameters)
+            Error = None
+        except Exception:
+            Graphs = None
+            Error = traceback.format_exc()
+        Results.append((i, Graphs, Error, time.time() - t))
+    return Results
+
+
+def PackDatasets(Sizes, nChunks):
+    """
+    #' Pack datasets into chunks of similar total size
+    #'
+    #' The datasets are assigned by decreasing size to the chunk with the smallest total size
+    #'
+    #' @param Sizes integer vector, the number of points of each dataset
+    #' @param nChunks integer, number of chunks
+    #'
+    #' @return a list of lists of dataset indices (empty chunks are dropped)
+    """
+    Heap = [(0, k) for k in range(nChunks)]
+    Chunks = [[] for _ in range(nChunks)]
+    for i in np.argsort(-np.asarray(Sizes), kind="stable"):
+        Load, k = heapq.heappop(Heap)
+        Chunks[k].append(int(i))
+        heapq.heappush(Heap, (Load + Sizes[i], k))
+    return [Chunk for Chunk in Chunks if len(Chunk) > 0]
+
+
+def computeElasticPrincipalGraphMany(
+    Datasets,
+    Topology=computeElasticPrincipalTree,
+    n_cores=1,
+    Pool=None,
+    ChunksPerCore=4,
+    Seed=None,
+    verbose=False,
+    **GraphParameters
+):
+    """
+    #' Construct a principal graph for each dataset of a list of (small) datasets
+    #'
+    #' The datasets are packed into chunks of similar total size, ChunksPerCore per process, and each process constructs
+    #' the graphs of a chunk back to back (on a single core). The processes (and their BLAS threads) are planned for the
+    #' largest dataset (see PlanWorkers). An error raised by a dataset does not stop the other ones
+    #'
+    #' @param Datasets list of numerical 2D matrices
+    #' @param Topology function constructing the graphs (computeElasticPrincipalTree, computeElasticPrincipalCurve, ...)
+    #' @param n_cores integer, maximum number of processes
+    #' @param Pool a multiprocessing Pool to be used instead of creating one, so that the processes (and their
+    #' imports and caches) persist across calls. If not None, n_cores is only used to define the chunks
+    #' @param ChunksPerCore integer, number of chunks per process. More chunks balance the load better at the cost of more messages
+    #' @param Seed integer, seed of the independent random streams of the datasets, so that the results do not depend
+    #' on the chunks. If None, it is drawn from the global random state
+    #' @param verbose boolean, should the progress be printed?
+    #' @param GraphParameters other parameters of Topology, common to all the datasets
+    #'
+    #' @return a dict with the elements
+    #' \describe{
+    #'   \item{Graphs}{the list of the outputs of Topology for each dataset (None if the construction failed)}
+    #'   \item{Errors}{the list of the tracebacks of the failed constructions (None if the construction succeeded)}
+    #'   \item{Times}{the construction time of each dataset (in seconds)}
+    #' }
+    """
+    if Seed is None:
+        Seed = np.random.randint(np.iinfo(np.int32).max)
+    Seeds = [
+        s.generate_state(1)[0]
+        for s in np.random.SeedSequence(Seed).spawn(len(Datasets))
+    ]
+    GlobalState = np.random.get_state()
+
+    Parallel = Pool is not None or n_cores > 1
+    if Pool is None and Parallel:
+        Plan = PlanWorkers(
+            max(Datasets, key=np.size),
+            GraphParameters.get("NumNodes", 1),
+            len(Datasets),
+            n_cores,
+            GraphParameters.get("MemoryBudget"),
+        )
+        n_cores = Plan["Workers"]
+    Chunks = PackDatasets(
+        [len(X) for X in Datasets], n_cores * ChunksPerCore if Parallel else 1
+    )
+    Tasks = [
+        (
+            Topology,
+            [(i, Datasets[i], Seeds[i]) for i in Chunk],
+            verbose,
+            dict(GraphParameters, n_cores=1) if Parallel else GraphParameters,
+        )
+        for Chunk in Chunks
+    ]
+
+    try:
+        if Pool is not None:
+            Results = Pool.imap_unordered(_ComputeChunk, Tasks, chunksize=1)
+        elif Parallel:
+            BatchExecutor = MakeExecutor(
+                "multiprocessing", n_cores, BLASThreads=Plan["BLASThreads"]
+            )
+            try:
+                Results = list(
+                    BatchExecutor["Pool"].imap_unordered(
+                        _ComputeChunk, Tasks, chunksize=1
+                    )
+                )
+            finally:
+                CloseExecutor(BatchExecutor)
+        else:
+            Results = map(_ComputeChunk, Tasks)
+
+        Graphs = [None] * len(Datasets)
+        Errors = [None] * len(Datasets)
+        Times = [None] * len(Datasets)
+        for ChunkResults in Results:
+            for i, G, Error, t in ChunkResults:
+                Graphs[i], Errors[i], Times[i] = G, Error, t
+                if verbose and Error is not None:
+                    print("Dataset", i, "failed")
+    finally:
+        np.random.set_state(GlobalState)
+
+    return dict(Graphs=Graphs, Errors=Errors, Times=Times)
@@ -0,0 +1,172 @@
+import time
+import itertools
+import numpy as np
+import pandas as pd
+
+from ._topologies import computeElasticPrincipalTree
+from .src.datacontext import MakeDataContext, CheckDataContext
+from .src.executors import (
+    MakeExecutor,
+    CloseExecutor,
+    ExecutorBroadcast,
+    ExecutorMap,
+    ReleaseBroadcasts,
+)
+from .src.scheduler import PlanWorkers
+from .src.autotune import GetAutotune
+
+
+def _ComputePath(X, DataContext, Topology, Points, WarmStart, verbose, GraphParameters):
+    """
+    # Construct the graphs of a regularization path (list of parameter dicts), each graph
+    # being warm-started from the graph of the previous point of the path if WarmStart
+    """
+    Graphs = []
+    Times = []
+    PG = None
+    for Point in Points:
+        Parameters = dict(GraphParameters, **Point)
+        if WarmStart and PG is not None:
+            Parameters.update(
+                InitNodePositions=PG["NodePositions"],
+                InitEdges=PG["Edges"][0],
+                ElasticMatrix=None,
+                AdjustVect=None,
+            )
+        if verbose:
+            print("Sweep point", Point)
+        t = time.time()
+        PG = Topology(X, DataContext=DataContext, verbose=verbose, **Parameters)[-1]
+        Times.append(time.time() - t)
+        Graphs.append(PG)
+    return Graphs, Times
+
+
+def _SweepTask(Task, Shared):
+    Topology, Points, WarmStart, verbose, PCA, GraphParameters = Task
+    Context = MakeDataContext(Shared["X"])
+    Context["PCA"].update(PCA)
+    return _ComputePath(
+        Context["X"], Context, Topology, Points, WarmStart, verbose, GraphParameters
+    )
+
+
+def sweepElasticPrincipalGraph(
+    X,
+    Grid,
+    Topology=computeElasticPrincipalTree,
+    Path=None,
+    WarmStart=False,
+    n_cores=1,
+    Executor=None,
+    DataContext=None,
+    verbose=False,
+    **GraphParameters
+):
+    """
+    #' Construct principal graphs over a grid of parameters
+    #'
+    #' The grid is the cartesian product of the values of Grid. The grid points that only differ by the value of
+    #' the Path parameter form a regularization path: its graphs are constructed in order, each one being
+    #' constructed from scratch or, with WarmStart, warm-started from the graph of the previous point (its nodes and
+    #' edges are the initial graph, so that only the growth beyond its number of nodes, if any, remains to be done). The paths are constructed
+    #' by a pool of n_cores processes sharing X, and all the graphs share the dataset context of X (rowSums(X^2),
+    #' centering vector and PCA basis are computed once per process)
+    #'
+    #' @param X numerical 2D matrix, the n-by-m matrix with the position of n m-dimensional points
+    #' @param Grid dict {parameter: list of values} (e.g., dict(Lambda=[0.01, 0.02, 0.05], Mu=[0.05, 0.1]))
+    #' @param Topology function constructing the graphs (computeElasticPrincipalTree, computeElasticPrincipalCurve, ...)
+    #' @param Path string, the parameter of Grid along which the graphs are warm-started. If None, the first parameter of Grid
+    #' @param WarmStart boolean, should the graphs be warm-started along the paths? A warm-started graph keeps the topology of the
+    #' previous graph of the path: it is much faster, but its energy can be much higher than the one of the graph constructed from
+    #' scratch (e.g., 2.5 times on tree_data when Lambda goes from 0.001 to 0.01), so that its Table should not be used to choose the
+    #' parameters. By default (False) each graph is constructed from scratch
+    #' @param n_cores integer, number of processes constructing the paths (each graph is constructed on a single core
+    #' if n_cores > 1)
+    #' @param Executor executor created by MakeExecutor, constructing the paths instead of a pool of n_cores processes.
+    #' X is broadcast once to its workers
+    #' @param DataContext a dataset context created by MakeDataContext on X. If None, it will be created
+    #' @param verbose boolean, should the progress be printed?
+    #' @param GraphParameters other parameters of Topology, common to all the grid points
+    #'
+    #' @return a dict with the elements
+    #' \describe{
+    #'   \item{Table}{a pandas DataFrame with a row per grid point: the parameters of Grid, the path (Path) and the position
+    #'   in the path (PathStep) of the point, the final report of its graph and the construction time (Time)}
+    #'   \item{Graphs}{the list of the principal graphs, in the order of the rows of Table}
+    #' }
+    """
+    Names = list(Grid.keys())
+    if Path is None:
+        Path = Names[0]
+    if Path not in Grid:
+        raise ValueError("Path parameter " + str(Path) + " is not in the grid")
+
+    # grid points grouped by regularization path, in the order of the values of Grid
+    Others = [Name for Name in Names if Name != Path]
+    Paths = [
+        [dict(zip(Others, Values), **{Path: v}) for v in Grid[Path]]
+        for Values in itertools.product(*[Grid[Name] for Name in Others])
+    ]
+
+    if (Executor is not None or n_cores > 1) and len(Paths) > 1:
+        Context = CheckDataContext(DataContext, X)
+        if GraphParameters.get("Autotune", False):
+            # the workers inherit the configuration instead of running the benchmarks
+            GetAutotune()
+        if Executor is None:
+            # the workers (and their BLAS threads) are planned for the largest graphs of the grid
+            Plan = PlanWorkers(
+                Context["X"],
+                max(Grid.get("NumNodes", [GraphParameters.get("NumNodes", 1)])),
+                len(Paths),
+                n_cores,
+                GraphParameters.get("MemoryBudget"),
+            )
+            SweepExecutor = MakeExecutor(
+                "multiprocessing", Plan["Workers"], BLASThreads=Plan["BLASThreads"]
+            )
+        else:
+            SweepExecutor = Executor
+        try:
+            Results = ExecutorMap(
+                SweepExecutor,
+                _SweepTask,
+                [
+                    (
+                        Topology,
+                        Points,
+                        WarmStart,
+                        verbose,
+                        Context["PCA"],
+                        dict(GraphParameters, n_cores=1),
+                    )
+                    for Points in Paths
+                ],
+                ExecutorBroadcast(SweepExecutor, dict(X=Context["X"])),
+                ChunkSize=1,
+            )
+        finally:
+            if Executor is None:
+                CloseExecutor(SweepExecutor)
+            else:
+                ReleaseBroadcasts(SweepExecutor)
+    else:
+        Context = CheckDataContext(DataContext, X)
+        Results = [
+            _ComputePath(
+                X, Context, Topology, Points, WarmStart, verbose, GraphParameters
+            )
+            for Points in Paths
+        ]
+
+    Rows = []
+    Graphs = []
+    for i, (Points, (PathGraphs, Times)) in enumerate(zip(Paths, Results)):
+        for j, (Point, PG, t) in enumerate(zip(Points, PathGraphs, Times)):
+            Rows.append(
+                dict(Point, Path=i, PathStep=j, **dict(PG["FinalReport"], Time=t))
+            )
+            Graphs.append(PG)
+
+    return dict(Table=pd.DataFrame(Rows, columns=list(Rows[0].keys())), Graphs=Graphs)
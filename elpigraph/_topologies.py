@@ -1,6 +1,6 @@
 import numpy as np
 import elpigraph
-from .src.PCA import PCA, TruncPCA, PCA_gpu, TruncSVD_gpu
+from .src.PCA import PCA, RandomizedPCA, TruncPCA, PCA_gpu, TruncSVD_gpu
 from .src.distutils import PartialDistance
 
 
@@ -27,14 +27,18 @@ def computeElasticPrincipalCircle(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     # drawAccuracyComplexity = True,
     # drawPCAView = True,
     # drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     nReps=1,
-    # ParallelRep = False,
+    ParallelRep="auto",
+    ReplicaSeed=None,
+    ConsensusMode="Full",
+    ConsensusSteps=2,
     Subsets=list(),
     ProbPoint=1,
     Mode=1,
@@ -57,6 +61,36 @@ def computeElasticPrincipalCircle(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    MultiresolutionLevels=None,
+    MultiresolutionSteps=1,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
 
     """
@@ -84,13 +118,17 @@ def computeElasticPrincipalCircle(
     #' @param ShowTimer boolean, should the time to construct the graph be computed and reported for each step?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If NULL all the components will be used
+    #' @param PCAAlgorithm string, the PCA of the dimensionality reduction when ReduceDimension is a fraction of variance or
+    #' retains more than 75% of the components, and of the "Density" initial configuration: "randomized" (see RandomizedPCA,
+    #' without the covariance matrix) or "full" (eigendecomposition of the covariance matrix)
     #' @param drawAccuracyComplexity boolean, should the accuracy VS complexity plot be reported?
     #' @param drawPCAView boolean, should a 2D plot of the points and pricipal curve be dranw for the final configuration?
     #' @param drawEnergy boolean, should changes of evergy VS the number of nodes be reported?
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param nReps integer, number of replica of the construction 
     #' @param ProbPoint real between 0 and 1, probability of inclusing of a single point for each computation
     #' @param Subsets list of column names (or column number). When specified a principal circle will be computed for each of the subsets specified.
@@ -114,7 +152,15 @@ def computeElasticPrincipalCircle(
     #' @param ... optional parameter that will be passed to the AdjustElasticMatrix function
     #' @param AdjustVect boolean vector keeping track of the nodes for which the elasticity parameters have been adjusted.
     #' When true for a node its elasticity parameters will not be adjusted.
-    #' @param ParallelRep boolean, should parallel execution be performed on the sampling instead of the the grammar evaluations?
+    #' @param ParallelRep boolean or "auto", should parallel execution be performed on the replicas instead of the the grammar evaluations?
+    #' If True, the graphs of the replicas (and subsets) are constructed by a pool of n_cores processes sharing X, each using a single core.
+    #' "auto" uses the replicas when there are at least n_cores of them. The result does not depend on this parameter
+    #' @param ReplicaSeed integer, seed of the independent random streams of the replicas (one stream per replica and subset, used
+    #' to select the points and construct the graph). If None, it is drawn from the global random state
+    #' @param ConsensusMode string, how the consensus graph of the replicas (nReps > 1) is constructed. "Full" constructs a new graph
+    #' on the nodes of all the replicas. "Local" starts from the replica of lowest energy and only applies ConsensusSteps grammar
+    #' repair steps, the nodes of the replicas being weighted by the number of points they are associated with
+    #' @param ConsensusSteps integer, number of grammar repair steps of the "Local" consensus (0 only refits the node positions)
     #' @param AvoidResampling booleand, should the sampling of initial conditions avoid reselecting the same points
     #' (or points neighbors if DensityRadius is specified)?
     #' @param SampleIC boolean, should the initial configuration be considered on the sampled points when applicable? 
@@ -124,6 +170,75 @@ def computeElasticPrincipalCircle(
     #' If NULL, the value of Lambda will be used.
     #' @param Mu.Initial real, the mu parameter used the construct the elastic matrix associted with ther initial configuration if needed.
     #' If NULL, the value of Mu will be used.
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param MultiresolutionLevels increasing integer vector or None. If not None, the graph is grown on a fixed random subsample of
+    #' MultiresolutionLevels[0] points and then refitted on the larger subsamples and finally on all the points, using only
+    #' MultiresolutionSteps grammar optimization steps per level (see computeMultiresolutionGraph)
+    #' @param MultiresolutionSteps integer, number of grammar optimization steps on each level after the first one (0 to only refit the nodes)
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, it replaces the
+    #' pool of n_cores processes: the replicas are constructed by the executor if ParallelRep (with its number of workers instead of
+    #' n_cores for "auto"), and the candidate embedments otherwise. The data is broadcast once to its workers per construction
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return
     #'
@@ -183,6 +298,7 @@ def computeElasticPrincipalCircle(
         verbose=verbose,
         ShowTimer=ShowTimer,
         ReduceDimension=ReduceDimension,
+        PCAAlgorithm=PCAAlgorithm,
         # drawAccuracyComplexity = drawAccuracyComplexity,
         # drawPCAView = drawPCAView,
         # drawEnergy = drawEnergy,
@@ -202,7 +318,10 @@ def computeElasticPrincipalCircle(
         EmbPointProb=EmbPointProb,
         SampleIC=SampleIC,
         AvoidResampling=AvoidResampling,
-        #                                              ParallelRep = ParallelRep,
+        ParallelRep=ParallelRep,
+        ReplicaSeed=ReplicaSeed,
+        ConsensusMode=ConsensusMode,
+        ConsensusSteps=ConsensusSteps,
         AdjustElasticMatrix=AdjustElasticMatrix,
         AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
         Lambda_Initial=Lambda_Initial,
@@ -211,6 +330,36 @@ def computeElasticPrincipalCircle(
         MaxSteps=MaxSteps,
         StoreGraphEvolution=StoreGraphEvolution,
         GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        MultiresolutionLevels=MultiresolutionLevels,
+        MultiresolutionSteps=MultiresolutionSteps,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        DataContext=DataContext,
+        PartitionStrategy=PartitionStrategy,
     )
 
 
@@ -237,14 +386,18 @@ def computeElasticPrincipalTree(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     # drawAccuracyComplexity = True,
     # drawPCAView = True,
     # drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     nReps=1,
-    # ParallelRep = False,
+    ParallelRep="auto",
+    ReplicaSeed=None,
+    ConsensusMode="Full",
+    ConsensusSteps=2,
     Subsets=list(),
     ProbPoint=1,
     Mode=1,
@@ -267,6 +420,36 @@ def computeElasticPrincipalTree(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    MultiresolutionLevels=None,
+    MultiresolutionSteps=1,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
     """
     #' Construct a principal elastic tree
@@ -293,13 +476,17 @@ def computeElasticPrincipalTree(
     #' @param ShowTimer boolean, should the time to construct the graph be computed and reported for each step?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If NULL all the components will be used
+    #' @param PCAAlgorithm string, the PCA of the dimensionality reduction when ReduceDimension is a fraction of variance or
+    #' retains more than 75% of the components, and of the "Density" initial configuration: "randomized" (see RandomizedPCA,
+    #' without the covariance matrix) or "full" (eigendecomposition of the covariance matrix)
     #' @param drawAccuracyComplexity boolean, should the accuracy VS complexity plot be reported?
     #' @param drawPCAView boolean, should a 2D plot of the points and pricipal curve be dranw for the final configuration?
     #' @param drawEnergy boolean, should changes of evergy VS the number of nodes be reported?
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param nReps integer, number of replica of the construction 
     #' @param ProbPoint real between 0 and 1, probability of inclusing of a single point for each computation
     #' @param Subsets list of column names (or column number). When specified a principal tree will be computed for each of the subsets specified.
@@ -323,7 +510,15 @@ def computeElasticPrincipalTree(
     #' @param ... optional parameter that will be passed to the AdjustElasticMatrix function
     #' @param AdjustVect boolean vector keeping track of the nodes for which the elasticity parameters have been adjusted.
     #' When true for a node its elasticity parameters will not be adjusted.
-    #' @param ParallelRep boolean, should parallel execution be performed on the sampling instead of the the grammar evaluations?
+    #' @param ParallelRep boolean or "auto", should parallel execution be performed on the replicas instead of the the grammar evaluations?
+    #' If True, the graphs of the replicas (and subsets) are constructed by a pool of n_cores processes sharing X, each using a single core.
+    #' "auto" uses the replicas when there are at least n_cores of them. The result does not depend on this parameter
+    #' @param ReplicaSeed integer, seed of the independent random streams of the replicas (one stream per replica and subset, used
+    #' to select the points and construct the graph). If None, it is drawn from the global random state
+    #' @param ConsensusMode string, how the consensus graph of the replicas (nReps > 1) is constructed. "Full" constructs a new graph
+    #' on the nodes of all the replicas. "Local" starts from the replica of lowest energy and only applies ConsensusSteps grammar
+    #' repair steps, the nodes of the replicas being weighted by the number of points they are associated with
+    #' @param ConsensusSteps integer, number of grammar repair steps of the "Local" consensus (0 only refits the node positions)
     #' @param AvoidResampling booleand, should the sampling of initial conditions avoid reselecting the same points
     #' (or points neighbors if DensityRadius is specified)?
     #' @param SampleIC boolean, should the initial configuration be considered on the sampled points when applicable? 
@@ -333,6 +528,75 @@ def computeElasticPrincipalTree(
     #' If NULL, the value of Lambda will be used.
     #' @param Mu.Initial real, the mu parameter used the construct the elastic matrix associted with ther initial configuration if needed.
     #' If NULL, the value of Mu will be used.
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param MultiresolutionLevels increasing integer vector or None. If not None, the graph is grown on a fixed random subsample of
+    #' MultiresolutionLevels[0] points and then refitted on the larger subsamples and finally on all the points, using only
+    #' MultiresolutionSteps grammar optimization steps per level (see computeMultiresolutionGraph)
+    #' @param MultiresolutionSteps integer, number of grammar optimization steps on each level after the first one (0 to only refit the nodes)
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, it replaces the
+    #' pool of n_cores processes: the replicas are constructed by the executor if ParallelRep (with its number of workers instead of
+    #' n_cores for "auto"), and the candidate embedments otherwise. The data is broadcast once to its workers per construction
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return A list of principal graph strucutures containing the trees constructed during the different replica of the algorithm.
     #' If the number of replicas is larger than 1. The the final element of the list is the "average tree", which is constructed by
@@ -388,6 +652,7 @@ def computeElasticPrincipalTree(
         verbose=verbose,
         ShowTimer=ShowTimer,
         ReduceDimension=ReduceDimension,
+        PCAAlgorithm=PCAAlgorithm,
         # drawAccuracyComplexity = drawAccuracyComplexity,
         # drawPCAView = drawPCAView,
         # drawEnergy = drawEnergy,
@@ -407,7 +672,10 @@ def computeElasticPrincipalTree(
         EmbPointProb=EmbPointProb,
         SampleIC=SampleIC,
         AvoidResampling=AvoidResampling,
-        #                                              ParallelRep = ParallelRep,
+        ParallelRep=ParallelRep,
+        ReplicaSeed=ReplicaSeed,
+        ConsensusMode=ConsensusMode,
+        ConsensusSteps=ConsensusSteps,
         AdjustElasticMatrix=AdjustElasticMatrix,
         AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
         Lambda_Initial=Lambda_Initial,
@@ -416,6 +684,36 @@ def computeElasticPrincipalTree(
         MaxSteps=MaxSteps,
         StoreGraphEvolution=StoreGraphEvolution,
         GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        MultiresolutionLevels=MultiresolutionLevels,
+        MultiresolutionSteps=MultiresolutionSteps,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        DataContext=DataContext,
+        PartitionStrategy=PartitionStrategy,
     )
 
 
@@ -442,14 +740,18 @@ def computeElasticPrincipalCurve(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     # drawAccuracyComplexity = True,
     # drawPCAView = True,
     # drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     nReps=1,
-    # ParallelRep = False,
+    ParallelRep="auto",
+    ReplicaSeed=None,
+    ConsensusMode="Full",
+    ConsensusSteps=2,
     Subsets=list(),
     ProbPoint=1,
     Mode=1,
@@ -472,6 +774,36 @@ def computeElasticPrincipalCurve(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    MultiresolutionLevels=None,
+    MultiresolutionSteps=1,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
 
     """ 
@@ -499,13 +831,17 @@ def computeElasticPrincipalCurve(
     #' @param ShowTimer boolean, should the time to construct the graph be computed and reported for each step?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If NULL all the components will be used
+    #' @param PCAAlgorithm string, the PCA of the dimensionality reduction when ReduceDimension is a fraction of variance or
+    #' retains more than 75% of the components, and of the "Density" initial configuration: "randomized" (see RandomizedPCA,
+    #' without the covariance matrix) or "full" (eigendecomposition of the covariance matrix)
     #' @param drawAccuracyComplexity boolean, should the accuracy VS complexity plot be reported?
     #' @param drawPCAView boolean, should a 2D plot of the points and pricipal curve be dranw for the final configuration?
     #' @param drawEnergy boolean, should changes of evergy VS the number of nodes be reported?
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param nReps integer, number of replica of the construction 
     #' @param ProbPoint real between 0 and 1, probability of inclusing of a single point for each computation
     #' @param Subsets list of column names (or column number). When specified a principal curve will be computed for each of the subsets specified.
@@ -535,10 +871,87 @@ def computeElasticPrincipalCurve(
     #' If NULL, the value of Lambda will be used.
     #' @param Mu.Initial real, the mu parameter used the construct the elastic matrix associted with ther initial configuration if needed.
     #' If NULL, the value of Mu will be used.
-    #' @param ParallelRep boolean, should parallel execution be performed on the sampling instead of the the grammar evaluations?
+    #' @param ParallelRep boolean or "auto", should parallel execution be performed on the replicas instead of the the grammar evaluations?
+    #' If True, the graphs of the replicas (and subsets) are constructed by a pool of n_cores processes sharing X, each using a single core.
+    #' "auto" uses the replicas when there are at least n_cores of them. The result does not depend on this parameter
+    #' @param ReplicaSeed integer, seed of the independent random streams of the replicas (one stream per replica and subset, used
+    #' to select the points and construct the graph). If None, it is drawn from the global random state
+    #' @param ConsensusMode string, how the consensus graph of the replicas (nReps > 1) is constructed. "Full" constructs a new graph
+    #' on the nodes of all the replicas. "Local" starts from the replica of lowest energy and only applies ConsensusSteps grammar
+    #' repair steps, the nodes of the replicas being weighted by the number of points they are associated with
+    #' @param ConsensusSteps integer, number of grammar repair steps of the "Local" consensus (0 only refits the node positions)
     #' @param AvoidResampling booleand, should the sampling of initial conditions avoid reselecting the same points
     #' (or points neighbors if DensityRadius is specified)?
     #' @param SampleIC boolean, should the initial configuration be considered on the sampled points when applicable? 
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param MultiresolutionLevels increasing integer vector or None. If not None, the graph is grown on a fixed random subsample of
+    #' MultiresolutionLevels[0] points and then refitted on the larger subsamples and finally on all the points, using only
+    #' MultiresolutionSteps grammar optimization steps per level (see computeMultiresolutionGraph)
+    #' @param MultiresolutionSteps integer, number of grammar optimization steps on each level after the first one (0 to only refit the nodes)
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, it replaces the
+    #' pool of n_cores processes: the replicas are constructed by the executor if ParallelRep (with its number of workers instead of
+    #' n_cores for "auto"), and the candidate embedments otherwise. The data is broadcast once to its workers per construction
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return A list of principal graph strucutures containing the curves constructed during the different replica of the algorithm.
     #' If the number of replicas is larger than 1. The the final element of the list is the "average curve", which is constructed by
@@ -592,6 +1005,7 @@ def computeElasticPrincipalCurve(
         verbose=verbose,
         ShowTimer=ShowTimer,
         ReduceDimension=ReduceDimension,
+        PCAAlgorithm=PCAAlgorithm,
         # drawAccuracyComplexity = drawAccuracyComplexity,
         # drawPCAView = drawPCAView,
         # drawEnergy = drawEnergy,
@@ -611,7 +1025,10 @@ def computeElasticPrincipalCurve(
         EmbPointProb=EmbPointProb,
         SampleIC=SampleIC,
         AvoidResampling=AvoidResampling,
-        #                                              ParallelRep = ParallelRep,
+        ParallelRep=ParallelRep,
+        ReplicaSeed=ReplicaSeed,
+        ConsensusMode=ConsensusMode,
+        ConsensusSteps=ConsensusSteps,
         AdjustElasticMatrix=AdjustElasticMatrix,
         AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
         Lambda_Initial=Lambda_Initial,
@@ -620,6 +1037,36 @@ def computeElasticPrincipalCurve(
         MaxSteps=MaxSteps,
         StoreGraphEvolution=StoreGraphEvolution,
         GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        MultiresolutionLevels=MultiresolutionLevels,
+        MultiresolutionSteps=MultiresolutionSteps,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        DataContext=DataContext,
+        PartitionStrategy=PartitionStrategy,
     )
 
 
@@ -646,14 +1093,18 @@ def fineTuneBR(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     # drawAccuracyComplexity = True,
     # drawPCAView = True,
     # drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     nReps=1,
-    # ParallelRep = False,
+    ParallelRep="auto",
+    ReplicaSeed=None,
+    ConsensusMode="Full",
+    ConsensusSteps=2,
     Subsets=list(),
     ProbPoint=1,
     Mode=1,
@@ -676,6 +1127,36 @@ def fineTuneBR(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    MultiresolutionLevels=None,
+    MultiresolutionSteps=1,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
 
     """
@@ -703,13 +1184,17 @@ def fineTuneBR(
     #' @param ShowTimer boolean, should the time to construct the graph be computed and reported for each step?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If NULL all the components will be used
+    #' @param PCAAlgorithm string, the PCA of the dimensionality reduction when ReduceDimension is a fraction of variance or
+    #' retains more than 75% of the components, and of the "Density" initial configuration: "randomized" (see RandomizedPCA,
+    #' without the covariance matrix) or "full" (eigendecomposition of the covariance matrix)
     #' @param drawAccuracyComplexity boolean, should the accuracy VS complexity plot be reported?
     #' @param drawPCAView boolean, should a 2D plot of the points and pricipal curve be dranw for the final configuration?
     #' @param drawEnergy boolean, should changes of evergy VS the number of nodes be reported?
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param nReps integer, number of replica of the construction 
     #' @param ProbPoint real between 0 and 1, probability of inclusing of a single point for each computation
     #' @param Subsets list of column names (or column number). When specified a principal curve will be computed for each of the subsets specified.
@@ -739,8 +1224,85 @@ def fineTuneBR(
     #' If NULL, the value of Lambda will be used.
     #' @param Mu.Initial real, the mu parameter used the construct the elastic matrix associted with ther initial configuration if needed.
     #' If NULL, the value of Mu will be used.
-    #' @param ParallelRep 
+    #' @param ParallelRep boolean or "auto", should parallel execution be performed on the replicas instead of the the grammar evaluations?
+    #' If True, the graphs of the replicas (and subsets) are constructed by a pool of n_cores processes sharing X, each using a single core.
+    #' "auto" uses the replicas when there are at least n_cores of them. The result does not depend on this parameter
+    #' @param ReplicaSeed integer, seed of the independent random streams of the replicas (one stream per replica and subset, used
+    #' to select the points and construct the graph). If None, it is drawn from the global random state
+    #' @param ConsensusMode string, how the consensus graph of the replicas (nReps > 1) is constructed. "Full" constructs a new graph
+    #' on the nodes of all the replicas. "Local" starts from the replica of lowest energy and only applies ConsensusSteps grammar
+    #' repair steps, the nodes of the replicas being weighted by the number of points they are associated with
+    #' @param ConsensusSteps integer, number of grammar repair steps of the "Local" consensus (0 only refits the node positions)
     #' @param SampleIC boolean, should the initial configuration be considered on the sampled points when applicable? 
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param MultiresolutionLevels increasing integer vector or None. If not None, the graph is grown on a fixed random subsample of
+    #' MultiresolutionLevels[0] points and then refitted on the larger subsamples and finally on all the points, using only
+    #' MultiresolutionSteps grammar optimization steps per level (see computeMultiresolutionGraph)
+    #' @param MultiresolutionSteps integer, number of grammar optimization steps on each level after the first one (0 to only refit the nodes)
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, it replaces the
+    #' pool of n_cores processes: the replicas are constructed by the executor if ParallelRep (with its number of workers instead of
+    #' n_cores for "auto"), and the candidate embedments otherwise. The data is broadcast once to its workers per construction
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return A list of principal graph strucutures containing the curves constructed during the different replica of the algorithm.
     #' If the number of replicas is larger than 1. The the final element of the list is the "average curve", which is constructed by
@@ -809,6 +1371,7 @@ def fineTuneBR(
         verbose=verbose,
         ShowTimer=ShowTimer,
         ReduceDimension=ReduceDimension,
+        PCAAlgorithm=PCAAlgorithm,
         # drawAccuracyComplexity = drawAccuracyComplexity,
         # drawPCAView = drawPCAView,
         # drawEnergy = drawEnergy,
@@ -828,7 +1391,10 @@ def fineTuneBR(
         EmbPointProb=EmbPointProb,
         SampleIC=SampleIC,
         AvoidResampling=AvoidResampling,
-        #                                              ParallelRep = ParallelRep,
+        ParallelRep=ParallelRep,
+        ReplicaSeed=ReplicaSeed,
+        ConsensusMode=ConsensusMode,
+        ConsensusSteps=ConsensusSteps,
         AdjustElasticMatrix=AdjustElasticMatrix,
         AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
         Lambda_Initial=Lambda_Initial,
@@ -836,6 +1402,36 @@ def fineTuneBR(
         DisplayWarnings=DisplayWarnings,
         StoreGraphEvolution=StoreGraphEvolution,
         GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        MultiresolutionLevels=MultiresolutionLevels,
+        MultiresolutionSteps=MultiresolutionSteps,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        DataContext=DataContext,
+        PartitionStrategy=PartitionStrategy,
     )
 
 
@@ -860,14 +1456,18 @@ def GrowLeaves(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     # drawAccuracyComplexity = True,
     # drawPCAView = True,
     # drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     nReps=1,
-    # ParallelRep = False,
+    ParallelRep="auto",
+    ReplicaSeed=None,
+    ConsensusMode="Full",
+    ConsensusSteps=2,
     Subsets=list(),
     ProbPoint=1,
     Mode=1,
@@ -890,6 +1490,36 @@ def GrowLeaves(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    MultiresolutionLevels=None,
+    MultiresolutionSteps=1,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
 
     """
@@ -917,13 +1547,17 @@ def GrowLeaves(
     #' @param ShowTimer boolean, should the time to construct the graph be computed and reported for each step?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If NULL all the components will be used
+    #' @param PCAAlgorithm string, the PCA of the dimensionality reduction when ReduceDimension is a fraction of variance or
+    #' retains more than 75% of the components, and of the "Density" initial configuration: "randomized" (see RandomizedPCA,
+    #' without the covariance matrix) or "full" (eigendecomposition of the covariance matrix)
     #' @param drawAccuracyComplexity boolean, should the accuracy VS complexity plot be reported?
     #' @param drawPCAView boolean, should a 2D plot of the points and pricipal curve be dranw for the final configuration?
     #' @param drawEnergy boolean, should changes of evergy VS the number of nodes be reported?
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)`
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param nReps integer, number of replica of the construction 
     #' @param ProbPoint real between 0 and 1, probability of inclusing of a single point for each computation
     #' @param Subsets list of column names (or column number). When specified a principal curve will be computed for each of the subsets specified.
@@ -953,8 +1587,85 @@ def GrowLeaves(
     #' If NULL, the value of Lambda will be used.
     #' @param Mu.Initial real, the mu parameter used the construct the elastic matrix associted with ther initial configuration if needed.
     #' If NULL, the value of Mu will be used.
-    #' @param ParallelRep 
+    #' @param ParallelRep boolean or "auto", should parallel execution be performed on the replicas instead of the the grammar evaluations?
+    #' If True, the graphs of the replicas (and subsets) are constructed by a pool of n_cores processes sharing X, each using a single core.
+    #' "auto" uses the replicas when there are at least n_cores of them. The result does not depend on this parameter
+    #' @param ReplicaSeed integer, seed of the independent random streams of the replicas (one stream per replica and subset, used
+    #' to select the points and construct the graph). If None, it is drawn from the global random state
+    #' @param ConsensusMode string, how the consensus graph of the replicas (nReps > 1) is constructed. "Full" constructs a new graph
+    #' on the nodes of all the replicas. "Local" starts from the replica of lowest energy and only applies ConsensusSteps grammar
+    #' repair steps, the nodes of the replicas being weighted by the number of points they are associated with
+    #' @param ConsensusSteps integer, number of grammar repair steps of the "Local" consensus (0 only refits the node positions)
     #' @param SampleIC boolean, should the initial configuration be considered on the sampled points when applicable? 
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param MultiresolutionLevels increasing integer vector or None. If not None, the graph is grown on a fixed random subsample of
+    #' MultiresolutionLevels[0] points and then refitted on the larger subsamples and finally on all the points, using only
+    #' MultiresolutionSteps grammar optimization steps per level (see computeMultiresolutionGraph)
+    #' @param MultiresolutionSteps integer, number of grammar optimization steps on each level after the first one (0 to only refit the nodes)
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, it replaces the
+    #' pool of n_cores processes: the replicas are constructed by the executor if ParallelRep (with its number of workers instead of
+    #' n_cores for "auto"), and the candidate embedments otherwise. The data is broadcast once to its workers per construction
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return A list of principal graph strucutures containing the curves constructed during the different replica of the algorithm.
     #' If the number of replicas is larger than 1. The the final element of the list is the "average curve", which is constructed by
@@ -1013,6 +1724,7 @@ def GrowLeaves(
         verbose=verbose,
         ShowTimer=ShowTimer,
         ReduceDimension=ReduceDimension,
+        PCAAlgorithm=PCAAlgorithm,
         # drawAccuracyComplexity = drawAccuracyComplexity,
         # drawPCAView = drawPCAView,
         # drawEnergy = drawEnergy,
@@ -1032,7 +1744,10 @@ def GrowLeaves(
         EmbPointProb=EmbPointProb,
         SampleIC=SampleIC,
         AvoidResampling=AvoidResampling,
-        #                                              ParallelRep = ParallelRep,
+        ParallelRep=ParallelRep,
+        ReplicaSeed=ReplicaSeed,
+        ConsensusMode=ConsensusMode,
+        ConsensusSteps=ConsensusSteps,
         AdjustElasticMatrix=AdjustElasticMatrix,
         AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
         Lambda_Initial=Lambda_Initial,
@@ -1040,6 +1755,36 @@ def GrowLeaves(
         DisplayWarnings=DisplayWarnings,
         StoreGraphEvolution=StoreGraphEvolution,
         GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        MultiresolutionLevels=MultiresolutionLevels,
+        MultiresolutionSteps=MultiresolutionSteps,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        DataContext=DataContext,
+        PartitionStrategy=PartitionStrategy,
     )
 
 
@@ -1051,6 +1796,7 @@ def generateInitialConfiguration(
     MaxPoints=10000,
     PCADensity=True,
     CenterDataDensity=True,
+    PCAAlgorithm="randomized",
     verbose=False,
 ):
     """  
@@ -1075,12 +1821,16 @@ def generateInitialConfiguration(
     #' @param MaxPoints integer, the maximum number of points for which the local density will be estimated. If the number of data points is
     #' larger than MaxPoints, a subset of the original points will be sampled
     #' @param PCADensity boolean, should PCA be applied to the data before computing the most dense area 
+    #' @param PCAAlgorithm string, "randomized" (the thin SVD of RandomizedPCA, without the covariance matrix) or "full"
+    #' (eigendecomposition of the covariance matrix), the PCA of the "Circle" and "Density" configurations
     #'
     #' @return
     #' @export
     #'
     #' @examples
     """
+    if PCAAlgorithm not in ("randomized", "full"):
+        raise ValueError("PCA algorithm " + str(PCAAlgorithm) + " is not defined")
     DONE = False
 
     if Configuration == "Line":
@@ -1115,7 +1865,12 @@ def generateInitialConfiguration(
                 data_centered = X - mv
             else:
                 data_centered = X
-            vglobal, PCAdata, explainedVariances = PCA(data_centered)
+            if PCAAlgorithm == "randomized":
+                vglobal, PCAdata, explainedVariances = RandomizedPCA(
+                    data_centered, n_components=X.shape[1]
+                )
+            else:
+                vglobal, PCAdata, explainedVariances = PCA(data_centered)
             Vt = vglobal.T
         else:
             if CenterDataDensity:
@@ -1218,7 +1973,13 @@ def generateInitialConfiguration(
                 data_centered = X - mv
             else:
                 data_centered = X
-            vglobal, tX_PCA, explainedVariances = PCA(data_centered)
+            if PCAAlgorithm == "randomized":
+                # all the components (a rotation, preserving the distances) from the thin SVD
+                vglobal, tX_PCA, explainedVariances = RandomizedPCA(
+                    data_centered, n_components=min(X.shape)
+                )
+            else:
+                vglobal, tX_PCA, explainedVariances = PCA(data_centered)
             tX = tX_PCA
         else:
             tX = X
@@ -1294,7 +2055,13 @@ def generateInitialConfiguration(
                 data_centered = X - mv
             else:
                 data_centered = X
-            vglobal, tX_PCA, explainedVariances = PCA(data_centered)
+            if PCAAlgorithm == "randomized":
+                # all the components (a rotation, preserving the distances) from the thin SVD
+                vglobal, tX_PCA, explainedVariances = RandomizedPCA(
+                    data_centered, n_components=min(X.shape)
+                )
+            else:
+                vglobal, tX_PCA, explainedVariances = PCA(data_centered)
             tX = tX_PCA
         else:
             tX = X
@@ -24,6 +24,8 @@ from sklearn.linear_model import LogisticRegression
 
 from .src.PCA import PCA, TruncPCA, PCA_gpu, TruncSVD_gpu
 from .src.core import PartitionData
+from .src.autotune import TunedBlockSize
+from .src.datacontext import GetSquaredX
 from .src.graphs import ConstructGraph, GetSubGraph, GetBranches
 from .src.distutils import PartialDistance
 from .src.reporting import project_point_onto_graph, project_point_onto_edge
@@ -245,7 +247,7 @@ def branch_labler(X, graph, nodes_positions, verbose=0):
     if verbose >= 100:
         print("Function find_branches results branches:", dict_output["branches"])
     vec_labels_by_vertices, dists, all_dists = PartitionData(
-        X, nodes_positions, 1e6, np.sum(X ** 2, axis=1, keepdims=1)
+        X, nodes_positions, TunedBlockSize(), np.sum(X ** 2, axis=1, keepdims=1)
     )  # np.array([[1,2,3,4], [1,2,3,4], [1,2,3,4], [10,20,30,40]]), [[1,2,3,4], [10,20,30,40]], 10**6)#,SquaredX)
     vec_labels_by_vertices = vec_labels_by_vertices.ravel()
     if verbose >= 100:
@@ -463,6 +465,9 @@ def visualize_eltree_with_data(
     vmin=-1,
     vmax=-1,
     percentile_contraction=20,
+    PartData=None,
+    SquaredX=None,
+    DataContext=None,
 ):
 
     nodep = PG["NodePositions"]
@@ -543,13 +548,19 @@ def visualize_eltree_with_data(
     # Associate each node with datapoints
     if verbose:
         print("Partitioning the data...")
-    partition, dists = PartitionData(
-        X=X,
-        NodePositions=nodep,
-        MaxBlockSize=100000000,
-        TrimmingRadius=np.inf,
-        SquaredX=np.sum(X ** 2, axis=1, keepdims=1),
-    )
+    if PartData is None:
+        if SquaredX is None and DataContext is not None:
+            SquaredX = GetSquaredX(DataContext)
+        elif SquaredX is None:
+            SquaredX = np.sum(X ** 2, axis=1, keepdims=1)
+        PartData = PartitionData(
+            X=X,
+            NodePositions=nodep,
+            MaxBlockSize=TunedBlockSize(),
+            TrimmingRadius=np.inf,
+            SquaredX=SquaredX,
+        )
+    partition, dists = PartData
     # col_nodes = {node: color[np.where(partition==node)[0]] for node in np.unique(partition)}
 
     # Project points onto the graph
@@ -1098,16 +1109,24 @@ def quantify_pseudotime(all_trajectories, ProjStruct, producePlot=False):
     return PseudoTimeTraj
 
 
-def project_on_tree(X, tree):
+def project_on_tree(X, tree, PartData=None, SquaredX=None, DataContext=None):
+    # PartData: untrimmed (partition, dists) of X on the tree nodes, if already known
+    # DataContext: dataset context of X (see MakeDataContext), provides SquaredX
     nodep = tree["NodePositions"]
     edges = tree["Edges"][0]
-    partition, dists = PartitionData(
-        X=X,
-        NodePositions=nodep,
-        MaxBlockSize=100000000,
-        TrimmingRadius=np.inf,
-        SquaredX=np.sum(X ** 2, axis=1, keepdims=1),
-    )
+    if PartData is None:
+        if SquaredX is None and DataContext is not None:
+            SquaredX = GetSquaredX(DataContext)
+        elif SquaredX is None:
+            SquaredX = np.sum(X ** 2, axis=1, keepdims=1)
+        PartData = PartitionData(
+            X=X,
+            NodePositions=nodep,
+            MaxBlockSize=TunedBlockSize(),
+            TrimmingRadius=np.inf,
+            SquaredX=SquaredX,
+        )
+    partition, dists = PartData
     ProjStruct = project_point_onto_graph(
         X=X, NodePositions=nodep, Edges=edges, Partition=partition
     )
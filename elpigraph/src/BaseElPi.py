@@ -8,7 +8,9 @@ import multiprocessing as mp
 import datetime
 import time
 import copy
-from .PCA import PCA, TruncPCA, PCA_gpu, TruncSVD_gpu
+from collections import namedtuple
+from types import MappingProxyType
+from .PCA import PCA, RandomizedPCA, TruncPCA, PCA_gpu, TruncSVD_gpu
 from .core import (
     PrimitiveElasticGraphEmbedment,
     PrimitiveElasticGraphEmbedment_cp,
@@ -18,7 +20,31 @@ from .core import (
     DecodeElasticMatrix,
 )
 from .grammar_operations import ApplyOptimalGraphGrammarOperation
-from .reporting import ReportOnPrimitiveGraphEmbedment
+from .speculation import (
+    MakeSpeculativeScheduler,
+    CloseSpeculativeScheduler,
+    ApplyOptimalGraphGrammarOperationSpeculative,
+    SpeculationReport,
+)
+from .lazygreedy import MakeGrammarCache, GrammarCacheReport
+from .shortlist import MakeShortlistDiagnostics, ShortlistReport
+from .stopping import StoppingRuleFired
+from .checkpoint import SaveCheckpoint, LoadCheckpoint
+from .budget import MakeBudget, BudgetRemaining, BudgetExhausted, BudgetReport
+from .fastpath import FastPathSupported, FastApplyGrammar, FASTPATH_MAX_SIZE
+from .executors import ReleaseBroadcasts
+from .autotune import ResolveTuning
+from .reporting import ReportOnPrimitiveGraphEmbedment, getPrimitiveGraphTopologyKey
+from .datacontext import (
+    MakeDataContext,
+    CheckDataContext,
+    GetSquaredX,
+    GetTotalVariance,
+    GetDataCenters,
+    GetPCA,
+    GetFingerprint,
+    GetSubsample,
+)
 
 
 def isnumeric(obj):
@@ -29,6 +55,47 @@ def isnumeric(obj):
         return False
 
 
+def EraseLeafStarElasticity(ElasticMatrix):
+    """
+    # After the first growth (3 nodes), erase the star elasticity coefficient which was initially assigned
+    # to both leaf nodes, one can erase this information after the number of nodes in the graph is > 2
+    """
+    if len(ElasticMatrix) != 3:
+        return ElasticMatrix
+
+    inds = np.where(
+        np.sum(ElasticMatrix - np.diag(np.diag(ElasticMatrix)) > 0, axis=0) == 1
+    )
+    ElasticMatrix = ElasticMatrix.copy()
+    ElasticMatrix[inds, inds] = 0
+    return ElasticMatrix
+
+
+# state of the graph after a step of ElPrincGraphSteps
+GraphSnapshot = namedtuple(
+    "GraphSnapshot",
+    ["Step", "NodePositions", "Edges", "ElasticMatrix", "ElasticEnergy", "Report"],
+)
+
+
+def MakeGraphSnapshot(Step, PG, Report=None):
+    """
+    # Immutable snapshot of the graph PG (read-only copies of the arrays and of the report)
+    """
+    Arrays = []
+    for Array in (
+        PG["NodePositions"],
+        DecodeElasticMatrix(PG["ElasticMatrix"])[0],
+        PG["ElasticMatrix"],
+    ):
+        Array = np.array(Array)
+        Array.setflags(write=False)
+        Arrays.append(Array)
+    if Report is not None:
+        Report = MappingProxyType(dict(Report))
+    return GraphSnapshot(Step, *Arrays, PG.get("ElasticEnergy"), Report)
+
+
 def ElPrincGraph(
     X,
     Lambda,
@@ -41,7 +108,7 @@ def ElPrincGraph(
     verbose=False,
     n_cores=1,
     #                 ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     CompileReport=True,
     ShowTimer=False,
     ComputeMSEP=True,
@@ -49,7 +116,7 @@ def ElPrincGraph(
     alpha=0,
     beta=0,
     Mode=1,
-    MaxBlockSize=100000000,
+    MaxBlockSize=None,
     MaxNumberOfIterations=10,
     MaxFailedOperations=float("inf"),
     MaxSteps=float("inf"),
@@ -67,6 +134,36 @@ def ElPrincGraph(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    CheckpointExtra=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    PointWeights=None,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
     """
     #' Core function to construct a principal elastic graph
@@ -91,12 +188,14 @@ def ElPrincGraph(
     #' @param n.cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOP integer, the minimum number of operations to use parallel computation
+    #' @param MinParOP \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param MaxNumberOfIterations integer, maximum number of steps to embed the nodes in the data
     #' @param eps real, minimal relative change in the position of the nodes to stop embedment 
     #' @param TrimmingRadius real, maximal distance of point from a node to affect its embedment
     #' @param NumEdges integer, the maximum nulber of edges
     #' @param Mode integer, the energy computation mode
+    #' @param MaxBlockSize integer, number of points of the distance blocks of the partitions. If None, the autotuned block size (see Autotune)
     #' @param FastSolve boolean, should FastSolve be used when fitting the points to the data?
     #' @param ClusType string, the type of cluster to use. It can gbe either "Sock" or "Fork".
     #' Currently fork clustering only works in Linux
@@ -120,6 +219,74 @@ def ElPrincGraph(
     #' @param verbose 
     #' @param AdjustElasticMatrix.Initial a penalization function to adjust the elastic matrices of the initial configuration (e.g., AdjustByConstant).
     #' If None (the default), no penalization will be used.
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param PointWeights numerical vector, the weights of the points. The MSE term of the energy is the weighted mean of the
+    #' squared distances of the points to their nodes. If None, all the points have the same weight
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param CheckpointExtra dict of additional items written to the checkpoints (e.g., the PCA basis of the data)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, the candidate
+    #' embedments are run by the executor instead of a pool of n_cores processes, and the data is broadcast once to its workers
+    #' per graph rather than sent with each candidate
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size (if MaxBlockSize is None), partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return a named list with a number of elements:
     #' \describe{
@@ -130,6 +297,12 @@ def ElPrincGraph(
     #'   \item{Lambda}{The lambda parameter used during the graph construction}
     #'   \item{Mu}{The mu parameter used during the graph construction}
     #'   \item{FastSolve}{was FastSolve being used?}
+    #'   \item{PartData}{The (partition, dists) tuple of the data on the final graph}
+    #'   \item{SquaredX}{rowSums(X^2) of the data}
+    #'   \item{BudgetReport}{With TimeBudget or MaxEvaluations, a dict with the state of the budget (Exhausted, Evaluations, Elapsed),
+    #'   the number of Steps completed and the number of nodes (NumNodes) of the returned graph}
+    #'   \item{StoppingReport}{With StoppingRule, a dict with the Rule, the Step at which it fired (None if it did not) and
+    #'   the monitored Values of each step}
     #' }
     #'
     #' @export
@@ -141,6 +314,169 @@ def ElPrincGraph(
     #' 
     #'
     """
+    Steps = ElPrincGraphSteps(
+        X=X,
+        Lambda=Lambda,
+        Mu=Mu,
+        ElasticMatrix=ElasticMatrix,
+        NodePositions=NodePositions,
+        AdjustVect=AdjustVect,
+        NumNodes=NumNodes,
+        NumEdges=NumEdges,
+        verbose=verbose,
+        n_cores=n_cores,
+        MinParOp=MinParOp,
+        CompileReport=CompileReport,
+        ShowTimer=ShowTimer,
+        ComputeMSEP=ComputeMSEP,
+        FinalEnergy=FinalEnergy,
+        alpha=alpha,
+        beta=beta,
+        Mode=Mode,
+        MaxBlockSize=MaxBlockSize,
+        MaxNumberOfIterations=MaxNumberOfIterations,
+        MaxFailedOperations=MaxFailedOperations,
+        MaxSteps=MaxSteps,
+        GrammarOptimization=GrammarOptimization,
+        eps=eps,
+        TrimmingRadius=TrimmingRadius,
+        GrowGrammars=GrowGrammars,
+        ShrinkGrammars=ShrinkGrammars,
+        GrammarOrder=GrammarOrder,
+        AvoidSolitary=AvoidSolitary,
+        EmbPointProb=EmbPointProb,
+        AdjustElasticMatrix=AdjustElasticMatrix,
+        AdjustElasticMatrix_Initial=AdjustElasticMatrix_Initial,
+        DisplayWarnings=DisplayWarnings,
+        StoreGraphEvolution=StoreGraphEvolution,
+        GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        CheckpointExtra=CheckpointExtra,
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        PointWeights=PointWeights,
+        DataContext=DataContext,
+        PartitionStrategy=PartitionStrategy,
+    )
+    while True:
+        try:
+            next(Steps)
+        except StopIteration as Result:
+            return Result.value
+
+
+def ElPrincGraphSteps(
+    X,
+    Lambda,
+    Mu,
+    ElasticMatrix,
+    NodePositions,
+    AdjustVect,
+    NumNodes=100,
+    NumEdges=float("inf"),
+    verbose=False,
+    n_cores=1,
+    #                 ClusType = "Sock",
+    MinParOp="auto",
+    CompileReport=True,
+    ShowTimer=False,
+    ComputeMSEP=True,
+    FinalEnergy="Base",
+    alpha=0,
+    beta=0,
+    Mode=1,
+    MaxBlockSize=None,
+    MaxNumberOfIterations=10,
+    MaxFailedOperations=float("inf"),
+    MaxSteps=float("inf"),
+    GrammarOptimization=True,
+    eps=0.01,
+    TrimmingRadius=float("Inf"),
+    GrowGrammars=np.array([]),
+    ShrinkGrammars=np.array([]),
+    GrammarOrder=["Grow", "Shrink"],
+    #                 FastSolve = False,
+    AvoidSolitary=False,
+    EmbPointProb=1,
+    AdjustElasticMatrix=None,
+    AdjustElasticMatrix_Initial=None,
+    DisplayWarnings=False,
+    StoreGraphEvolution=False,
+    GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    CheckpointExtra=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    PointWeights=None,
+    DataContext=None,
+    PartitionStrategy="exact",
+):
+    """
+    #' Generator version of ElPrincGraph
+    #'
+    #' The graph is constructed as by ElPrincGraph, and a GraphSnapshot is yielded after each step of the
+    #' construction (i.e., after the application of all the grammars). Iterating over the generator until
+    #' the end yields all the steps, and the dict described in ElPrincGraph is the return value of the generator
+    #' (the value of its StopIteration). The iteration can be stopped at any step.
+    #'
+    #' A GraphSnapshot is an immutable named tuple with the elements
+    #' \describe{
+    #'   \item{Step}{the number of steps done}
+    #'   \item{NodePositions}{the positions of the nodes (read-only)}
+    #'   \item{Edges}{the edges of the graph (read-only)}
+    #'   \item{ElasticMatrix}{the elastic matrix of the graph (read-only)}
+    #'   \item{ElasticEnergy}{the elastic energy of the graph}
+    #'   \item{Report}{the (numerical) report of the step, or None if no report was compiled (see CompileReport)}
+    #' }
+    #'
+    #' See ElPrincGraph for the parameters
+    """
 
     if GrammarOptimization:
         print("Using grammar optimization")
@@ -166,7 +502,10 @@ def ElPrincGraph(
         )
 
     ReportTable = []
-    SquaredX = (X ** 2).sum(axis=1, keepdims=1)
+    DataContext = CheckDataContext(DataContext, X)
+    SquaredX = GetSquaredX(DataContext)
+    Tuning = ResolveTuning(Autotune, X, MaxBlockSize)
+    MaxBlockSize = Tuning["MaxBlockSize"]
     if GPU:
         Xcp = cupy.asarray(X)
         SquaredXcp = (Xcp ** 2).sum(axis=1, keepdims=1)
@@ -180,6 +519,7 @@ def ElPrincGraph(
             Mode=Mode,
             Xcp=Xcp,
             SquaredXcp=SquaredXcp,
+            PointWeights=PointWeights,
         )[0]
     else:
         Xcp = None
@@ -192,14 +532,24 @@ def ElPrincGraph(
             eps=eps,
             ElasticMatrix=ElasticMatrix,
             Mode=Mode,
+            SquaredX=SquaredX,
+            PointWeights=PointWeights,
+            MaxBlockSize=MaxBlockSize,
+            Solver=Tuning["Solver"],
+            PartitionKernel=Tuning["PartitionKernel"],
         )[0]
 
     UpdatedPG = dict(
         ElasticMatrix=ElasticMatrix,
         NodePositions=InitNodePositions,
         AdjustVect=AdjustVect,
+        PartData=None,
     )
 
+    if ResumeFrom is not None:
+        Checkpoint = LoadCheckpoint(ResumeFrom)
+        UpdatedPG = Checkpoint["UpdatedPG"]
+
     #     if n_cores > 1:
     #         print('Copying data to shared memory for parallel processing...',end='')
     # #         ray.init(num_cpus=n_cores)
@@ -232,18 +582,21 @@ def ElPrincGraph(
     # now we grow the graph up to NumNodes
 
     if (UpdatedPG["NodePositions"].shape[0] >= NumNodes) and not (GrammarOptimization):
+        PartData = PartitionData(
+            X=X,
+            NodePositions=UpdatedPG["NodePositions"],
+            MaxBlockSize=MaxBlockSize,
+            SquaredX=SquaredX,
+            TrimmingRadius=TrimmingRadius,
+            Kernel=Tuning["PartitionKernel"],
+        )
         FinalReport = ReportOnPrimitiveGraphEmbedment(
             X=X,
             NodePositions=UpdatedPG["NodePositions"],
             ElasticMatrix=UpdatedPG["ElasticMatrix"],
-            PartData=PartitionData(
-                X=X,
-                NodePositions=UpdatedPG["NodePositions"],
-                MaxBlockSize=100000000,
-                SquaredX=SquaredX,
-                TrimmingRadius=TrimmingRadius,
-            ),
+            PartData=PartData,
             ComputeMSEP=ComputeMSEP,
+            TotalVariance=GetTotalVariance(DataContext),
         )
 
         return dict(
@@ -253,18 +606,251 @@ def ElPrincGraph(
             FinalReport=FinalReport,
             Lambda=Lambda,
             Mu=Mu,
+            Mode=Mode,
+            MaxNumberOfIterations=MaxNumberOfIterations,
+            eps=eps,
+            times={},
+            AllNodePositions={},
+            AllElasticMatrices={},
+            PartData=PartData,
+            SquaredX=SquaredX,
         )
 
     FailedOperations = 0
     Steps = 0
     FirstPrint = True
 
+    # the "HeldOut" stopping rule fits the graph on a fixed random subsample and monitors the MSE
+    # of the other points (the initial embedment above uses all the points)
+    FullX = X
+    if StoppingRule == "HeldOut":
+        FullContext = DataContext
+        nHeldOut = max(1, int(np.round(HeldOutFraction * X.shape[0])))
+        FitIndices, X, _ = GetSubsample(FullContext, X.shape[0] - nHeldOut)
+        HeldOut = np.delete(FullX, FitIndices, axis=0)
+        if PointWeights is not None:
+            PointWeights = np.reshape(PointWeights, -1)[FitIndices]
+        SquaredHeldOut = (HeldOut ** 2).sum(axis=1, keepdims=1)
+        DataContext = MakeDataContext(X)
+        SquaredX = GetSquaredX(DataContext)
+        if GPU:
+            Xcp = cupy.asarray(X)
+            SquaredXcp = (Xcp ** 2).sum(axis=1, keepdims=1)
+    elif StoppingRule is not None and StoppingRule not in ("FVE", "Elbow"):
+        raise ValueError("Stopping rule " + str(StoppingRule) + " is not defined")
+    StoppingValues = []
+    StoppingStep = None
+    FinalReport = None
+
+    # topologies visited by the grammar optimization, to stop when a cycle is detected
+    if TopologyMemo and GrammarOptimization:
+        Memo = {}
+        MemoStats = dict(CycleLength=None, AvoidedSteps=0)
+    else:
+        Memo = None
+    MemoRestored = False
+
+    GrammarParameters = dict(
+        MaxBlockSize=MaxBlockSize,
+        SquaredX=SquaredX,
+        MaxNumberOfIterations=MaxNumberOfIterations,
+        eps=eps,
+        TrimmingRadius=TrimmingRadius,
+        Mode=Mode,
+        FinalEnergy=FinalEnergy,
+        alpha=alpha,
+        beta=beta,
+        EmbPointProb=EmbPointProb,
+        AvoidSolitary=AvoidSolitary,
+        AdjustElasticMatrix=AdjustElasticMatrix,
+        DisplayWarnings=DisplayWarnings,
+        PartitionStrategy=PartitionStrategy,
+        PointWeights=PointWeights,
+        Solver=Tuning["Solver"],
+        PartitionKernel=Tuning["PartitionKernel"],
+    )
+
+    # sequence of the grammar applications of a step, used to know which
+    # grammar follows the current one when speculating
+    Operations = []
+    for OpType in GrammarOrder:
+        if OpType == "Grow":
+            Operations.extend(("Grow", k) for k in range(len(GrowGrammars)))
+        if OpType == "Shrink":
+            Operations.extend(("Shrink", k) for k in range(len(ShrinkGrammars)))
+
+    if Speculation > 0 and n_cores > 1 and not GPU:
+        Scheduler = MakeSpeculativeScheduler(
+            X, SquaredX, n_cores, Speculation, SpeculationStart
+        )
+    else:
+        Scheduler = None
+
+    if ShortlistDiagnostics:
+        Diagnostics = MakeShortlistDiagnostics()
+    else:
+        Diagnostics = None
+
+    if LazyGreedy and Scheduler is None:
+        GrammarCache = MakeGrammarCache(LazyGreedyHops, LazyGreedyMaxAge)
+    else:
+        GrammarCache = None
+
+    # compiled grammar applications
+    FastPathOk = FastPathSupported(
+        list(GrowGrammars) + list(ShrinkGrammars),
+        PartitionStrategy,
+        NumNodes,
+        GPU=GPU,
+        PointWeights=PointWeights is not None,
+        EmbPointProb=EmbPointProb < 1,
+        AvoidSolitary=AvoidSolitary,
+        AdjustElasticMatrix=AdjustElasticMatrix is not None,
+        Speculation=Scheduler is not None,
+        Executor=Executor is not None,
+        LazyGreedy=GrammarCache is not None,
+        Shortlist=ShortlistSize is not None or ShortlistDiagnostics,
+        Screening=ScreeningSize is not None,
+        GrowthBatch=GrowthBatch > 1,
+        Budget=TimeBudget is not None or MaxEvaluations is not None,
+        FinalEnergy=FinalEnergy not in ("Base", "Penalized"),
+    )
+    if FastPath == "auto":
+        # an explicit n_cores > 1 is kept: the compiled applications are serial
+        FastPath = (
+            FastPathOk
+            and n_cores <= 1
+            and X.shape[0] * NumNodes * X.shape[1] <= FASTPATH_MAX_SIZE
+        )
+    elif FastPath and not FastPathOk:
+        raise ValueError("FastPath is not supported with these grammars and parameters")
+    if FastPath:
+        FastX = np.ascontiguousarray(X, dtype=float)
+
+    def SpeculativeParent(Operation):
+        # next grammar application if a candidate of Operation is selected
+        OpType, k = Operation
+        j = Operations.index(Operation) + 1
+
+        def NextParent(NodePositions, ElasticMatrix, AdjustVect):
+            if OpType == "Grow":
+                ElasticMatrix = EraseLeafStarElasticity(ElasticMatrix)
+            if j == len(Operations):
+                nEdges = len(np.triu(ElasticMatrix, 1).nonzero()[0])
+                if Steps + 1 > MaxSteps:
+                    return None
+                if (
+                    len(NodePositions) >= NumNodes or nEdges >= NumEdges
+                ) and not GrammarOptimization:
+                    return None
+            NextOpType, NextK = Operations[j % len(Operations)]
+            if NextOpType == "Grow":
+                NextGrammar = GrowGrammars[NextK]
+            else:
+                NextGrammar = ShrinkGrammars[NextK]
+            return NodePositions, ElasticMatrix, AdjustVect, NextGrammar
+
+        return NextParent
+
+    def GrowthBatchSize(PG):
+        # number of operations of a growing grammar application, without growing beyond NumNodes
+        Remaining = NumNodes - len(PG["NodePositions"])
+        if GrowthBatchAdaptive:
+            Remaining = Remaining // 2
+        return int(max(1, min(GrowthBatch, Remaining)))
+
+    def ApplyGrammar(PG, OpType, k):
+        # with an exhausted budget, the graph is returned unchanged
+        if BudgetRemaining(Budget) == 0:
+            return PG
+        Grammar = GrowGrammars[k] if OpType == "Grow" else ShrinkGrammars[k]
+        if FastPath:
+            return FastApplyGrammar(
+                FastX,
+                SquaredX,
+                PG,
+                list(Grammar),
+                MaxNumberOfIterations=MaxNumberOfIterations,
+                eps=eps,
+                Mode=Mode,
+                TrimmingRadius=TrimmingRadius,
+                FinalEnergy=FinalEnergy,
+                alpha=alpha,
+                beta=beta,
+            )
+        if Scheduler is None:
+            NewPG = ApplyOptimalGraphGrammarOperation(
+                X,
+                PG["NodePositions"],
+                PG["ElasticMatrix"],
+                Grammar,
+                AdjustVect=PG["AdjustVect"],
+                verbose=False,
+                n_cores=n_cores,
+                MinParOp=MinParOp,
+                Xcp=Xcp,
+                SquaredXcp=SquaredXcp,
+                PartData=PG["PartData"],
+                GrammarCache=GrammarCache,
+                NodeIDs=PG.get("NodeIDs"),
+                ParentEnergy=PG.get("ElasticEnergy"),
+                ShortlistSize=ShortlistSize,
+                ShortlistDiagnostics=Diagnostics,
+                ScreeningSize=ScreeningSize,
+                ScreeningFinalists=ScreeningFinalists,
+                ScreeningGap=ScreeningGap,
+                DataContext=DataContext,
+                BatchSize=GrowthBatchSize(PG) if OpType == "Grow" else 1,
+                Budget=Budget,
+                Executor=Executor,
+                MemoryBudget=MemoryBudget,
+                CostModel=Tuning["CostModel"],
+                **GrammarParameters
+            )
+            return PG if NewPG == "budget exhausted" else NewPG
+        # the budget is only checked between the speculative grammar applications
+        return ApplyOptimalGraphGrammarOperationSpeculative(
+            Scheduler,
+            X,
+            PG["NodePositions"],
+            PG["ElasticMatrix"],
+            Grammar,
+            AdjustVect=PG["AdjustVect"],
+            NextParent=SpeculativeParent((OpType, k)),
+            PartData=PG["PartData"],
+            Budget=Budget,
+            **GrammarParameters
+        )
+
+    if TimeBudget is not None or MaxEvaluations is not None:
+        Budget = MakeBudget(TimeBudget, MaxEvaluations)
+    else:
+        Budget = None
+
     start = time.time()
     times = {}
 
     AllNodePositions = {}
     AllElasticMatrices = {}
 
+    if ResumeFrom is not None:
+        Steps = Checkpoint["Steps"]
+        FailedOperations = Checkpoint["FailedOperations"]
+        ReportTable = Checkpoint["ReportTable"]
+        FinalReport = Checkpoint["FinalReport"]
+        StoppingValues = Checkpoint["StoppingValues"]
+        times = Checkpoint["times"]
+        AllNodePositions = Checkpoint["AllNodePositions"]
+        AllElasticMatrices = Checkpoint["AllElasticMatrices"]
+        start = start - Checkpoint["Elapsed"]
+        if Memo is not None:
+            Memo, MemoStats = Checkpoint["Memo"], Checkpoint["MemoStats"]
+        if GrammarCache is not None:
+            GrammarCache = Checkpoint["GrammarCache"]
+        if Diagnostics is not None:
+            Diagnostics = Checkpoint["Diagnostics"]
+        np.random.set_state(Checkpoint["RandomState"])
+
     while (UpdatedPG["NodePositions"].shape[0] < NumNodes) or GrammarOptimization:
         nEdges = len(np.triu(UpdatedPG["ElasticMatrix"], 1).nonzero()[0])
         if (
@@ -280,6 +866,37 @@ def ElPrincGraph(
                 print("Nodes = ", end=" ")
                 FirstPrint = False
             print(UpdatedPG["NodePositions"].shape[0], end=" ")
+        if Memo is not None:
+            Key = getPrimitiveGraphTopologyKey(UpdatedPG["ElasticMatrix"])
+            if Key in Memo:
+                # the topology was already visited: the next steps would repeat the cycle,
+                # return the stored embedment of the cycle with the lowest energy
+                Cycle = [v for v in Memo.values() if v["Step"] >= Memo[Key]["Step"]]
+                Best = min(Cycle, key=lambda v: v["Energy"])
+                if Best["Energy"] < UpdatedPG.get("ElasticEnergy", np.inf):
+                    UpdatedPG = dict(
+                        UpdatedPG,
+                        NodePositions=Best["NodePositions"].copy(),
+                        ElasticMatrix=Best["ElasticMatrix"].copy(),
+                        AdjustVect=list(Best["AdjustVect"]),
+                        ElasticEnergy=Best["Energy"],
+                        PartData=None,
+                    )
+                    MemoRestored = True
+                MemoStats.update(
+                    CycleLength=Steps - Memo[Key]["Step"],
+                    AvoidedSteps=MaxSteps + 1 - Steps,
+                )
+                break
+            Memo[Key] = dict(
+                Step=Steps,
+                NodePositions=UpdatedPG["NodePositions"].copy(),
+                ElasticMatrix=UpdatedPG["ElasticMatrix"].copy(),
+                AdjustVect=list(UpdatedPG["AdjustVect"]),
+                Energy=UpdatedPG.get("ElasticEnergy", np.inf),
+                Operations=[],
+            )
+
         OldPG = copy.deepcopy(UpdatedPG)
 
         for OpType in GrammarOrder:
@@ -290,104 +907,67 @@ def ElPrincGraph(
                         print("Growing")
                         t = time.time()
 
-                    UpdatedPG = ApplyOptimalGraphGrammarOperation(
-                        X,
-                        UpdatedPG["NodePositions"],
-                        UpdatedPG["ElasticMatrix"],
-                        GrowGrammars[k],
-                        MaxBlockSize=MaxBlockSize,
-                        AdjustVect=UpdatedPG["AdjustVect"],
-                        SquaredX=SquaredX,
-                        verbose=False,
-                        MaxNumberOfIterations=MaxNumberOfIterations,
-                        eps=eps,
-                        TrimmingRadius=TrimmingRadius,
-                        Mode=Mode,
-                        FinalEnergy=FinalEnergy,
-                        alpha=alpha,
-                        beta=beta,
-                        EmbPointProb=EmbPointProb,
-                        AvoidSolitary=AvoidSolitary,
-                        AdjustElasticMatrix=AdjustElasticMatrix,
-                        DisplayWarnings=DisplayWarnings,
-                        n_cores=n_cores,
-                        MinParOp=MinParOp,
-                        Xcp=Xcp,
-                        SquaredXcp=SquaredXcp,
-                    )
+                    UpdatedPG = ApplyGrammar(UpdatedPG, "Grow", k)
 
                     if UpdatedPG == "failed operation":
                         print("failed operation")
                         FailedOperations += 1
                         UpdatedPG = copy.deepcopy(OldPG)
+                        if GrammarCache is not None:
+                            GrammarCache["Entries"].clear()
                         break
                     else:
                         FailedOperations = 0
-                        if len(UpdatedPG["NodePositions"]) == 3:
-                            # this is needed to erase the star elasticity coefficient which was initially assigned to both leaf nodes,
-                            # one can erase this information after the number of nodes in the graph is > 2
-
-                            inds = np.where(
-                                np.sum(
-                                    UpdatedPG["ElasticMatrix"]
-                                    - np.diag(np.diag(UpdatedPG["ElasticMatrix"]))
-                                    > 0,
-                                    axis=0,
-                                )
-                                == 1
-                            )
-
-                            UpdatedPG["ElasticMatrix"][inds, inds] = 0
+                        if Memo is not None:
+                            Memo[Key]["Operations"].append(UpdatedPG.get("Operation"))
+                        UpdatedPG["ElasticMatrix"] = EraseLeafStarElasticity(
+                            UpdatedPG["ElasticMatrix"]
+                        )
 
                     if ShowTimer:
                         elapsed = time.time() - t
                         print(np.round(elapsed, 4))
 
+                    if BudgetExhausted(Budget):
+                        break
+
+            if BudgetExhausted(Budget):
+                break
+
             if OpType == "Shrink" and len(ShrinkGrammars) > 0:
                 for k in range(ShrinkGrammars.shape[0]):
                     if ShowTimer:
                         print("Shrinking")
                         t = time.time()
-                    UpdatedPG = ApplyOptimalGraphGrammarOperation(
-                        X,
-                        UpdatedPG["NodePositions"],
-                        UpdatedPG["ElasticMatrix"],
-                        ShrinkGrammars[k],
-                        MaxBlockSize=MaxBlockSize,
-                        AdjustVect=UpdatedPG["AdjustVect"],
-                        SquaredX=SquaredX,
-                        verbose=False,
-                        MaxNumberOfIterations=MaxNumberOfIterations,
-                        eps=eps,
-                        TrimmingRadius=TrimmingRadius,
-                        Mode=Mode,
-                        FinalEnergy=FinalEnergy,
-                        alpha=alpha,
-                        beta=beta,
-                        EmbPointProb=EmbPointProb,
-                        AvoidSolitary=AvoidSolitary,
-                        AdjustElasticMatrix=AdjustElasticMatrix,
-                        DisplayWarnings=DisplayWarnings,
-                        n_cores=n_cores,
-                        MinParOp=MinParOp,
-                        Xcp=Xcp,
-                        SquaredXcp=SquaredXcp,
-                    )
+                    UpdatedPG = ApplyGrammar(UpdatedPG, "Shrink", k)
 
                     if UpdatedPG == "failed operation":
                         print("failed operation")
                         FailedOperations += 1
                         UpdatedPG = copy.deepcopy(OldPG)
+                        if GrammarCache is not None:
+                            GrammarCache["Entries"].clear()
                         break
                     else:
                         FailedOperations = 0
+                        if Memo is not None:
+                            Memo[Key]["Operations"].append(UpdatedPG.get("Operation"))
 
                     if ShowTimer:
                         elapsed = time.time() - t
                         print(np.round(elapsed, 4))
 
-        if CompileReport:
-            if GPU:
+                    if BudgetExhausted(Budget):
+                        break
+
+        # the report of a truncated step is skipped
+        if BudgetExhausted(Budget):
+            break
+
+        if CompileReport or StoppingRule in ("FVE", "Elbow"):
+            if UpdatedPG["PartData"] is not None:
+                PartData = UpdatedPG["PartData"]
+            elif GPU:
                 PartData = PartitionData_cp(
                     Xcp,
                     NodePositions=UpdatedPG["NodePositions"],
@@ -399,9 +979,10 @@ def ElPrincGraph(
                 PartData = PartitionData(
                     X,
                     NodePositions=UpdatedPG["NodePositions"],
-                    MaxBlockSize=1000000000,
+                    MaxBlockSize=MaxBlockSize,
                     SquaredX=SquaredX,
                     TrimmingRadius=TrimmingRadius,
+                    Kernel=Tuning["PartitionKernel"],
                 )
             tReport = ReportOnPrimitiveGraphEmbedment(
                 X=X,
@@ -409,21 +990,53 @@ def ElPrincGraph(
                 ElasticMatrix=UpdatedPG["ElasticMatrix"],
                 PartData=PartData,
                 ComputeMSEP=ComputeMSEP,
+                TotalVariance=GetTotalVariance(DataContext),
             )
 
             FinalReport = copy.deepcopy(tReport)
             for k, v in tReport.items():
                 if isnumeric(v):
                     tReport[k] = str(np.round(v, 4))
-            ReportTable.append(tReport)
+            if CompileReport:
+                ReportTable.append(tReport)
 
             if verbose:
                 print("\t".join(tReport.values()))
+
+        if StoppingRule == "FVE":
+            StoppingValues.append(FinalReport["FVE"])
+        elif StoppingRule == "Elbow":
+            StoppingValues.append(FinalReport["ENERGY"])
+        elif StoppingRule == "HeldOut":
+            StoppingValues.append(
+                np.mean(
+                    PartitionData(
+                        HeldOut,
+                        NodePositions=UpdatedPG["NodePositions"],
+                        MaxBlockSize=MaxBlockSize,
+                        SquaredX=SquaredHeldOut,
+                        TrimmingRadius=TrimmingRadius,
+                    )[1]
+                )
+            )
         #                 print("\n")
 
         # Count the execution steps
         Steps += 1
 
+        Snapshot = MakeGraphSnapshot(
+            Steps, UpdatedPG, FinalReport if CompileReport else None
+        )
+        try:
+            yield Snapshot
+        except GeneratorExit:
+            # the consumer stopped the iteration
+            if Scheduler is not None:
+                CloseSpeculativeScheduler(Scheduler)
+            if Executor is not None:
+                ReleaseBroadcasts(Executor)
+            raise
+
         # If the number of execution steps is larger than MaxSteps stop the algorithm
         if Steps > MaxSteps or FailedOperations > MaxFailedOperations:
             break
@@ -437,36 +1050,165 @@ def ElPrincGraph(
                 "ElasticMatrix"
             ]
 
-    if not verbose:
-        if not CompileReport:
-            if GPU:
-                tReport = ReportOnPrimitiveGraphEmbedment(
-                    X=X,
-                    NodePositions=UpdatedPG["NodePositions"],
-                    ElasticMatrix=UpdatedPG["ElasticMatrix"],
-                    PartData=PartitionData_cp(
-                        Xcp=Xcp,
-                        NodePositions=UpdatedPG["NodePositions"],
-                        SquaredXcp=SquaredXcp,
-                        TrimmingRadius=TrimmingRadius,
-                        MaxBlockSize=MaxBlockSize,
-                    ),
-                    ComputeMSEP=ComputeMSEP,
+        if StoppingRule is not None and StoppingRuleFired(
+            StoppingRule, StoppingValues, StoppingWindow, StoppingThreshold
+        ):
+            StoppingStep = Steps
+            if verbose:
+                print("\nStopping rule " + StoppingRule + " fired at step " + str(Steps))
+            break
+
+        if CheckpointFile is not None and Steps % CheckpointEvery == 0:
+            SaveCheckpoint(
+                CheckpointFile,
+                dict(
+                    CheckpointExtra if CheckpointExtra is not None else {},
+                    UpdatedPG=UpdatedPG,
+                    Steps=Steps,
+                    FailedOperations=FailedOperations,
+                    ReportTable=ReportTable,
+                    FinalReport=FinalReport,
+                    StoppingValues=StoppingValues,
+                    times=times,
+                    AllNodePositions=AllNodePositions,
+                    AllElasticMatrices=AllElasticMatrices,
+                    Elapsed=time.time() - start,
+                    Memo=Memo,
+                    MemoStats=MemoStats if Memo is not None else None,
+                    GrammarCache=GrammarCache,
+                    Diagnostics=Diagnostics,
+                    RandomState=np.random.get_state(),
+                ),
+            )
+
+    if Executor is not None:
+        ReleaseBroadcasts(Executor)
+
+    if Scheduler is not None:
+        CloseSpeculativeScheduler(Scheduler)
+        SpeculationStats = SpeculationReport(Scheduler)
+        if verbose:
+            print(
+                "Speculation: {Hits} hits out of {Steps} steps, {Launched} batches launched, {Cancelled} cancelled".format(
+                    **SpeculationStats
                 )
-            else:
-                tReport = ReportOnPrimitiveGraphEmbedment(
-                    X=X,
-                    NodePositions=UpdatedPG["NodePositions"],
-                    ElasticMatrix=UpdatedPG["ElasticMatrix"],
-                    PartData=PartitionData(
-                        X=X,
-                        NodePositions=UpdatedPG["NodePositions"],
-                        SquaredX=SquaredX,
-                        TrimmingRadius=TrimmingRadius,
-                        MaxBlockSize=MaxBlockSize,
-                    ),
-                    ComputeMSEP=ComputeMSEP,
+            )
+    else:
+        SpeculationStats = None
+
+    if GrammarCache is not None:
+        LazyGreedyStats = GrammarCacheReport(GrammarCache)
+        if verbose:
+            print(
+                "Lazy greedy: {Evaluated} candidates embedded out of {Candidates}".format(
+                    **LazyGreedyStats
+                )
+            )
+    else:
+        LazyGreedyStats = None
+
+    if Diagnostics is not None:
+        ShortlistStats = ShortlistReport(Diagnostics)
+        if verbose:
+            print(
+                "Shortlist: optimal candidate shortlisted in {Hits} out of {Steps} grammar applications".format(
+                    **ShortlistStats
+                )
+            )
+    else:
+        ShortlistStats = None
+
+    if Memo is not None:
+        TopologyMemoStats = dict(
+            MemoStats,
+            Topologies=len(Memo),
+            Memo={
+                k: dict(Step=v["Step"], Energy=v["Energy"], Operations=v["Operations"])
+                for k, v in Memo.items()
+            },
+        )
+        if verbose and MemoStats["CycleLength"] is not None:
+            print(
+                "Topology cycle of {CycleLength} steps detected, {AvoidedSteps} steps avoided".format(
+                    **MemoStats
+                )
+            )
+    else:
+        TopologyMemoStats = None
+
+    if Budget is not None:
+        BudgetStats = dict(
+            BudgetReport(Budget),
+            Steps=Steps,
+            NumNodes=UpdatedPG["NodePositions"].shape[0],
+        )
+        if verbose and Budget["Exhausted"]:
+            print(
+                "\nBudget exhausted after {Steps} steps and {Evaluations} embedments ({Elapsed:.2f}s)".format(
+                    **BudgetStats
                 )
+            )
+    else:
+        BudgetStats = None
+
+    if StoppingRule is not None:
+        StoppingStats = dict(Rule=StoppingRule, Step=StoppingStep, Values=StoppingValues)
+    else:
+        StoppingStats = None
+
+    if StoppingRule == "HeldOut":
+        # the final graph is reported on all the points
+        X = FullX
+        DataContext = FullContext
+        SquaredX = GetSquaredX(DataContext)
+        if GPU:
+            Xcp = cupy.asarray(X)
+            SquaredXcp = (Xcp ** 2).sum(axis=1, keepdims=1)
+        UpdatedPG["PartData"] = None
+
+    # partition of the data on the final graph (only missing if no grammar
+    # operation succeeded)
+    if UpdatedPG["PartData"] is None:
+        if GPU:
+            UpdatedPG["PartData"] = PartitionData_cp(
+                Xcp=Xcp,
+                NodePositions=UpdatedPG["NodePositions"],
+                SquaredXcp=SquaredXcp,
+                TrimmingRadius=TrimmingRadius,
+                MaxBlockSize=MaxBlockSize,
+            )
+        else:
+            UpdatedPG["PartData"] = PartitionData(
+                X=X,
+                NodePositions=UpdatedPG["NodePositions"],
+                SquaredX=SquaredX,
+                TrimmingRadius=TrimmingRadius,
+                MaxBlockSize=MaxBlockSize,
+                Kernel=Tuning["PartitionKernel"],
+            )
+
+    if MemoRestored or StoppingRule == "HeldOut" or BudgetExhausted(Budget):
+        # the graph was restored from the topology memo, fitted on a subsample
+        # or not reported because the budget was exhausted
+        FinalReport = ReportOnPrimitiveGraphEmbedment(
+            X=X,
+            NodePositions=UpdatedPG["NodePositions"],
+            ElasticMatrix=UpdatedPG["ElasticMatrix"],
+            PartData=UpdatedPG["PartData"],
+            ComputeMSEP=ComputeMSEP,
+            TotalVariance=GetTotalVariance(DataContext),
+        )
+
+    if not verbose:
+        if not CompileReport:
+            tReport = ReportOnPrimitiveGraphEmbedment(
+                X=X,
+                NodePositions=UpdatedPG["NodePositions"],
+                ElasticMatrix=UpdatedPG["ElasticMatrix"],
+                PartData=UpdatedPG["PartData"],
+                ComputeMSEP=ComputeMSEP,
+                TotalVariance=GetTotalVariance(DataContext),
+            )
 
             FinalReport = copy.deepcopy(tReport)
             for k, v in tReport.items():
@@ -474,7 +1216,7 @@ def ElPrincGraph(
                     tReport[k] = str(np.round(v, 4))
 
         else:
-            tReport = ReportTable[-1]
+            tReport = ReportTable[-1] if len(ReportTable) > 0 else FinalReport
         if verbose:
             print("\n")
             print(
@@ -484,7 +1226,7 @@ def ElPrincGraph(
             print("\n")
 
     if CompileReport:
-        ReportTable = {k: [d[k] for d in ReportTable] for k in ReportTable[0]}
+        ReportTable = {k: [d[k] for d in ReportTable] for k in FinalReport}
 
     #     if n_cores > 1:
     #         ray.shutdown()
@@ -502,6 +1244,14 @@ def ElPrincGraph(
         times=times,
         AllNodePositions=AllNodePositions,
         AllElasticMatrices=AllElasticMatrices,
+        PartData=UpdatedPG["PartData"],
+        SquaredX=SquaredX,
+        SpeculationReport=SpeculationStats,
+        LazyGreedyReport=LazyGreedyStats,
+        ShortlistReport=ShortlistStats,
+        TopologyMemoReport=TopologyMemoStats,
+        StoppingReport=StoppingStats,
+        BudgetReport=BudgetStats,
     )
 
 
@@ -524,12 +1274,13 @@ def computeElasticPrincipalGraph(
     verbose=False,
     ShowTimer=False,
     ReduceDimension=None,
+    PCAAlgorithm="randomized",
     # drawAccuracyComplexity = True,
     # drawPCAView = True,
     # drawEnergy = True,
     n_cores=1,
     # ClusType = "Sock",
-    MinParOp=20,
+    MinParOp="auto",
     Mode=1,
     FinalEnergy="Base",
     alpha=0,
@@ -550,6 +1301,35 @@ def computeElasticPrincipalGraph(
     DisplayWarnings=False,
     StoreGraphEvolution=False,
     GPU=False,
+    Autotune=False,
+    MemoryBudget=None,
+    Executor=None,
+    FastPath="auto",
+    CheckpointFile=None,
+    CheckpointEvery=1,
+    ResumeFrom=None,
+    TimeBudget=None,
+    MaxEvaluations=None,
+    StoppingRule=None,
+    StoppingWindow=3,
+    StoppingThreshold=0.001,
+    HeldOutFraction=0.1,
+    TopologyMemo=False,
+    GrowthBatch=1,
+    GrowthBatchAdaptive=True,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    ShortlistSize=None,
+    ShortlistDiagnostics=False,
+    LazyGreedy=False,
+    LazyGreedyHops=2,
+    LazyGreedyMaxAge=10,
+    Speculation=0,
+    SpeculationStart=0.5,
+    PointWeights=None,
+    DataContext=None,
+    PartitionStrategy="exact",
 ):
 
     """
@@ -567,6 +1347,9 @@ def computeElasticPrincipalGraph(
     #' @param ComputeMSEP boolean, should MSEP be computed when building the report?
     #' @param ReduceDimension integer vector, vector of principal components to retain when performing
     #' dimensionality reduction. If None all the components will be used
+    #' @param PCAAlgorithm string, the PCA used when ReduceDimension is a fraction of variance or retains more than 75% of
+    #' the components: "randomized" (see RandomizedPCA, without the covariance matrix) or "full" (eigendecomposition of
+    #' the covariance matrix)
     #' @param InitNodePositions numerical 2D matrix, the k-by-m matrix with k m-dimensional positions of the nodes
     #' in the initial step
     #' @param InitEdges numerical 2D matrix, the e-by-2 matrix with e end-points of the edges connecting the nodes
@@ -579,7 +1362,8 @@ def computeElasticPrincipalGraph(
     #' @param n_cores either an integer (indicating the number of cores to used for the creation of a cluster) or 
     #' cluster structure returned, e.g., by makeCluster. If a cluster structure is used, all the nodes must contains X
     #' (this is done using clusterExport)
-    #' @param MinParOp integer, the minimum number of operations to use parallel computation
+    #' @param MinParOp \"auto\" or integer, how the number of processes embedding the candidates is chosen when n_cores > 1 (see PlanEmbedments).
+    #' \"auto\" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
     #' @param GrowGrammars list of strings, the grammar to be used in the growth step
     #' @param ShrinkGrammars list of strings, the grammar to be used in the shrink step
     #' @param NumEdges integer, the maximum nulber of edges
@@ -600,6 +1384,73 @@ def computeElasticPrincipalGraph(
     #' If None (the default), no penalization will be used.
     #' @param Lambda.Initial 
     #' @param Mu.Initial 
+    #' @param PartitionStrategy string, how points are assigned to the nodes during the embedment. "exact" scans all the nodes,
+    #' "graph" searches along the graph edges starting from the previous nearest node (with a periodic exact scan), "auto"
+    #' uses "graph" for large graphs. See PrimitiveElasticGraphEmbedment
+    #' @param PointWeights numerical vector, the weights of the points. The MSE term of the energy is the weighted mean of the
+    #' squared distances of the points to their nodes. If None, all the points have the same weight
+    #' @param DataContext a dataset context created by MakeDataContext on the data matrix. It caches rowSums(X^2),
+    #' the total variance, the centering vector and the PCA basis, so that they are computed only once. If None, it will be created
+    #' @param Speculation integer, if > 0 (and n_cores > 1), the next grammar application is started speculatively on the
+    #' Speculation best candidates of the current one while its last candidates are still being embedded. The speculation
+    #' is kept if the optimal candidate is among them and cancelled otherwise. The result does not depend on this parameter
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates that must be embedded before speculating
+    #' @param LazyGreedy boolean, should the candidates be evaluated lazily across the grammar applications? The energy changes
+    #' of the evaluated candidates are cached, and a candidate is only embedded again if the graph was modified within LazyGreedyHops
+    #' edges of it, if its cached value is older than LazyGreedyMaxAge grammar applications or if it could improve the best energy found.
+    #' This is an approximation that can reduce the number of embedments by a large factor for large graphs. Not used with Speculation
+    #' @param LazyGreedyHops integer, radius (in edges) of the region around the optimal operation where the cached values are invalidated
+    #' @param LazyGreedyMaxAge integer, number of grammar applications after which a cached value is re-evaluated
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each grammar operation are ranked by a
+    #' cheap proxy of their energy decrease (local MSE, edge stretching energy, number of points) and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded. Not used with Speculation
+    #' @param ShortlistDiagnostics boolean, if True all the candidates are embedded and the rank of the optimal candidate among the
+    #' proxy-ranked candidates is reported in ShortlistReport, to tune ShortlistSize
+    #' @param ScreeningSize integer. If not None, the candidates of each grammar application are first embedded on a fixed random
+    #' subsample of ScreeningSize points, and only the ScreeningFinalists best ones are embedded on the full data. Not used with Speculation
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, relative energy gap below which the leading candidates are screened again on a subsample twice as large
+    #' @param GrowthBatch integer, maximum number of nodes added by a growing grammar application. If > 1, the best operations that add a node
+    #' in disjoint regions of the graph are applied together and the graph is embedded once. Not used with Speculation
+    #' @param GrowthBatchAdaptive boolean, should the batch be limited to half of the number of nodes still to be added (so that it shrinks
+    #' as the graph approaches NumNodes)? Otherwise it is limited to the number of nodes still to be added
+    #' @param TopologyMemo boolean, with GrammarOptimization, should the visited topologies be memorized? When a topology is visited again,
+    #' the grammar optimization is in a cycle: it is stopped and the graph of the cycle with the lowest energy is returned.
+    #' The memo and the number of avoided steps are returned in TopologyMemoReport
+    #' @param StoppingRule string, adaptive stopping rule of the growth (the graph stops growing before NumNodes when it fires). Can be
+    #' "FVE" (the relative gain of FVE over the last StoppingWindow steps is below StoppingThreshold), "Elbow" (the elbow of the energy curve
+    #' has not moved for StoppingWindow steps) or "HeldOut" (the MSE of a held-out fraction HeldOutFraction of the points, which are not used
+    #' for the fit, has not decreased for StoppingWindow steps). If None, the growth stops at NumNodes. The step at which the rule fired is
+    #' returned in StoppingReport
+    #' @param StoppingWindow integer, number of steps considered by the stopping rule
+    #' @param StoppingThreshold numeric, minimal relative FVE gain over StoppingWindow steps of the "FVE" rule
+    #' @param HeldOutFraction numeric between 0 and 1, fraction of the points held out by the "HeldOut" rule
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed for the construction of each graph. When it runs out, the candidates
+    #' of the current grammar application that were not embedded yet are skipped, the report of the step is skipped and the best graph reached
+    #' so far is returned. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed for the construction of each graph (same behaviour as TimeBudget).
+    #' With Speculation, the budget is checked between the grammar applications and the embedments of the cancelled speculative batches are also charged.
+    #' The state of the budget and how far the construction got are returned in BudgetReport
+    #' @param CheckpointFile string, if not None, the state of the construction (graph, step counters, report, random state and PCA basis)
+    #' is written to this file every CheckpointEvery steps. The file is replaced atomically
+    #' @param CheckpointEvery integer, number of steps between two checkpoints
+    #' @param ResumeFrom string, path of a checkpoint written with CheckpointFile. The construction is resumed from the checkpointed step,
+    #' and gives the same result as the uninterrupted construction (the other parameters must be the same). Checkpoints cover the construction
+    #' of a single graph (nReps = 1, without MultiresolutionLevels)
+    #' @param FastPath boolean or "auto", should the grammar applications be compiled? Each application (candidates, embedments
+    #' and selection) then runs in a single compiled call (see FastApplyOptimalGraphGrammarOperation). Only the operations of
+    #' FASTPATH_OPERATIONS with exact partitions are supported, without point weights, AvoidSolitary, AdjustElasticMatrix, GPU,
+    #' Speculation, Executor, LazyGreedy, ShortlistSize, ScreeningSize, GrowthBatch or budgets. "auto" uses it when it is supported
+    #' and n * NumNodes * m is at most FASTPATH_MAX_SIZE, and only with n_cores = 1. The compiled applications are serial: FastPath=True
+    #' runs them on a single core whatever n_cores
+    #' @param Executor executor created by MakeExecutor ("serial", "multiprocessing" or "dask" backend). If not None, the candidate
+    #' embedments are run by the executor instead of a pool of n_cores processes, and the data is broadcast once to its workers
+    #' per graph rather than sent with each candidate
+    #' @param MemoryBudget numeric, memory (in bytes) available to the worker processes when n_cores > 1. It limits the number of
+    #' processes embedding the candidates (or constructing the replicas), see PlanEmbedments and PlanWorkers. If None, the memory is not limited
+    #' @param Autotune boolean, should the partition block size, partition kernel, solver of the node positions
+    #' and cost model of the parallel embedments be taken from the autotuned configuration of this machine (see GetAutotune)? The
+    #' micro-benchmarks are run on first use and cached. If False (default), the untuned defaults (AUTOTUNE_DEFAULTS) are used
     #'
     #' @return a named list with a number of elements:
     #' \describe{
@@ -611,6 +1462,8 @@ def computeElasticPrincipalGraph(
     #'   \item{Lambda}{The lambda parameter used during the graph construction}
     #'   \item{Mu}{The mu parameter used during the graph construction}
     #'   \item{FastSolve}{was FastSolve being used?}
+    #'   \item{PartData}{The (partition, dists) tuple of Data on the final graph, computed with TrimmingRadius}
+    #'   \item{SquaredX}{rowSums(Data^2)}
     #' }
     #'
     #' @export
@@ -626,6 +1479,17 @@ def computeElasticPrincipalGraph(
     ST = datetime.datetime.today().strftime("%Y-%m-%d-%H:%M:%S")
     t = time.time()
 
+    InputData = Data
+    DataContext = CheckDataContext(DataContext, Data)
+    if Do_PCA:
+        # the centers, total variance and PCA of the data are taken from the preprocessing cache
+        GetFingerprint(DataContext)
+
+    if ResumeFrom is not None:
+        ResumeFrom = LoadCheckpoint(ResumeFrom)
+        # PCA basis of the interrupted construction (the randomized PCA is not reproducible)
+        DataContext["PCA"].update(ResumeFrom.get("PCA", {}))
+
     if ReduceDimension is None:
         ReduceDimension = np.array(range(np.min(Data.shape)))
 
@@ -635,7 +1499,7 @@ def computeElasticPrincipalGraph(
             print("Dimensionality reduction will be ignored")
         ReduceDimension = np.array(range(np.min(Data.shape)))
 
-    DataCenters = np.mean(Data, axis=0)
+    DataCenters = GetDataCenters(DataContext)
     if CenterData:
         Data = Data - DataCenters
         InitNodePositions = InitNodePositions - DataCenters
@@ -643,14 +1507,36 @@ def computeElasticPrincipalGraph(
     if Do_PCA:
         if verbose:
             print("Performing PCA")
+        if PCAAlgorithm not in ("randomized", "full"):
+            raise ValueError("PCA algorithm " + str(PCAAlgorithm) + " is not defined")
 
         if isinstance(ReduceDimension, float):
-            if ReduceDimension < 1:
+            if ReduceDimension < 1 and PCAAlgorithm == "randomized":
+                if verbose:
+                    print(
+                        "Dimensionality reduction via ratio of explained variance (randomized PCA will be computed)"
+                    )
+                vglobal, PCAData, explainedVariances = GetPCA(
+                    DataContext,
+                    ("RandomizedPCA", CenterData, ReduceDimension),
+                    lambda: RandomizedPCA(
+                        Data,
+                        VarianceFraction=ReduceDimension,
+                        TotalVariance=GetTotalVariance(DataContext),
+                    ),
+                )
+                ReduceDimension = range(len(explainedVariances))
+                perc = explainedVariances.sum() / GetTotalVariance(DataContext) * 100
+
+                InitNodePositions = InitNodePositions.dot(vglobal)
+            elif ReduceDimension < 1:
                 if verbose:
                     print(
                         "Dimensionality reduction via ratio of explained variance (full PCA will be computed)"
                     )
-                vglobal, PCAData, explainedVariances = PCA(Data)
+                vglobal, PCAData, explainedVariances = GetPCA(
+                    DataContext, ("PCA", CenterData), lambda: PCA(Data)
+                )
                 ReduceDimension = range(
                     np.min(
                         np.where(
@@ -679,10 +1565,35 @@ def computeElasticPrincipalGraph(
                 ReduceDimension = [
                     i for i in ReduceDimension if i in range(min(Data.shape))
                 ]
-            if max(ReduceDimension + 1) > min(Data.shape) * 0.75:
+            if (
+                max(ReduceDimension + 1) > min(Data.shape) * 0.75
+                and PCAAlgorithm == "randomized"
+            ):
+                if verbose:
+                    print("Using randomized PCA")
+                vglobal, PCAData, explainedVariances = GetPCA(
+                    DataContext,
+                    ("RandomizedPCA", CenterData, max(ReduceDimension + 1)),
+                    lambda: RandomizedPCA(
+                        Data,
+                        n_components=max(ReduceDimension + 1),
+                        TotalVariance=GetTotalVariance(DataContext),
+                    ),
+                )
+                perc = (
+                    explainedVariances[ReduceDimension].sum()
+                    / GetTotalVariance(DataContext)
+                    * 100
+                )
+
+                InitNodePositions = InitNodePositions.dot(vglobal)
+
+            elif max(ReduceDimension + 1) > min(Data.shape) * 0.75:
                 if verbose:
                     print("Using standard PCA")
-                vglobal, PCAData, explainedVariances = PCA(Data)
+                vglobal, PCAData, explainedVariances = GetPCA(
+                    DataContext, ("PCA", CenterData), lambda: PCA(Data)
+                )
                 perc = (
                     explainedVariances[ReduceDimension].sum()
                     / explainedVariances.sum()
@@ -696,13 +1607,21 @@ def computeElasticPrincipalGraph(
                     print("Centering data and using PCA with truncated SVD")
                 if not CenterData:
                     # if data was not centered, center it (for SVD)
-                    DataCenters = np.mean(Data, axis=0)
+                    DataCenters = GetDataCenters(DataContext)
                     Data = Data - DataCenters
                     InitNodePositions = InitNodePositions - DataCenters
-                PCAData, explainedVariances, U, S, Vt = TruncPCA(
-                    Data, algorithm="randomized", n_components=max(ReduceDimension + 1)
+                PCAData, explainedVariances, U, S, Vt = GetPCA(
+                    DataContext,
+                    ("TruncPCA", max(ReduceDimension + 1)),
+                    lambda: TruncPCA(
+                        Data,
+                        algorithm="randomized",
+                        n_components=max(ReduceDimension + 1),
+                    ),
+                )
+                ExpVariance = (
+                    GetTotalVariance(DataContext) * (len(Data) - 1) / len(Data)
                 )
-                ExpVariance = np.sum(np.var(Data, axis=0))
                 perc = np.sum(explainedVariances) / ExpVariance * 100
 
                 vglobal = Vt.T
@@ -717,6 +1636,15 @@ def computeElasticPrincipalGraph(
     else:
         X = Data
 
+    # context of the data used to fit the graph
+    if X is InputData:
+        XContext = DataContext
+    else:
+        XContext = MakeDataContext(X)
+        if not Do_PCA or len(ReduceDimension) >= min(Data.shape):
+            # centering and rotations do not change the total variance
+            XContext["TotalVariance"] = GetTotalVariance(DataContext)
+
     if Lambda_Initial is None:
         Lambda_Initial = Lambda
 
@@ -788,6 +1716,36 @@ def computeElasticPrincipalGraph(
         MinParOp=MinParOp,
         StoreGraphEvolution=StoreGraphEvolution,
         GPU=GPU,
+        Autotune=Autotune,
+        MemoryBudget=MemoryBudget,
+        Executor=Executor,
+        FastPath=FastPath,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=CheckpointEvery,
+        ResumeFrom=ResumeFrom,
+        CheckpointExtra=dict(PCA=DataContext["PCA"]),
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        StoppingRule=StoppingRule,
+        StoppingWindow=StoppingWindow,
+        StoppingThreshold=StoppingThreshold,
+        HeldOutFraction=HeldOutFraction,
+        TopologyMemo=TopologyMemo,
+        GrowthBatch=GrowthBatch,
+        GrowthBatchAdaptive=GrowthBatchAdaptive,
+        ScreeningSize=ScreeningSize,
+        ScreeningFinalists=ScreeningFinalists,
+        ScreeningGap=ScreeningGap,
+        ShortlistSize=ShortlistSize,
+        ShortlistDiagnostics=ShortlistDiagnostics,
+        LazyGreedy=LazyGreedy,
+        LazyGreedyHops=LazyGreedyHops,
+        LazyGreedyMaxAge=LazyGreedyMaxAge,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        PointWeights=PointWeights,
+        DataContext=XContext,
+        PartitionStrategy=PartitionStrategy,
     )
 
     NodePositions = ElData["NodePositions"]
@@ -807,6 +1765,24 @@ def computeElasticPrincipalGraph(
         for k, nodep in AllNodePositions.items():
             AllNodePositions[k] = nodep.dot(vglobal[:, ReduceDimension].T)
 
+    # Centering and a full PCA rotation preserve the distances, so the partition
+    # of X is also the partition of Data. It is recomputed only if dimensions were dropped
+    if X is InputData:
+        PartData, SquaredX = ElData["PartData"], ElData["SquaredX"]
+    else:
+        SquaredX = GetSquaredX(DataContext)
+        if Do_PCA and len(ReduceDimension) < min(Data.shape):
+            PartData = PartitionData(
+                X=InputData,
+                NodePositions=NodePositions
+                + (DataCenters if Data is not InputData else 0),
+                MaxBlockSize=ResolveTuning(Autotune, InputData)["MaxBlockSize"],
+                SquaredX=SquaredX,
+                TrimmingRadius=TrimmingRadius,
+            )
+        else:
+            PartData = ElData["PartData"]
+
     EndTimer = time.time() - t
     if verbose:
         print(np.round(EndTimer, 4), " seconds elapsed")
@@ -828,6 +1804,14 @@ def computeElasticPrincipalGraph(
         times=ElData["times"],
         AllNodePositions=AllNodePositions,
         AllElasticMatrices=ElData["AllElasticMatrices"],
+        PartData=PartData,
+        SquaredX=SquaredX,
+        SpeculationReport=ElData.get("SpeculationReport"),
+        LazyGreedyReport=ElData.get("LazyGreedyReport"),
+        ShortlistReport=ElData.get("ShortlistReport"),
+        TopologyMemoReport=ElData.get("TopologyMemoReport"),
+        StoppingReport=ElData.get("StoppingReport"),
+        BudgetReport=ElData.get("BudgetReport"),
     )
 
     # if drawPCAView:
@@ -839,3 +1823,67 @@ def computeElasticPrincipalGraph(
             FinalPG["AllNodePositions"][k] = nodep + DataCenters
 
     return FinalPG
+
+
+def computeMultiresolutionGraph(
+    Data, Levels, RepairSteps=1, DataContext=None, **GraphParameters
+):
+    """
+    #' Coarse-to-fine construction of a principal graph
+    #'
+    #' The graph is grown up to NumNodes on a fixed random subsample of Levels[0] points. It is then refitted on the
+    #' larger subsamples of Levels and finally on the full data, where only RepairSteps grammar optimization steps
+    #' and the EM embedment are performed. The repair steps apply as many growing as shrinking grammars
+    #' (the first ones of GrowGrammars and ShrinkGrammars), so that the number of nodes is kept.
+    #'
+    #' @param Data numerical 2D matrix, the n-by-m matrix with the position of n m-dimensional points
+    #' @param Levels increasing integer vector, the sizes of the subsamples. Sizes larger than n are ignored
+    #' @param RepairSteps integer, number of grammar optimization steps (MaxSteps) performed on each of the larger levels.
+    #' If 0, the graph is only refitted
+    #' @param DataContext dataset context of Data (see MakeDataContext) holding the subsamples. If None, it will be created
+    #' @param ... the parameters of computeElasticPrincipalGraph
+    #'
+    #' @return the graph computed on the full data, as returned by computeElasticPrincipalGraph. Its element
+    #' MultiresolutionLevels contains the sizes of the data used at each level
+    """
+    DataContext = CheckDataContext(DataContext, Data)
+    Sizes = [int(Size) for Size in sorted(Levels) if Size < len(Data)] + [len(Data)]
+
+    PG = None
+    for Size in Sizes:
+        if Size < len(Data):
+            LevelData = GetSubsample(DataContext, Size)[1]
+            LevelContext = None
+        else:
+            LevelData = Data
+            LevelContext = DataContext
+
+        if PG is None:
+            LevelParameters = GraphParameters
+        else:
+            # as many growing as shrinking grammars, so that the number of nodes is kept
+            nNodes = len(PG["NodePositions"])
+            nRepair = min(
+                len(GraphParameters["GrowGrammars"]),
+                len(GraphParameters["ShrinkGrammars"]),
+            )
+            Repair = RepairSteps > 0 and nRepair > 0
+            LevelParameters = dict(
+                GraphParameters,
+                InitNodePositions=PG["NodePositions"],
+                ElasticMatrix=PG["ElasticMatrix"],
+                AdjustVect=[False] * nNodes,
+                AdjustElasticMatrix_Initial=None,
+                NumNodes=nNodes,
+                GrowGrammars=GraphParameters["GrowGrammars"][:nRepair],
+                ShrinkGrammars=GraphParameters["ShrinkGrammars"][:nRepair],
+                GrammarOptimization=Repair,
+                MaxSteps=RepairSteps if Repair else float("inf"),
+            )
+
+        PG = computeElasticPrincipalGraph(
+            Data=LevelData, DataContext=LevelContext, **LevelParameters
+        )
+
+    PG["MultiresolutionLevels"] = Sizes
+    return PG
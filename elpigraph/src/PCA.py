@@ -39,6 +39,86 @@ def PCA(data):
     return evecs, data.dot(evecs), evals
 
 
+def RandomizedPCA(
+    data,
+    VarianceFraction=None,
+    n_components=None,
+    TotalVariance=None,
+    BlockSize=10,
+    n_oversamples=10,
+    n_iter=4,
+    random_state=0,
+):
+    """
+    #' PCA computing only the leading components, without the covariance matrix
+    #'
+    #' An orthonormal basis of the range of the centered data is grown by blocks of BlockSize random
+    #' vectors (refined by n_iter power iterations) until its leading components explain VarianceFraction
+    #' of the total variance (the trace of the covariance matrix, i.e. the sum of the variances of the
+    #' variables), or until it holds n_components components. n_oversamples extra vectors are kept beyond
+    #' the returned components for their accuracy. When the basis would exceed half of min(data.shape),
+    #' the exact thin SVD of the centered data is computed instead. The data are centered implicitly,
+    #' without a centered copy
+    #'
+    #' @param data numerical 2D matrix, the n-by-m data matrix
+    #' @param VarianceFraction numeric between 0 and 1, fraction of the total variance to be explained
+    #' @param n_components integer, number of components (if VarianceFraction is None)
+    #' @param TotalVariance numeric, total variance of data (with ddof = 1). If None, it is computed
+    #' @param BlockSize integer, number of random vectors added to the basis at once
+    #' @param n_oversamples integer, number of vectors of the basis beyond the returned components
+    #' @param n_iter integer, number of power iterations of each block
+    #' @param random_state integer or RandomState, the random vectors of the blocks
+    #'
+    #' @return evecs, data.dot(evecs), evals as PCA, restricted to the returned components
+    """
+    if (VarianceFraction is None) == (n_components is None):
+        raise ValueError("Exactly one of VarianceFraction and n_components must be given")
+    random_state = check_random_state(random_state)
+    n, m = data.shape
+    mean = data.mean(axis=0)
+    if TotalVariance is None:
+        TotalVariance = np.var(data, axis=0, ddof=1).sum()
+
+    def NumComponents(evals):
+        # number of leading components reaching the target (len(evals) + 1 if it is not reached)
+        if n_components is not None:
+            return n_components if n_components <= len(evals) else len(evals) + 1
+        Explained = np.cumsum(evals) / TotalVariance
+        return int(np.searchsorted(Explained, VarianceFraction)) + 1
+
+    def Range(M):
+        # centered data (resp. its transpose) times M
+        if M.shape[0] == m:
+            return data.dot(M) - mean.dot(M)
+        return data.T.dot(M) - np.outer(mean, M.sum(axis=0))
+
+    Q = np.zeros((n, 0))
+    Size = BlockSize + n_oversamples if n_components is None else n_components + n_oversamples
+    while Q.shape[1] + Size <= min(n, m) // 2:
+        Y = Range(random_state.normal(size=(m, Size)))
+        for _ in range(n_iter):
+            Y, _ = np.linalg.qr(Y - Q.dot(Q.T.dot(Y)))
+            Z, _ = np.linalg.qr(Range(Y))
+            Y = Range(Z)
+        # orthogonalized twice against the previous blocks for stability
+        for _ in range(2):
+            Y, _ = np.linalg.qr(Y - Q.dot(Q.T.dot(Y)))
+        Q = np.hstack((Q, Y))
+        _, s, Vt = np.linalg.svd(Range(Q).T, full_matrices=False)
+        evals = s ** 2 / (n - 1)
+        k = NumComponents(evals)
+        if k + n_oversamples <= len(evals):
+            break
+        Size = BlockSize
+    else:
+        _, s, Vt = np.linalg.svd(data - mean, full_matrices=False)
+        evals = s ** 2 / (n - 1)
+        k = min(NumComponents(evals), len(evals))
+
+    evecs = Vt[:k].T
+    return evecs, data.dot(evecs), evals[:k]
+
+
 def TruncPCA(X, n_components, algorithm="arpack"):
     svd = TruncatedSVD(algorithm=algorithm, n_components=n_components)
     prcomp = svd.fit_transform(X)
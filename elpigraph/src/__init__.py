@@ -4,4 +4,8 @@ from . import PCA
 from . import graphs
 from . import distutils
 from . import core
-from . import BaseElPi
\ No newline at end of file
+from . import BaseElPi
+from . import datacontext
+from . import executors
+from . import scheduler
+from . import autotune
\ No newline at end of file
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import platform
+import numpy as np
+import multiprocessing as mp
+
+from .core import PartitionData, ComputeSpringLaplacianMatrix
+from .distutils import FitGraph2DataGivenPartition
+from .scheduler import AvailableCores, FLOPS, WORKER_START_TIME, TRANSFER_RATE
+
+# configuration used without autotuning (Autotune=False) and until a benchmark has been run
+AUTOTUNE_DEFAULTS = dict(
+    MaxBlockSize=100000000,
+    NumbaPartitionMaxDim=0,
+    Solver=[[0, "dense"]],
+    CostModel=dict(
+        FLOPS=FLOPS, WORKER_START_TIME=WORKER_START_TIME, TRANSFER_RATE=TRANSFER_RATE
+    ),
+)
+
+# candidate values of the benchmarks
+AUTOTUNE_BLOCK_SIZES = [1000, 4000, 16000, 100000000]
+AUTOTUNE_DIMENSIONS = [2, 3, 5, 10, 20, 50]
+AUTOTUNE_SOLVERS = ["dense", "sparse", "banded"]
+AUTOTUNE_NODES = [50, 200, 500]
+
+# configurations loaded from the cache files, by file
+_loaded = {}
+
+
+def AutotuneCacheFile():
+    """
+    # Path of the autotuning cache: $ELPIGRAPH_AUTOTUNE_CACHE, or elpigraph/autotune.json in the
+    # user cache directory ($XDG_CACHE_HOME or ~/.cache)
+    """
+    if "ELPIGRAPH_AUTOTUNE_CACHE" in os.environ:
+        return os.environ["ELPIGRAPH_AUTOTUNE_CACHE"]
+    CacheDir = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(CacheDir, "elpigraph", "autotune.json")
+
+
+def MachineKey():
+    """
+    # Key of the configurations of the cache: the architecture, the available cores and the numerical libraries
+    # (not the host name, so that a cache shared by identical nodes of a cluster is reused)
+    """
+    import numba
+    import scipy
+
+    return "|".join(
+        [
+            platform.machine(),
+            str(AvailableCores()),
+            "numpy " + np.__version__,
+            "scipy " + scipy.__version__,
+            "numba " + numba.__version__,
+        ]
+    )
+
+
+def _Time(Function, Repeats=3):
+    # best time of Repeats calls, after a first (warm-up, compilation) call
+    Function()
+    Times = []
+    for _ in range(Repeats):
+        Start = time.perf_counter()
+        Function()
+        Times.append(time.perf_counter() - Start)
+    return min(Times)
+
+
+def _RandomTree(k, RandomState):
+    # elastic matrix of a random tree of k nodes (mostly long branches, as grown by the grammars)
+    ElasticMatrix = np.zeros((k, k))
+    for i in range(1, k):
+        if RandomState.rand() < 0.9:
+            j = RandomState.randint(max(0, i - 3), i)
+        else:
+            j = RandomState.randint(i)
+        ElasticMatrix[i, j] = ElasticMatrix[j, i] = 0.01
+    ElasticMatrix[np.arange(k), np.arange(k)] = 0.1 * (
+        (ElasticMatrix > 0).sum(axis=0) > 1
+    )
+    return ElasticMatrix
+
+
+def BenchmarkBlockSize(RandomState, n=40000, m=10, k=50):
+    """
+    # Fastest block size of PartitionData (the results do not depend on it)
+    """
+    X = RandomState.rand(n, m)
+    SquaredX = (X ** 2).sum(axis=1, keepdims=1)
+    NodePositions = RandomState.rand(k, m)
+    Times = [
+        _Time(lambda: PartitionData(X, NodePositions, BlockSize, SquaredX))
+        for BlockSize in AUTOTUNE_BLOCK_SIZES
+    ]
+    return AUTOTUNE_BLOCK_SIZES[int(np.argmin(Times))], Times
+
+
+def BenchmarkPartitionKernel(RandomState, MaxBlockSize, n=20000, k=50):
+    """
+    # Largest dimension up to which the numba kernel of PartitionData is faster than the numpy one
+    # (0 if it is never faster)
+    """
+    MaxDim = 0
+    Times = {}
+    for m in AUTOTUNE_DIMENSIONS:
+        X = RandomState.rand(n, m)
+        SquaredX = (X ** 2).sum(axis=1, keepdims=1)
+        NodePositions = RandomState.rand(k, m)
+        Times[m] = [
+            _Time(lambda: PartitionData(X, NodePositions, MaxBlockSize, SquaredX, Kernel=Kernel))
+            for Kernel in ("numpy", "numba")
+        ]
+        if Times[m][1] >= Times[m][0]:
+            break
+        MaxDim = m
+    return MaxDim, Times
+
+
+def BenchmarkSolvers(RandomState, n=2000, m=10):
+    """
+    # Fastest solver of the node positions for each number of nodes of AUTOTUNE_NODES, as a
+    # list of [MinNodes, solver] pairs (see SelectSolver)
+    """
+    X = RandomState.rand(n, m)
+    PointWeights = np.ones((n, 1))
+    Solver = []
+    Times = {}
+    for k in AUTOTUNE_NODES:
+        SpringLaplacianMatrix = ComputeSpringLaplacianMatrix(_RandomTree(k, RandomState))
+        partition = RandomState.randint(k, size=(n, 1))
+        Times[k] = [
+            _Time(
+                lambda: FitGraph2DataGivenPartition(
+                    X, PointWeights, SpringLaplacianMatrix, partition, Name
+                )
+            )
+            for Name in AUTOTUNE_SOLVERS
+        ]
+        Best = AUTOTUNE_SOLVERS[int(np.argmin(Times[k]))]
+        if len(Solver) == 0:
+            Solver.append([0, Best])
+        elif Best != Solver[-1][1]:
+            Solver.append([k, Best])
+    return Solver, Times
+
+
+def _EchoTask(Data):
+    return Data.shape
+
+
+def BenchmarkCostModel(RandomState, MaxBlockSize, n=20000, m=20, k=50):
+    """
+    # Constants of the cost model of PlanEmbedments: distance computations per second (from
+    # PartitionData), start time of a worker process and transfer rate to a worker
+    """
+    X = RandomState.rand(n, m)
+    SquaredX = (X ** 2).sum(axis=1, keepdims=1)
+    NodePositions = RandomState.rand(k, m)
+    Flops = n * m * k / _Time(lambda: PartitionData(X, NodePositions, MaxBlockSize, SquaredX))
+
+    Start = time.perf_counter()
+    with mp.Pool(2) as pool:
+        pool.map(_EchoTask, [np.zeros(1)] * 2, chunksize=1)
+        StartTime = (time.perf_counter() - Start) / 2
+        TransferTime = _Time(lambda: pool.apply(_EchoTask, (X,)), Repeats=2)
+    return dict(
+        FLOPS=float(Flops),
+        WORKER_START_TIME=float(StartTime),
+        TRANSFER_RATE=float(X.nbytes / TransferTime),
+    )
+
+
+def RunAutotune(verbose=False):
+    """
+    #' Run the micro-benchmarks of the autotuner on this machine
+    #'
+    #' The benchmarks take a few seconds and choose the block size of the exact partitions, the partition kernel
+    #' (numpy or numba, depending on the dimension), the solver of the node positions (dense, sparse or banded,
+    #' depending on the number of nodes) and the constants of the cost model deciding between serial and parallel
+    #' candidate embedments (see PlanEmbedments)
+    #'
+    #' @param verbose boolean, should the timings be printed?
+    #'
+    #' @return a dict with the elements
+    #' \describe{
+    #'   \item{MaxBlockSize}{the block size of PartitionData}
+    #'   \item{NumbaPartitionMaxDim}{the largest dimension for which the numba partition kernel is used}
+    #'   \item{Solver}{the list of [MinNodes, solver] pairs (see SelectSolver)}
+    #'   \item{CostModel}{the constants of the cost model of PlanEmbedments}
+    #' }
+    """
+    RandomState = np.random.RandomState(0)
+    MaxBlockSize, BlockTimes = BenchmarkBlockSize(RandomState)
+    NumbaPartitionMaxDim, KernelTimes = BenchmarkPartitionKernel(RandomState, MaxBlockSize)
+    Solver, SolverTimes = BenchmarkSolvers(RandomState)
+    CostModel = BenchmarkCostModel(RandomState, MaxBlockSize)
+    if verbose:
+        print("Partition block sizes", dict(zip(AUTOTUNE_BLOCK_SIZES, BlockTimes)))
+        print("Partition kernels (numpy, numba) by dimension", KernelTimes)
+        print("Solvers", AUTOTUNE_SOLVERS, "by number of nodes", SolverTimes)
+        print("Cost model", CostModel)
+    return dict(
+        MaxBlockSize=MaxBlockSize,
+        NumbaPartitionMaxDim=NumbaPartitionMaxDim,
+        Solver=Solver,
+        CostModel=CostModel,
+    )
+
+
+def GetAutotune(Run=True, Refresh=False, CacheFile=None, verbose=False):
+    """
+    #' Autotuned configuration of this machine
+    #'
+    #' The configurations are stored in a JSON cache file, by machine (see MachineKey). The benchmarks are run
+    #' (see RunAutotune) on first use, i.e. when the cache has no configuration for this machine. They are never
+    #' run in a worker process (which cannot start the processes of the benchmarks), where AUTOTUNE_DEFAULTS is
+    #' returned if the configuration was not obtained before the worker was started
+    #'
+    #' @param Run boolean, should the benchmarks be run if the configuration is not cached? Otherwise AUTOTUNE_DEFAULTS is returned
+    #' @param Refresh boolean, should the benchmarks be run again even if the configuration is cached?
+    #' @param CacheFile string, path of the cache. If None, AutotuneCacheFile()
+    #' @param verbose boolean, should the timings of the benchmarks be printed?
+    #'
+    #' @return the configuration (see RunAutotune)
+    """
+    if CacheFile is None:
+        CacheFile = AutotuneCacheFile()
+    Key = MachineKey()
+    if CacheFile not in _loaded:
+        try:
+            with open(CacheFile) as f:
+                _loaded[CacheFile] = json.load(f)
+        except (OSError, ValueError):
+            _loaded[CacheFile] = {}
+    Configurations = _loaded[CacheFile]
+
+    if Key in Configurations and not Refresh:
+        return dict(AUTOTUNE_DEFAULTS, **Configurations[Key])
+    if (not Run and not Refresh) or mp.current_process().daemon:
+        return dict(AUTOTUNE_DEFAULTS)
+
+    Configurations[Key] = RunAutotune(verbose=verbose)
+    # the cache is replaced at once, so that concurrent processes never read a partial file
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(CacheFile)), exist_ok=True)
+        Tmp = CacheFile + "." + str(os.getpid()) + ".tmp"
+        with open(Tmp, "w") as f:
+            json.dump(Configurations, f, indent=1)
+        os.replace(Tmp, CacheFile)
+    except OSError:
+        # read-only cache: the configuration is kept for this session only
+        pass
+    return dict(AUTOTUNE_DEFAULTS, **Configurations[Key])
+
+
+def TunedBlockSize():
+    """
+    # Block size of PartitionData, from the cached configuration (the benchmarks are not run)
+    """
+    return GetAutotune(Run=False)["MaxBlockSize"]
+
+
+def ResolveTuning(Autotune, X, MaxBlockSize=None):
+    """
+    # Tuned parameters of a construction on X: MaxBlockSize (if None), partition kernel,
+    # solver and cost model, from GetAutotune() if Autotune is True and from AUTOTUNE_DEFAULTS otherwise
+    """
+    Configuration = GetAutotune() if Autotune else AUTOTUNE_DEFAULTS
+    return dict(
+        MaxBlockSize=Configuration["MaxBlockSize"] if MaxBlockSize is None else MaxBlockSize,
+        PartitionKernel="numba"
+        if X.shape[1] <= Configuration["NumbaPartitionMaxDim"]
+        else "numpy",
+        Solver=Configuration["Solver"],
+        CostModel=Configuration["CostModel"],
+    )
@@ -0,0 +1,67 @@
+import time
+import numpy as np
+
+
+def MakeBudget(TimeBudget=None, MaxEvaluations=None):
+    """
+    #' Create the compute budget of a graph construction
+    #'
+    #' @param TimeBudget numeric, wall-clock time (in seconds) allowed from the creation of the budget. If None, the time is not limited
+    #' @param MaxEvaluations integer, number of candidate embedments allowed. If None, the number of embedments is not limited
+    #'
+    #' @return a dict describing the budget, updated by ChargeBudget and BudgetRemaining
+    """
+    return dict(
+        Start=time.time(),
+        TimeBudget=TimeBudget,
+        MaxEvaluations=MaxEvaluations,
+        Evaluations=0,
+        Exhausted=False,
+    )
+
+
+def BudgetRemaining(Budget):
+    """
+    # Number of candidate embedments still allowed (inf if the number of embedments is not limited),
+    # 0 once the budget is exhausted. A budget is exhausted for good when its time or its embedments run out
+    """
+    if Budget is None:
+        return np.inf
+    if not Budget["Exhausted"]:
+        if (
+            Budget["TimeBudget"] is not None
+            and time.time() - Budget["Start"] >= Budget["TimeBudget"]
+        ):
+            Budget["Exhausted"] = True
+        elif (
+            Budget["MaxEvaluations"] is not None
+            and Budget["Evaluations"] >= Budget["MaxEvaluations"]
+        ):
+            Budget["Exhausted"] = True
+    if Budget["Exhausted"]:
+        return 0
+    if Budget["MaxEvaluations"] is None:
+        return np.inf
+    return Budget["MaxEvaluations"] - Budget["Evaluations"]
+
+
+def ChargeBudget(Budget, n):
+    if Budget is not None:
+        Budget["Evaluations"] += n
+
+
+def BudgetExhausted(Budget):
+    return Budget is not None and Budget["Exhausted"]
+
+
+def BudgetReport(Budget):
+    """
+    # State of the budget: was it exhausted, number of candidate embedments and elapsed time (in seconds)
+    """
+    return dict(
+        Exhausted=Budget["Exhausted"],
+        Evaluations=Budget["Evaluations"],
+        Elapsed=time.time() - Budget["Start"],
+        TimeBudget=Budget["TimeBudget"],
+        MaxEvaluations=Budget["MaxEvaluations"],
+    )
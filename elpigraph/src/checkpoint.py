@@ -0,0 +1,28 @@
+import os
+import pickle
+
+
+def SaveCheckpoint(CheckpointFile, State):
+    """
+    #' Write the state of a graph construction to CheckpointFile
+    #'
+    #' The state is written to a temporary file which then replaces CheckpointFile, so that an interrupted
+    #' write never corrupts the previous checkpoint
+    #'
+    #' @param CheckpointFile string, path of the checkpoint
+    #' @param State dict, the state of the construction (see ElPrincGraph)
+    """
+    Tmp = CheckpointFile + ".tmp"
+    with open(Tmp, "wb") as f:
+        pickle.dump(State, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(Tmp, CheckpointFile)
+
+
+def LoadCheckpoint(ResumeFrom):
+    """
+    # State of a graph construction from a checkpoint file (or the state itself if ResumeFrom is already loaded)
+    """
+    if isinstance(ResumeFrom, dict):
+        return ResumeFrom
+    with open(ResumeFrom, "rb") as f:
+        return pickle.load(f)
\ No newline at end of file
@@ -60,8 +60,40 @@ def PartitionData_cp(
     return cupy.asnumpy(partition), cupy.asnumpy(dists)
 
 
+@nb.njit(cache=True)
+def _PartitionDataCompiled(X, NodePositions, SquaredX):
+    # same distances as PartitionData, computed point by point without the distance blocks
+    n = X.shape[0]
+    k = NodePositions.shape[0]
+    partition = np.zeros((n, 1), dtype=np.int64)
+    dists = np.zeros((n, 1))
+    centrLength = np.zeros(k)
+    for j in range(k):
+        for c in range(X.shape[1]):
+            centrLength[j] += NodePositions[j, c] ** 2
+    for i in range(n):
+        best = 0
+        bestd = np.inf
+        for j in range(k):
+            d = 0.0
+            for c in range(X.shape[1]):
+                d += X[i, c] * NodePositions[j, c]
+            d = SquaredX[i, 0] + centrLength[j] - 2 * d
+            if d < bestd:
+                best = j
+                bestd = d
+        partition[i, 0] = best
+        dists[i, 0] = bestd
+    return partition, dists
+
+
 def PartitionData(
-    X, NodePositions, MaxBlockSize, SquaredX, TrimmingRadius=float("inf")
+    X,
+    NodePositions,
+    MaxBlockSize,
+    SquaredX,
+    TrimmingRadius=float("inf"),
+    Kernel="numpy",
 ):
     """
     # Partition the data by proximity to graph nodes
@@ -77,6 +109,8 @@ def PartitionData(
     #       is MaxBlockSize-by-k, where k is number of nodes.
     #   SquaredX is n-by-1 vector of data vectors length: SquaredX = sum(X.^2,2);
     #   TrimmingRadius (optional) is squared trimming radius.
+    #   Kernel (optional) is "numpy" (distance blocks computed with np.dot) or "numba"
+    #       (compiled loop over the points, faster in low dimension, see RunAutotune).
     #
     # Outputs
     #   partition is n-by-1 vector. partition[i] is number of the node which is
@@ -85,22 +119,174 @@ def PartitionData(
     #       number partition[i] and data point X[i, ].
     """
     n = X.shape[0]
-    partition = np.zeros((n, 1), dtype=int)
-    dists = np.zeros((n, 1))
-    # Calculate squared length of centroids
-    cent = NodePositions.T
-    centrLength = (cent ** 2).sum(axis=0)
-    # Process partitioning without trimming
-    for i in range(0, n, MaxBlockSize):
-        # Define last element for calculation
-        last = i + MaxBlockSize
-        if last > n:
-            last = n
-        # Calculate distances
-        d = SquaredX[i:last] + centrLength - 2 * np.dot(X[i:last,], cent)
-        tmp = d.argmin(axis=1)
-        partition[i:last] = tmp[:, np.newaxis]
-        dists[i:last] = d[np.arange(d.shape[0]), tmp][:, np.newaxis]
+    if Kernel == "numba":
+        partition, dists = _PartitionDataCompiled(
+            np.ascontiguousarray(X, dtype=float),
+            np.ascontiguousarray(NodePositions, dtype=float),
+            np.reshape(SquaredX, (n, 1)).astype(float),
+        )
+    elif Kernel == "numpy":
+        partition = np.zeros((n, 1), dtype=int)
+        dists = np.zeros((n, 1))
+        # Calculate squared length of centroids
+        cent = NodePositions.T
+        centrLength = (cent ** 2).sum(axis=0)
+        # Process partitioning without trimming
+        for i in range(0, n, MaxBlockSize):
+            # Define last element for calculation
+            last = i + MaxBlockSize
+            if last > n:
+                last = n
+            # Calculate distances
+            d = SquaredX[i:last] + centrLength - 2 * np.dot(X[i:last,], cent)
+            tmp = d.argmin(axis=1)
+            partition[i:last] = tmp[:, np.newaxis]
+            dists[i:last] = d[np.arange(d.shape[0]), tmp][:, np.newaxis]
+    else:
+        raise ValueError("Partition kernel " + str(Kernel) + " is not defined")
+    # Apply trimming
+    if not np.isinf(TrimmingRadius):
+        ind = dists > (TrimmingRadius ** 2)
+        partition[ind] = -1
+        dists[ind] = TrimmingRadius ** 2
+    return partition, dists
+
+
+def GraphAdjacency(ElasticMatrix):
+    """
+    # Compressed (CSR) adjacency lists of the graph encoded by ElasticMatrix
+    #
+    # Outputs
+    #   indptr is (k+1) vector, the neighbours of node i are
+    #       indices[indptr[i]:indptr[i+1]]
+    #   indices is vector of neighbour node numbers
+    """
+    Lambda = ElasticMatrix.copy()
+    np.fill_diagonal(Lambda, 0)
+    rows, cols = np.nonzero(Lambda > 0)
+    indptr = np.zeros(ElasticMatrix.shape[0] + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=ElasticMatrix.shape[0]))
+    return indptr, cols.astype(np.int64)
+
+
+@nb.njit(cache=True)
+def _GraphGuidedNearestNodes(
+    X, SquaredX, NodePositions, centrLength, indptr, indices, StartNodes, BeamWidth
+):
+    n, m = X.shape
+    k = NodePositions.shape[0]
+    partition = np.empty(n, dtype=np.int64)
+    dists = np.empty(n)
+    # visited[j] == i when node j has already been evaluated for point i
+    visited = np.full(k, -1, dtype=np.int64)
+    beam = np.empty(BeamWidth, dtype=np.int64)
+    beamd = np.empty(BeamWidth)
+    frontier = np.empty(BeamWidth, dtype=np.int64)
+
+    for i in range(n):
+        s = StartNodes[i]
+        if s < 0 or s >= k:
+            # no usable previous node (new or trimmed point): exact scan
+            best = 0
+            bestd = np.inf
+            for j in range(k):
+                d = SquaredX[i] + centrLength[j]
+                for c in range(m):
+                    d -= 2 * X[i, c] * NodePositions[j, c]
+                if d < bestd:
+                    best = j
+                    bestd = d
+            partition[i] = best
+            dists[i] = bestd
+            continue
+
+        d = SquaredX[i] + centrLength[s]
+        for c in range(m):
+            d -= 2 * X[i, c] * NodePositions[s, c]
+        visited[s] = i
+        beam[0] = s
+        beamd[0] = d
+        nbeam = 1
+        changed = True
+        # beam search over graph neighbours, stops when the beam is stable
+        while changed:
+            changed = False
+            nfront = nbeam
+            for b in range(nbeam):
+                frontier[b] = beam[b]
+            for b in range(nfront):
+                u = frontier[b]
+                for p in range(indptr[u], indptr[u + 1]):
+                    v = indices[p]
+                    if visited[v] == i:
+                        continue
+                    visited[v] = i
+                    dv = SquaredX[i] + centrLength[v]
+                    for c in range(m):
+                        dv -= 2 * X[i, c] * NodePositions[v, c]
+                    if nbeam < BeamWidth:
+                        pos = nbeam
+                        nbeam += 1
+                    elif dv < beamd[nbeam - 1]:
+                        pos = nbeam - 1
+                    else:
+                        continue
+                    while pos > 0 and beamd[pos - 1] > dv:
+                        beam[pos] = beam[pos - 1]
+                        beamd[pos] = beamd[pos - 1]
+                        pos -= 1
+                    beam[pos] = v
+                    beamd[pos] = dv
+                    changed = True
+        partition[i] = beam[0]
+        dists[i] = beamd[0]
+    return partition, dists
+
+
+def PartitionDataGraph(
+    X,
+    NodePositions,
+    ElasticMatrix,
+    SquaredX,
+    StartPartition,
+    TrimmingRadius=float("inf"),
+    BeamWidth=2,
+):
+    """
+    # Partition the data by proximity to graph nodes, searching along the graph
+    #
+    # Instead of scanning all the k nodes, each point starts from its previous
+    # nearest node and descends greedily over the graph neighbours, keeping the
+    # BeamWidth best nodes found so far. The cost per point is of the order of the
+    # node degree instead of k, but the result can be a local minimum: callers
+    # should fall back periodically to PartitionData.
+    #
+    # Inputs:
+    #   X, NodePositions, SquaredX, TrimmingRadius as in PartitionData.
+    #   ElasticMatrix is k-by-k elastic matrix defining the graph neighbours.
+    #   StartPartition is n-by-1 vector with the previous nearest node of each
+    #       point. Points with a value outside [0, k) (e.g. trimmed points) are
+    #       assigned by an exact scan.
+    #   BeamWidth integer, number of candidate nodes kept during the search
+    #       (1 is pure greedy descent).
+    #
+    # Outputs
+    #   partition, dists as in PartitionData.
+    """
+    indptr, indices = GraphAdjacency(ElasticMatrix)
+    NodePositions = np.ascontiguousarray(NodePositions, dtype=float)
+    partition, dists = _GraphGuidedNearestNodes(
+        np.ascontiguousarray(X, dtype=float),
+        np.asarray(SquaredX, dtype=float).ravel(),
+        NodePositions,
+        (NodePositions ** 2).sum(axis=1),
+        indptr,
+        indices,
+        np.asarray(StartPartition).ravel().astype(np.int64),
+        max(int(BeamWidth), 1),
+    )
+    partition = partition[:, np.newaxis]
+    dists = dists[:, np.newaxis]
     # Apply trimming
     if not np.isinf(TrimmingRadius):
         ind = dists > (TrimmingRadius ** 2)
@@ -355,6 +541,13 @@ def PrimitiveElasticGraphEmbedment(
     verbose=False,
     TrimmingRadius=float("inf"),
     SquaredX=None,
+    PartitionStrategy="exact",
+    BeamWidth=2,
+    ExactScanPeriod=5,
+    MinGraphPartitionNodes=500,
+    InitPartition=None,
+    Solver="dense",
+    PartitionKernel="numpy",
 ):
 
     """
@@ -381,6 +574,18 @@ def PrimitiveElasticGraphEmbedment(
     #' @param beta positive numeric, the value of the beta parameter of the penalized elastic energy
     #' @param prob numeric between 0 and 1. If less than 1 point will be sampled at each iteration. Prob indicate the probability of
     #' using each points. This is an *experimental* feature, which may helps speeding up the computation if a large number of points is present.
+    #' @param PartitionStrategy string, how points are assigned to nodes at each EM iteration. "exact" scans all the nodes,
+    #' "graph" descends from the previous nearest node along the graph edges (see PartitionDataGraph), "auto" uses "graph"
+    #' when the graph has at least MinGraphPartitionNodes nodes
+    #' @param BeamWidth integer, number of candidate nodes kept by the graph-guided search
+    #' @param ExactScanPeriod integer, with the graph-guided search an exact scan is done every ExactScanPeriod partitions
+    #' to recover from local minima (e.g., on curved branches)
+    #' @param MinGraphPartitionNodes integer, minimal number of nodes for PartitionStrategy="auto" to use the graph-guided search
+    #' @param InitPartition n-by-1 vector, nearest node of each point in a previous configuration with the same first nodes
+    #' (e.g. the parent graph of a grammar operation). Used as a starting point of the graph-guided search
+    #' @param Solver string ("dense", "sparse" or "banded") or list of [MinNodes, solver] pairs, the solver of the node positions
+    #' (see FitGraph2DataGivenPartition)
+    #' @param PartitionKernel string, "numpy" or "numba", the kernel of the exact partitions (see PartitionData)
     #'
     #' @return
     #' @export
@@ -393,8 +598,13 @@ def PrimitiveElasticGraphEmbedment(
 
     N = X.shape[0]
 
+    # with point weights, the MSE term of the energy is the weighted mean of the distances
     if PointWeights is None:
         PointWeights = np.ones((N, 1))
+        DistWeights = 1
+    else:
+        PointWeights = np.reshape(PointWeights, (N, 1))
+        DistWeights = PointWeights * (N / PointWeights.sum())
 
     # Auxiliary computations
     SpringLaplacianMatrix = ComputeSpringLaplacianMatrix(ElasticMatrix)
@@ -402,26 +612,48 @@ def PrimitiveElasticGraphEmbedment(
     if SquaredX is None:
         SquaredX = (X ** 2).sum(axis=1).reshape((N, 1))
 
+    if PartitionStrategy == "auto":
+        UseGraph = NodePositions.shape[0] >= MinGraphPartitionNodes
+    elif PartitionStrategy == "graph":
+        UseGraph = True
+    elif PartitionStrategy == "exact":
+        UseGraph = False
+    else:
+        raise ValueError("PartitionStrategy must be 'exact', 'graph' or 'auto'")
+
     # Main iterative EM cycle: partition, fit given the partition, repeat
-    partition, dists = PartitionData(
-        X, NodePositions, MaxBlockSize, SquaredX, TrimmingRadius
-    )
+    if UseGraph and InitPartition is not None:
+        partition, dists = PartitionDataGraph(
+            X,
+            NodePositions,
+            ElasticMatrix,
+            SquaredX,
+            InitPartition,
+            TrimmingRadius,
+            BeamWidth,
+        )
+        nGraphPartitions = 1
+    else:
+        partition, dists = PartitionData(
+            X, NodePositions, MaxBlockSize, SquaredX, TrimmingRadius, PartitionKernel
+        )
+        nGraphPartitions = 0
     if verbose or Mode == 2:
         OldElasticEnergy, MSE, EP, RP = ComputePrimitiveGraphElasticEnergy(
-            NodePositions, ElasticMatrix, dists
+            NodePositions, ElasticMatrix, dists * DistWeights
         )
 
     ElasticEnergy = 0
     for i in range(MaxNumberOfIterations):
         # Updated positions
         NewNodePositions = FitGraph2DataGivenPartition(
-            X, PointWeights, SpringLaplacianMatrix, partition
+            X, PointWeights, SpringLaplacianMatrix, partition, Solver
         )
 
         # Look at differences
         if verbose or Mode == 2:
             ElasticEnergy, MSE, EP, RP = ComputePrimitiveGraphElasticEnergy(
-                NewNodePositions, ElasticMatrix, dists
+                NewNodePositions, ElasticMatrix, dists * DistWeights
             )
 
         if Mode == 1:
@@ -450,13 +682,43 @@ def PrimitiveElasticGraphEmbedment(
         if not np.isfinite(diff):
             diff = 0
 
+        if diff < eps and nGraphPartitions > 0:
+            # the graph-guided partition can be locally wrong: the embedment has only converged
+            # if an exact scan gives the same partition, otherwise it is refitted on the exact one
+            ExactPartition, ExactDists = PartitionData(
+                X, NodePositions, MaxBlockSize, SquaredX, TrimmingRadius, PartitionKernel
+            )
+            Unchanged = np.array_equal(ExactPartition, partition)
+            partition, dists = ExactPartition, ExactDists
+            nGraphPartitions = 0
+            if not Unchanged and i < MaxNumberOfIterations - 1:
+                continue
+
         if diff < eps:
             break
 
         elif i < MaxNumberOfIterations - 1:
-            partition, dists = PartitionData(
-                X, NewNodePositions, MaxBlockSize, SquaredX, TrimmingRadius
-            )
+            if UseGraph and nGraphPartitions < ExactScanPeriod - 1:
+                partition, dists = PartitionDataGraph(
+                    X,
+                    NewNodePositions,
+                    ElasticMatrix,
+                    SquaredX,
+                    partition,
+                    TrimmingRadius,
+                    BeamWidth,
+                )
+                nGraphPartitions += 1
+            else:
+                partition, dists = PartitionData(
+                    X,
+                    NewNodePositions,
+                    MaxBlockSize,
+                    SquaredX,
+                    TrimmingRadius,
+                    PartitionKernel,
+                )
+                nGraphPartitions = 0
             NodePositions = NewNodePositions
             OldElasticEnergy = ElasticEnergy
 
@@ -477,12 +739,12 @@ def PrimitiveElasticGraphEmbedment(
     if (FinalEnergy != "Base") or (not (verbose) and (Mode != 2)):
         if FinalEnergy == "Base":
             ElasticEnergy, MSE, EP, RP = ComputePrimitiveGraphElasticEnergy(
-                NewNodePositions, ElasticMatrix, dists
+                NewNodePositions, ElasticMatrix, dists * DistWeights
             )
 
         elif FinalEnergy == "Penalized":
             ElasticEnergy, MSE, EP, RP = ComputePenalizedPrimitiveGraphElasticEnergy(
-                NewNodePositions, ElasticMatrix, dists, alpha, beta
+                NewNodePositions, ElasticMatrix, dists * DistWeights, alpha, beta
             )
 
     EmbeddedNodePositions = NewNodePositions
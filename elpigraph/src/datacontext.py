@@ -0,0 +1,377 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    pass
+
+# preprocessing results (PCA) shared by all the contexts of this process, keyed by the fingerprint of
+# the data, see ConfigurePreprocessingCache
+_PreprocessingCache = dict(
+    Entries=OrderedDict(),
+    Bytes=0,
+    MaxMemory=2 ** 30,
+    Directory=None,
+    MaxDisk=2 ** 33,
+    Hits=0,
+    DiskHits=0,
+    Misses=0,
+)
+
+
+def MakeDataContext(X, SharedMemory=False):
+    """
+    #' Create a dataset context
+    #'
+    #' The context holds a data matrix together with the full-data reductions that are
+    #' needed several times during a fit (rowSums(X^2), total variance, centering vector and PCA basis).
+    #' These are computed on first use and then reused by all the functions receiving the context.
+    #'
+    #' @param X numerical 2D matrix, the n-by-m matrix with the position of n m-dimensional points
+    #' @param SharedMemory boolean, should X be copied to a shared memory block so that worker processes can
+    #' attach to it without pickling the data? The block is released by CloseDataContext
+    #'
+    #' @return a dict with the elements
+    #' \describe{
+    #'   \item{X}{the data matrix}
+    #'   \item{SquaredX}{rowSums(X^2) (n-by-1), or None until computed}
+    #'   \item{TotalVariance}{sum of the column variances of X, or None until computed}
+    #'   \item{DataCenters}{column means of X, or None until computed}
+    #'   \item{PCA}{dict of cached PCA results, see GetPCA}
+    #'   \item{Permutation}{random permutation of the points defining the subsamples, or None until computed}
+    #'   \item{Subsamples}{dict of cached subsamples, see GetSubsample}
+    #'   \item{SharedMemory}{name of the shared memory block holding X, or None}
+    #'   \item{Fingerprint}{content fingerprint of X (see DataFingerprint), or None until computed}
+    #' }
+    """
+    X = np.asarray(X, dtype=float)
+    shm = None
+    if SharedMemory:
+        shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        Xshared = np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)
+        Xshared[:] = X
+        X = Xshared
+
+    return dict(
+        X=X,
+        SquaredX=None,
+        TotalVariance=None,
+        DataCenters=None,
+        PCA={},
+        Permutation=None,
+        Subsamples={},
+        SharedMemory=None if shm is None else shm.name,
+        Fingerprint=None,
+        _shm=shm,
+    )
+
+
+def AttachDataContext(Name, Shape):
+    """
+    #' Attach to the data of a context created with SharedMemory=True (e.g., in a worker process)
+    #'
+    #' @param Name the SharedMemory element of the context
+    #' @param Shape the shape of X
+    #'
+    #' @return a dataset context whose X is a view of the shared block
+    """
+    shm = shared_memory.SharedMemory(name=Name)
+    X = np.ndarray(Shape, dtype=float, buffer=shm.buf)
+    Context = MakeDataContext(X)
+    Context["_shm"] = shm
+    return Context
+
+
+def CloseDataContext(DataContext, Unlink=True):
+    """
+    #' Release the shared memory block of a context (if any)
+    #'
+    #' @param DataContext a dataset context
+    #' @param Unlink boolean, should the block be destroyed? Only the process that created the context should unlink it
+    """
+    shm = DataContext.get("_shm")
+    if shm is not None:
+        DataContext["X"] = np.array(DataContext["X"])
+        shm.close()
+        if Unlink:
+            shm.unlink()
+        DataContext["_shm"] = None
+        DataContext["SharedMemory"] = None
+
+
+def GetSquaredX(DataContext):
+    if DataContext["SquaredX"] is None:
+        DataContext["SquaredX"] = (DataContext["X"] ** 2).sum(axis=1, keepdims=1)
+    return DataContext["SquaredX"]
+
+
+def _Reduction(DataContext, Name, Compute):
+    # full-data reduction of the context, shared through the preprocessing cache when the fingerprint
+    # of the data is known (computing it only for a reduction would cost as much as the reduction)
+    if DataContext[Name] is None:
+        if DataContext.get("Fingerprint") is None:
+            DataContext[Name] = Compute()
+        else:
+            DataContext[Name] = CachedPreprocessing(
+                DataContext["Fingerprint"], (Name,), Compute
+            )
+    return DataContext[Name]
+
+
+def GetTotalVariance(DataContext):
+    return _Reduction(
+        DataContext,
+        "TotalVariance",
+        lambda: np.sum(np.var(DataContext["X"], axis=0, ddof=1)),
+    )
+
+
+def GetDataCenters(DataContext):
+    return _Reduction(
+        DataContext, "DataCenters", lambda: np.mean(DataContext["X"], axis=0)
+    )
+
+
+def DataFingerprint(X):
+    """
+    #' Content fingerprint of a data matrix: BLAKE2b digest of its shape, type and values
+    #'
+    #' @param X numerical 2D matrix
+    #'
+    #' @return a hexadecimal string
+    """
+    X = np.ascontiguousarray(X)
+    Hash = hashlib.blake2b(digest_size=16)
+    Hash.update(repr((X.shape, X.dtype.str)).encode())
+    Hash.update(X.data)
+    return Hash.hexdigest()
+
+
+def GetFingerprint(DataContext):
+    if DataContext.get("Fingerprint") is None:
+        DataContext["Fingerprint"] = DataFingerprint(DataContext["X"])
+    return DataContext["Fingerprint"]
+
+
+def GetPCA(DataContext, Key, Compute):
+    """
+    #' Cached PCA of the context data
+    #'
+    #' The PCA is cached in the context and in the preprocessing cache of the process (see
+    #' ConfigurePreprocessingCache), so that the contexts of the same data (e.g., successive
+    #' constructions on the same matrix) share it
+    #'
+    #' @param DataContext a dataset context
+    #' @param Key hashable, identifies the PCA variant (method, centering, number of components)
+    #' @param Compute function without arguments computing the PCA if it is not cached
+    #'
+    #' @return the (cached) result of Compute
+    """
+    if Key not in DataContext["PCA"]:
+        DataContext["PCA"][Key] = CachedPreprocessing(
+            GetFingerprint(DataContext), Key, Compute
+        )
+    return DataContext["PCA"][Key]
+
+
+def ConfigurePreprocessingCache(MaxMemory=2 ** 30, Directory=None, MaxDisk=2 ** 33):
+    """
+    #' Configure the preprocessing cache of this process
+    #'
+    #' The PCA of the data matrices (basis, projected data and explained variances) are kept in a
+    #' least recently used cache keyed by the content fingerprint of the data (see DataFingerprint) and
+    #' the PCA variant (method, centering, number of components or fraction of variance), so that the
+    #' constructions on the same data (replicas, sweeps, successive calls) compute them once. With a
+    #' Directory, the results are also stored on disk and shared with the other processes using it
+    #'
+    #' @param MaxMemory numeric, maximal size (in bytes) of the results kept in memory. 0 disables the cache
+    #' @param Directory string, directory of the on-disk cache. If None, the results are only kept in memory
+    #' @param MaxDisk numeric, maximal size (in bytes) of the on-disk cache, the least recently used files being removed
+    """
+    _PreprocessingCache.update(MaxMemory=MaxMemory, Directory=Directory, MaxDisk=MaxDisk)
+    if Directory is not None:
+        os.makedirs(Directory, exist_ok=True)
+    _EvictMemory()
+
+
+def ClearPreprocessingCache(Disk=False):
+    """
+    #' Empty the preprocessing cache of this process
+    #'
+    #' @param Disk boolean, should the files of the on-disk cache also be removed?
+    """
+    _PreprocessingCache["Entries"].clear()
+    _PreprocessingCache["Bytes"] = 0
+    _PreprocessingCache.update(Hits=0, DiskHits=0, Misses=0)
+    if Disk:
+        for Path, _, _ in _DiskFiles():
+            os.remove(Path)
+
+
+def PreprocessingCacheReport():
+    """
+    #' Statistics of the preprocessing cache: number of entries and bytes in memory, hits (in memory
+    #' and on disk) and misses
+    """
+    return dict(
+        Entries=len(_PreprocessingCache["Entries"]),
+        Bytes=_PreprocessingCache["Bytes"],
+        Hits=_PreprocessingCache["Hits"],
+        DiskHits=_PreprocessingCache["DiskHits"],
+        Misses=_PreprocessingCache["Misses"],
+    )
+
+
+def _Size(Value):
+    # number of bytes of the arrays of a (tuple of) result(s)
+    if isinstance(Value, (tuple, list)):
+        return sum(_Size(v) for v in Value)
+    return getattr(Value, "nbytes", 0)
+
+
+def _ReadOnly(Value):
+    # the cached arrays are shared by all the callers, which must not modify them in place
+    if isinstance(Value, (tuple, list)):
+        for v in Value:
+            _ReadOnly(v)
+    elif isinstance(Value, np.ndarray):
+        Value.setflags(write=False)
+    return Value
+
+
+def _EvictMemory():
+    Cache = _PreprocessingCache
+    while Cache["Entries"] and Cache["Bytes"] > Cache["MaxMemory"]:
+        _, Value = Cache["Entries"].popitem(last=False)
+        Cache["Bytes"] -= _Size(Value)
+
+
+def _DiskFiles():
+    # (path, size, last use) of the files of the on-disk cache
+    Directory = _PreprocessingCache["Directory"]
+    if Directory is None or not os.path.isdir(Directory):
+        return []
+    Files = []
+    for Name in os.listdir(Directory):
+        if Name.endswith(".pkl"):
+            Path = os.path.join(Directory, Name)
+            try:
+                Stat = os.stat(Path)
+            except OSError:
+                continue
+            Files.append((Path, Stat.st_size, Stat.st_mtime))
+    return Files
+
+
+def _DiskPath(Fingerprint, Key):
+    KeyHash = hashlib.blake2b(repr(Key).encode(), digest_size=8).hexdigest()
+    return os.path.join(
+        _PreprocessingCache["Directory"], Fingerprint + "-" + KeyHash + ".pkl"
+    )
+
+
+def _StoreDisk(Path, Value):
+    # the file is replaced at once, so that concurrent processes never read a partial file
+    try:
+        Tmp = Path + "." + str(os.getpid()) + ".tmp"
+        with open(Tmp, "wb") as f:
+            pickle.dump(Value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(Tmp, Path)
+    except OSError:
+        return
+    # the least recently used files are removed beyond MaxDisk
+    Files = sorted(_DiskFiles(), key=lambda File: File[2])
+    Total = sum(File[1] for File in Files)
+    for File, Size, _ in Files:
+        if Total <= _PreprocessingCache["MaxDisk"]:
+            break
+        try:
+            os.remove(File)
+        except OSError:
+            pass
+        Total -= Size
+
+
+def CachedPreprocessing(Fingerprint, Key, Compute):
+    """
+    #' Result of a preprocessing of the data of fingerprint Fingerprint, from the preprocessing cache if
+    #' possible (see ConfigurePreprocessingCache)
+    #'
+    #' @param Fingerprint string, fingerprint of the data (see DataFingerprint)
+    #' @param Key hashable with a deterministic repr, identifies the preprocessing
+    #' @param Compute function without arguments computing the result if it is not cached
+    #'
+    #' @return the (cached) result of Compute. Its arrays are shared with the other callers and read-only
+    """
+    Cache = _PreprocessingCache
+    if Cache["MaxMemory"] <= 0 and Cache["Directory"] is None:
+        return _ReadOnly(Compute())
+    Entries = Cache["Entries"]
+    if (Fingerprint, Key) in Entries:
+        Entries.move_to_end((Fingerprint, Key))
+        Cache["Hits"] += 1
+        return Entries[(Fingerprint, Key)]
+
+    Value = None
+    if Cache["Directory"] is not None:
+        Path = _DiskPath(Fingerprint, Key)
+        try:
+            with open(Path, "rb") as f:
+                Value = pickle.load(f)
+            os.utime(Path)
+            Cache["DiskHits"] += 1
+        except (OSError, EOFError, pickle.UnpicklingError):
+            Value = None
+    if Value is None:
+        Cache["Misses"] += 1
+        Value = Compute()
+        if Cache["Directory"] is not None:
+            _StoreDisk(Path, Value)
+    _ReadOnly(Value)
+
+    if _Size(Value) <= Cache["MaxMemory"]:
+        Entries[(Fingerprint, Key)] = Value
+        Cache["Bytes"] += _Size(Value)
+        _EvictMemory()
+    return Value
+
+
+def GetSubsample(DataContext, Size, Seed=0):
+    """
+    #' Fixed random subsample of the context data
+    #'
+    #' The subsamples are the first Size points of a random permutation drawn once per context,
+    #' so that they are nested and identical across calls
+    #'
+    #' @param DataContext a dataset context
+    #' @param Size integer, number of points
+    #' @param Seed integer, seed of the permutation (only used the first time)
+    #'
+    #' @return a tuple (Indices, X[Indices], rowSums(X[Indices]^2))
+    """
+    if DataContext["Permutation"] is None:
+        DataContext["Permutation"] = np.random.RandomState(Seed).permutation(
+            len(DataContext["X"])
+        )
+    if Size not in DataContext["Subsamples"]:
+        Indices = np.sort(DataContext["Permutation"][:Size])
+        DataContext["Subsamples"][Size] = (
+            Indices,
+            DataContext["X"][Indices],
+            GetSquaredX(DataContext)[Indices],
+        )
+    return DataContext["Subsamples"][Size]
+
+
+def CheckDataContext(DataContext, X):
+    """
+    #' Return DataContext if it can describe X (same shape), otherwise a new context for X.
+    #' The data is not compared: a context must only be passed along with the matrix it was created on
+    """
+    if DataContext is not None and DataContext["X"].shape == np.shape(X):
+        return DataContext
+    return MakeDataContext(X)
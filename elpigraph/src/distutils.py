@@ -1,5 +1,9 @@
 import numpy as np
 import numba as nb
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.linalg
+import scipy.sparse.csgraph
 
 
 # def ComputePrimitiveGraphElasticEnergy(NodePositions, ElasticMatrix, dists):
@@ -212,15 +216,59 @@ def ComputeWeightedAverage(X, partition, PointWeights, NumberOfNodes):
     return (NodeClusterCenters[1:, ], NodeClusterRelativeSize[np.newaxis].T)
 
 
+def SelectSolver(Solver, NumberOfNodes):
+    '''
+    # Solver used for a graph of NumberOfNodes nodes: Solver itself if it is a string, otherwise
+    # the solver of the last [MinNodes, solver] pair of Solver such that MinNodes <= NumberOfNodes
+    # (e.g. [[0, "dense"], [200, "sparse"]], as chosen by the autotuner)
+    '''
+    if isinstance(Solver, str):
+        return Solver
+    Selected = "dense"
+    for MinNodes, Name in Solver:
+        if NumberOfNodes >= MinNodes:
+            Selected = Name
+    return Selected
+
+
+def SolveBanded(SLAUMatrix, RHS):
+    '''
+    # Solves the symmetric positive definite SLAU as a banded system, the nodes being
+    # reordered by reverse Cuthill-McKee (the bandwidth of a curve is then 1)
+    '''
+    S = scipy.sparse.csr_matrix(SLAUMatrix)
+    Order = scipy.sparse.csgraph.reverse_cuthill_mckee(S, symmetric_mode=True)
+    S = S[Order][:, Order].tocoo()
+    Upper = S.col >= S.row
+    Bandwidth = max(1, int(np.max(S.col[Upper] - S.row[Upper])))
+    Bands = np.zeros((Bandwidth + 1, S.shape[0]))
+    Bands[Bandwidth + S.row[Upper] - S.col[Upper], S.col[Upper]] = S.data[Upper]
+    Solution = np.empty_like(RHS)
+    Solution[Order] = scipy.linalg.solveh_banded(Bands, RHS[Order])
+    return Solution
+
+
 def FitGraph2DataGivenPartition(X, PointWeights, SpringLaplacianMatrix,
-                                partition):
+                                partition, Solver="dense"):
     '''
-    # Solves the SLAU to find new node positions
+    # Solves the SLAU to find new node positions. Solver is "dense", "sparse" (sparse LU)
+    # or "banded" (see SolveBanded), or a list of [MinNodes, solver] pairs (see SelectSolver)
     '''
     NumberOfNodes = SpringLaplacianMatrix.shape[0]
     NodeClusterCenters, NodeClusterRelativeSize = (
             ComputeWeightedAverage(X, partition, PointWeights, NumberOfNodes))
     SLAUMatrix = np.diag(NodeClusterRelativeSize.transpose()[0]) + SpringLaplacianMatrix
-    NewNodePositions = np.linalg.solve(SLAUMatrix, NodeClusterRelativeSize *
-                                       NodeClusterCenters)
+    RHS = NodeClusterRelativeSize * NodeClusterCenters
+    Solver = SelectSolver(Solver, NumberOfNodes)
+    if Solver == "sparse":
+        return scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(SLAUMatrix)).solve(RHS)
+    if Solver == "banded":
+        try:
+            return SolveBanded(SLAUMatrix, RHS)
+        except np.linalg.LinAlgError:
+            # not positive definite (e.g., a component of the graph without points)
+            pass
+    elif Solver != "dense":
+        raise ValueError("Solver " + str(Solver) + " is not defined")
+    NewNodePositions = np.linalg.solve(SLAUMatrix, RHS)
     return NewNodePositions
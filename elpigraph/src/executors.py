@@ -0,0 +1,241 @@
+import functools
+import numpy as np
+import multiprocessing as mp
+from collections import namedtuple
+
+from .scheduler import LimitBLASThreads
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except:
+    pass
+
+EXECUTOR_BACKENDS = ("serial", "multiprocessing", "dask")
+
+# arrays broadcast to a multiprocessing executor: {name: (block name, shape, dtype)}
+SharedArrays = namedtuple("SharedArrays", ["Blocks"])
+
+# shared memory blocks attached by a worker process, reused by its successive tasks
+_attached = {}
+
+
+def MakeExecutor(Backend="serial", n_cores=1, Client=None, BLASThreads=None):
+    """
+    #' Create an executor, used to distribute the candidate embedments, the replicas and the sweeps
+    #'
+    #' The executor runs tasks of the form Function(Task, Shared), where Shared is a dict of large arrays
+    #' broadcast once to the workers (see ExecutorBroadcast) and Task holds the small per-task data.
+    #' It must be released with CloseExecutor
+    #'
+    #' @param Backend string, "serial" (tasks run in the calling process), "multiprocessing" (a pool of n_cores
+    #' processes, the broadcast arrays are copied once to shared memory blocks) or "dask" (a dask distributed
+    #' cluster, the broadcast arrays are scattered once to all the workers)
+    #' @param n_cores integer, number of worker processes. With the "dask" backend and no Client, a LocalCluster
+    #' with n_cores single-threaded workers is started on this machine
+    #' @param Client a dask distributed Client connected to the cluster to be used ("dask" backend only). It is not
+    #' closed by CloseExecutor
+    #' @param BLASThreads integer, number of BLAS threads of each worker (see LimitBLASThreads and PlanWorkers). If None,
+    #' the threads are not limited
+    #'
+    #' @return a dict describing the executor
+    """
+    if Backend not in EXECUTOR_BACKENDS:
+        raise ValueError("Executor backend " + str(Backend) + " is not defined")
+
+    Pool = None
+    Owned = False
+    if Backend == "multiprocessing":
+        # the workers must share the resource tracker of the shared memory blocks created later
+        resource_tracker.ensure_running()
+        Pool = mp.Pool(n_cores, initializer=LimitBLASThreads, initargs=(BLASThreads,))
+    elif Backend == "dask":
+        try:
+            import distributed
+        except ImportError:
+            raise ImportError("The dask executor requires the distributed package")
+        if Client is None:
+            Client = distributed.Client(
+                distributed.LocalCluster(
+                    n_workers=n_cores, threads_per_worker=1, processes=True
+                )
+            )
+            Owned = True
+        n_cores = len(Client.scheduler_info()["workers"])
+        if BLASThreads is not None:
+            Client.run(LimitBLASThreads, BLASThreads)
+    elif Backend == "serial":
+        n_cores = 1
+
+    return dict(
+        Backend=Backend,
+        n_cores=n_cores,
+        Pool=Pool,
+        Client=Client,
+        Broadcasts={},
+        nBroadcasts=0,
+        _owned=Owned,
+    )
+
+
+def CloseExecutor(Executor):
+    """
+    #' Release the broadcast arrays and the workers of an executor
+    #'
+    #' @param Executor an executor created by MakeExecutor
+    """
+    ReleaseBroadcasts(Executor)
+    if Executor["Pool"] is not None:
+        Executor["Pool"].terminate()
+        Executor["Pool"].join()
+        Executor["Pool"] = None
+    if Executor["_owned"]:
+        Cluster = Executor["Client"].cluster
+        Executor["Client"].close()
+        Cluster.close()
+        Executor["Client"] = None
+        Executor["_owned"] = False
+
+
+def ExecutorBroadcast(Executor, Data):
+    """
+    #' Send a dict of arrays to all the workers of an executor
+    #'
+    #' The broadcasts are cached on the identity of the arrays, so that broadcasting the same arrays again
+    #' (e.g., the data matrix at each grammar application of a fit) does not send them again. The cached
+    #' broadcasts are released by ReleaseBroadcasts (at the end of each fit) and CloseExecutor
+    #'
+    #' @param Executor an executor created by MakeExecutor
+    #' @param Data dict {name: numerical array}
+    #'
+    #' @return the handle of the broadcast, to be passed as Shared to ExecutorMap or ExecutorSubmit
+    """
+    Key = tuple((Name, id(Array)) for Name, Array in sorted(Data.items()))
+    if Key in Executor["Broadcasts"]:
+        return Executor["Broadcasts"][Key][0]
+
+    if Executor["Backend"] == "multiprocessing":
+        Blocks = {}
+        Handle = {}
+        for Name, Array in Data.items():
+            Array = np.asarray(Array)
+            shm = shared_memory.SharedMemory(create=True, size=max(Array.nbytes, 1))
+            np.ndarray(Array.shape, dtype=Array.dtype, buffer=shm.buf)[:] = Array
+            Blocks[Name] = shm
+            Handle[Name] = (shm.name, Array.shape, Array.dtype.str)
+        Handle = SharedArrays(Handle)
+    elif Executor["Backend"] == "dask":
+        Blocks = None
+        Handle = Executor["Client"].scatter([dict(Data)], broadcast=True, hash=False)[0]
+    else:
+        Blocks = None
+        Handle = dict(Data)
+
+    # the arrays are kept so that their identity is not reused while the broadcast is cached
+    Executor["Broadcasts"][Key] = (Handle, Blocks, list(Data.values()))
+    Executor["nBroadcasts"] += 1
+    return Handle
+
+
+def ReleaseBroadcasts(Executor):
+    """
+    #' Release all the broadcasts of an executor
+    #'
+    #' @param Executor an executor created by MakeExecutor
+    """
+    for Handle, Blocks, Arrays in Executor["Broadcasts"].values():
+        if Blocks is not None:
+            for shm in Blocks.values():
+                shm.close()
+                shm.unlink()
+        elif Executor["Backend"] == "dask" and Executor["Client"] is not None:
+            Handle.release()
+    Executor["Broadcasts"] = {}
+
+
+def _ResolveShared(Shared):
+    """
+    # Arrays of a broadcast in a worker process. The shared memory blocks of a previous broadcast
+    # are closed when a task of a new one arrives (unless their arrays are still referenced)
+    """
+    if not isinstance(Shared, SharedArrays):
+        return Shared
+    Names = set(Block[0] for Block in Shared.Blocks.values())
+    for Name in [Name for Name in _attached if Name not in Names]:
+        try:
+            _attached[Name].close()
+        except BufferError:
+            continue
+        del _attached[Name]
+    Data = {}
+    for Key, (Name, Shape, Dtype) in Shared.Blocks.items():
+        if Name not in _attached:
+            _attached[Name] = shared_memory.SharedMemory(name=Name)
+        Data[Key] = np.ndarray(Shape, dtype=Dtype, buffer=_attached[Name].buf)
+    return Data
+
+
+def _RunTask(Task, Function, Shared):
+    return Function(Task, _ResolveShared(Shared))
+
+
+def ExecutorMap(Executor, Function, Tasks, Shared=None, ChunkSize=None):
+    """
+    #' Apply Function to each task with an executor
+    #'
+    #' @param Executor an executor created by MakeExecutor
+    #' @param Function function of (Task, Shared), defined at the top level of a module so that it can be
+    #' sent to the workers
+    #' @param Tasks list of tasks
+    #' @param Shared a handle returned by ExecutorBroadcast, or None
+    #' @param ChunkSize integer, number of tasks sent at once to a process ("multiprocessing" backend).
+    #' If None, the default of multiprocessing.Pool.map
+    #'
+    #' @return the list of the results, in the order of Tasks
+    """
+    Tasks = list(Tasks)
+    if Executor["Backend"] == "multiprocessing":
+        return Executor["Pool"].map(
+            functools.partial(_RunTask, Function=Function, Shared=Shared),
+            Tasks,
+            chunksize=ChunkSize,
+        )
+    return ExecutorGather(
+        Executor, [ExecutorSubmit(Executor, Function, Task, Shared) for Task in Tasks]
+    )
+
+
+def ExecutorSubmit(Executor, Function, Task, Shared=None):
+    """
+    #' Submit a single task to an executor
+    #'
+    #' @param Executor an executor created by MakeExecutor
+    #' @param Function function of (Task, Shared), see ExecutorMap
+    #' @param Task the task
+    #' @param Shared a handle returned by ExecutorBroadcast, or None
+    #'
+    #' @return a future, whose result is obtained with ExecutorGather. With the "serial" backend, the
+    #' task is run immediately and the future is its result
+    """
+    if Executor["Backend"] == "multiprocessing":
+        return Executor["Pool"].apply_async(_RunTask, (Task, Function, Shared))
+    if Executor["Backend"] == "dask":
+        return Executor["Client"].submit(
+            _RunTask, Task, Function=Function, Shared=Shared, pure=False
+        )
+    return _RunTask(Task, Function, Shared)
+
+
+def ExecutorGather(Executor, Futures):
+    """
+    #' Results of a list of futures returned by ExecutorSubmit
+    #'
+    #' @param Executor an executor created by MakeExecutor
+    #' @param Futures list of futures
+    #'
+    #' @return the list of the results, in the order of Futures
+    """
+    if Executor["Backend"] == "multiprocessing":
+        return [Future.get() for Future in Futures]
+    if Executor["Backend"] == "dask":
+        return Executor["Client"].gather(list(Futures))
+    return list(Futures)
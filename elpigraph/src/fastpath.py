@@ -0,0 +1,577 @@
+import numpy as np
+import numba as nb
+from .core import ComputeRelativeChangeOfNodePositions
+from .distutils import (
+    ComputePrimitiveGraphElasticEnergy,
+    ComputePenalizedPrimitiveGraphElasticEnergy,
+)
+
+# Compiled grammar applications for small problems --------------------------
+#
+# A grammar application (generation of the candidates of all its operations, embedment
+# of each candidate and selection of the optimal one) runs in a single compiled call,
+# without Python work per candidate. The first partition of a candidate is derived from
+# the partition of the parent graph (only the points of the modified nodes are rescanned).
+#
+# These calls take most of the time of a small construction (0.92 of 1.1 s for a 30-node
+# tree on 1000 points in 10 dimensions, against 0.14 s for the reports and 0.014 s for the
+# partitions of the steps): each candidate runs its own EM iterations, whose distance
+# computations (_NodeDistance) are scalar loops without BLAS.
+
+# operations of the compiled grammars, with their (Max_K or Min_K) parameter
+FASTPATH_OPERATIONS = {
+    "addnode2node": (0, 0),
+    "addnode2node_1": (0, 1),
+    "addnode2node_2": (0, 2),
+    "bisectedge": (1, 1),
+    "bisectedge_3": (1, 3),
+    "removenode": (2, 0),
+    "shrinkedge": (3, 1),
+    "shrinkedge_3": (3, 3),
+}
+
+# "auto" uses the compiled grammar applications (with n_cores = 1) when n * NumNodes * m is at most this size
+FASTPATH_MAX_SIZE = 10 ** 7
+
+
+@nb.njit(cache=True)
+def _NodeDistance(X, SquaredX, i, NodePositions, centrLength, j):
+    d = 0.0
+    for c in range(X.shape[1]):
+        d += X[i, c] * NodePositions[j, c]
+    return SquaredX[i] + centrLength[j] - 2 * d
+
+
+@nb.njit(cache=True)
+def _CentrLength(NodePositions):
+    centrLength = np.zeros(NodePositions.shape[0])
+    for j in range(NodePositions.shape[0]):
+        for c in range(NodePositions.shape[1]):
+            centrLength[j] += NodePositions[j, c] ** 2
+    return centrLength
+
+
+@nb.njit(cache=True)
+def _NearestNode(X, SquaredX, i, NodePositions, centrLength, TrimmingRadius2):
+    best = 0
+    bestd = np.inf
+    for j in range(NodePositions.shape[0]):
+        d = _NodeDistance(X, SquaredX, i, NodePositions, centrLength, j)
+        if d < bestd:
+            best = j
+            bestd = d
+    if bestd > TrimmingRadius2:
+        return -1, TrimmingRadius2
+    return best, bestd
+
+
+@nb.njit(cache=True)
+def FastPartitionData(X, SquaredX, NodePositions, TrimmingRadius2):
+    """
+    # Same as PartitionData (with TrimmingRadius2 the squared trimming radius), partition and
+    # dists being vectors
+    """
+    n = X.shape[0]
+    partition = np.empty(n, dtype=np.int64)
+    dists = np.empty(n)
+    centrLength = _CentrLength(NodePositions)
+    for i in range(n):
+        partition[i], dists[i] = _NearestNode(
+            X, SquaredX, i, NodePositions, centrLength, TrimmingRadius2
+        )
+    return partition, dists
+
+
+@nb.njit(cache=True)
+def _SpringLaplacianMatrix(ElasticMatrix):
+    # same as ComputeSpringLaplacianMatrix, the star contributions being accumulated
+    # in place (in the same order) instead of through dense per-star matrices
+    k = ElasticMatrix.shape[0]
+    E = np.zeros((k, k))
+    S = np.zeros((k, k))
+    for j in range(k):
+        for i in range(k):
+            if i != j:
+                E[j, j] += ElasticMatrix[i, j]
+                E[i, j] = -ElasticMatrix[i, j]
+    Leaves = np.empty(k, dtype=np.int64)
+    for c in range(k):
+        Mu = ElasticMatrix[c, c]
+        if Mu > 0:
+            K = 0
+            for j in range(k):
+                if j != c and ElasticMatrix[c, j] > 0:
+                    Leaves[K] = j
+                    K += 1
+            S[c, c] += Mu
+            for a in range(K):
+                S[c, Leaves[a]] += -Mu / K
+                S[Leaves[a], c] += -Mu / K
+                for b in range(K):
+                    S[Leaves[a], Leaves[b]] += Mu / K ** 2
+    return E + S
+
+
+@nb.njit(cache=True)
+def _FitGraph2DataGivenPartition(X, SpringLaplacianMatrix, partition):
+    # same as FitGraph2DataGivenPartition without point weights
+    n, m = X.shape
+    k = SpringLaplacianMatrix.shape[0]
+    Count = np.zeros(k)
+    Sum = np.zeros((k, m))
+    for i in range(n):
+        p = partition[i]
+        if p > -1:
+            Count[p] += 1
+            for c in range(m):
+                Sum[p, c] += X[i, c]
+    SLAUMatrix = SpringLaplacianMatrix.copy()
+    rhs = np.zeros((k, m))
+    for j in range(k):
+        RelativeSize = Count[j] / n
+        SLAUMatrix[j, j] += RelativeSize
+        for c in range(m):
+            rhs[j, c] = RelativeSize * (Sum[j, c] / max(Count[j], 1.0))
+    return np.ascontiguousarray(np.linalg.solve(SLAUMatrix, rhs))
+
+
+@nb.njit(cache=True)
+def _Energy(NodePositions, ElasticMatrix, dists, Penalized, alpha, beta):
+    if Penalized:
+        return ComputePenalizedPrimitiveGraphElasticEnergy(
+            NodePositions, ElasticMatrix, dists, alpha, beta
+        )
+    return ComputePrimitiveGraphElasticEnergy(NodePositions, ElasticMatrix, dists)
+
+
+@nb.njit(cache=True)
+def FastElasticGraphEmbedment(
+    X,
+    SquaredX,
+    NodePositions,
+    ElasticMatrix,
+    partition,
+    dists,
+    MaxNumberOfIterations,
+    eps,
+    Mode,
+    TrimmingRadius2,
+    Penalized,
+    alpha,
+    beta,
+):
+    """
+    # Same as PrimitiveElasticGraphEmbedment (exact partitions, no point weights), starting from
+    # the partition (and dists) of NodePositions
+    """
+    SpringLaplacianMatrix = _SpringLaplacianMatrix(ElasticMatrix)
+    OldElasticEnergy = 0.0
+    ElasticEnergy = 0.0
+    if Mode == 2:
+        OldElasticEnergy = ComputePrimitiveGraphElasticEnergy(
+            NodePositions, ElasticMatrix, dists
+        )[0]
+    NewNodePositions = NodePositions
+    for i in range(MaxNumberOfIterations):
+        NewNodePositions = _FitGraph2DataGivenPartition(
+            X, SpringLaplacianMatrix, partition
+        )
+        if Mode == 2:
+            ElasticEnergy = ComputePrimitiveGraphElasticEnergy(
+                NewNodePositions, ElasticMatrix, dists
+            )[0]
+            diff = (OldElasticEnergy - ElasticEnergy) / ElasticEnergy
+        else:
+            diff = ComputeRelativeChangeOfNodePositions(NodePositions, NewNodePositions)
+        if not np.isfinite(diff):
+            diff = 0.0
+        if diff < eps:
+            break
+        elif i < MaxNumberOfIterations - 1:
+            partition, dists = FastPartitionData(
+                X, SquaredX, NewNodePositions, TrimmingRadius2
+            )
+            NodePositions = NewNodePositions
+            OldElasticEnergy = ElasticEnergy
+
+    ElasticEnergy, MSE, EP, RP = _Energy(
+        NewNodePositions, ElasticMatrix, dists, Penalized, alpha, beta
+    )
+    return NewNodePositions, ElasticEnergy, partition, dists, MSE, EP, RP
+
+
+@nb.njit(cache=True)
+def _AddNodePartition(X, SquaredX, NodePositions, partition, dists, TrimmingRadius2):
+    # partition after adding the last node of NodePositions (ties keep the lower index)
+    k = NodePositions.shape[0] - 1
+    c = 0.0
+    for j in range(NodePositions.shape[1]):
+        c += NodePositions[k, j] ** 2
+    centrLength = np.zeros(k + 1)
+    centrLength[k] = c
+    part = partition.copy()
+    d = dists.copy()
+    for i in range(X.shape[0]):
+        dk = _NodeDistance(X, SquaredX, i, NodePositions, centrLength, k)
+        if (part[i] > -1 and dk < d[i]) or (part[i] == -1 and dk <= TrimmingRadius2):
+            part[i] = k
+            d[i] = dk
+    return part, d
+
+
+@nb.njit(cache=True)
+def _RemoveNodePartition(
+    X, SquaredX, NodePositions, partition, dists, Removed, Moved, TrimmingRadius2
+):
+    # partition after removing the parent node Removed (the nodes after it are shifted) and
+    # moving the node Moved (index in NodePositions, -1 if no node moved)
+    centrLength = _CentrLength(NodePositions)
+    part = partition.copy()
+    d = dists.copy()
+    for i in range(X.shape[0]):
+        p = part[i]
+        if p > Removed:
+            p -= 1
+        if part[i] == Removed or (Moved > -1 and p == Moved):
+            part[i], d[i] = _NearestNode(
+                X, SquaredX, i, NodePositions, centrLength, TrimmingRadius2
+            )
+            continue
+        part[i] = p
+        if Moved > -1:
+            dm = _NodeDistance(X, SquaredX, i, NodePositions, centrLength, Moved)
+            if p == -1:
+                if dm <= TrimmingRadius2:
+                    part[i] = Moved
+                    d[i] = dm
+            elif dm < d[i] or (dm == d[i] and Moved < p):
+                part[i] = Moved
+                d[i] = dm
+    return part, d
+
+
+@nb.njit(cache=True)
+def FastApplyOptimalGraphGrammarOperation(
+    X,
+    SquaredX,
+    NodePositions,
+    ElasticMatrix,
+    partition,
+    dists,
+    Operations,
+    Parameters,
+    MaxNumberOfIterations,
+    eps,
+    Mode,
+    TrimmingRadius2,
+    Penalized,
+    alpha,
+    beta,
+):
+    """
+    #' Compiled application of a grammar
+    #'
+    #' Same as ApplyOptimalGraphGrammarOperation for the operations of FASTPATH_OPERATIONS
+    #'
+    #' @param partition, dists vectors, the exact partition of the data on NodePositions
+    #' @param Operations, Parameters integer vectors, the codes of the operations of the grammar and their parameter
+    #' (see FASTPATH_OPERATIONS)
+    #' @param TrimmingRadius2 numeric, the squared trimming radius
+    #' @param Penalized boolean, is the final energy "Penalized"?
+    #'
+    #' @return a tuple (NodePositions, ElasticMatrix, ElasticEnergy, MSE, EP, RP, Dist, Operation, Target) with the optimal
+    #' candidate, Operation being its position in Operations and Target the parent node (or edge) it was generated from.
+    #' Operation is -1 if the grammar has no candidate
+    """
+    k, m = NodePositions.shape
+    Mus = np.diag(ElasticMatrix).copy()
+    Lambda = ElasticMatrix.copy()
+    for i in range(k):
+        Lambda[i, i] = 0
+    Connectivities = np.zeros(k, dtype=np.int64)
+    LambdaSums = np.zeros(k)
+    for i in range(k):
+        for j in range(k):
+            if Lambda[i, j] > 0:
+                Connectivities[j] += 1
+                LambdaSums[j] += Lambda[i, j]
+    Count = np.zeros(k)
+    Sum = np.zeros((k, m))
+    for i in range(X.shape[0]):
+        p = partition[i]
+        if p > -1:
+            Count[p] += 1
+            for c in range(m):
+                Sum[p, c] += X[i, c]
+
+    BestEnergy = np.inf
+    Best = (NodePositions, ElasticMatrix, np.inf, 0.0, 0.0, 0.0, dists, -1, -1)
+
+    for o in range(len(Operations)):
+        Op = Operations[o]
+        K = Parameters[o]
+        Targets = np.empty(0, dtype=np.int64)
+        Starts = np.empty(0, dtype=np.int64)
+        Stops = np.empty(0, dtype=np.int64)
+
+        if Op == 0:
+            # addnode2node, with the degree limit K (0 for no limit)
+            if K > 0:
+                Degree = np.zeros(k, dtype=np.int64)
+                for i in range(k):
+                    for j in range(k):
+                        if ElasticMatrix[i, j] > 0:
+                            Degree[i] += 1
+                    if Degree[i] > 1:
+                        Degree[i] -= 1
+                Targets = np.nonzero(Degree <= K)[0]
+                if len(Targets) <= 1:
+                    raise ValueError("AddNode2Node impossible with the current parameters!")
+            else:
+                Targets = np.arange(k)
+        elif Op == 1 or Op == 3:
+            # edges (start < stop), bisected or shrunk
+            nEdges = 0
+            for i in range(k):
+                for j in range(i + 1, k):
+                    if Lambda[i, j] > 0:
+                        nEdges += 1
+            Starts = np.empty(nEdges, dtype=np.int64)
+            Stops = np.empty(nEdges, dtype=np.int64)
+            e = 0
+            for i in range(k):
+                for j in range(i + 1, k):
+                    if Lambda[i, j] > 0:
+                        Starts[e] = i
+                        Stops[e] = j
+                        e += 1
+            Keep = np.ones(nEdges, dtype=np.bool_)
+            for e in range(nEdges):
+                a = Connectivities[Starts[e]]
+                b = Connectivities[Stops[e]]
+                if Op == 3 and min(a, b) <= 1:
+                    Keep[e] = False
+                if max(a, b) < K:
+                    Keep[e] = False
+            Starts = Starts[Keep]
+            Stops = Stops[Keep]
+            Targets = np.arange(len(Starts))
+        else:
+            # removenode
+            Targets = np.nonzero(Connectivities == 1)[0]
+
+        for t in range(len(Targets)):
+            if Op == 0:
+                i = Targets[t]
+                NewNodePositions = np.zeros((k + 1, m))
+                NewNodePositions[:k] = NodePositions
+                NewElasticMatrix = np.zeros((k + 1, k + 1))
+                NewElasticMatrix[:k, :k] = ElasticMatrix
+                if Connectivities[i] == 1:
+                    # leaf: linear extrapolation from the neighbour
+                    nb_ = np.argmax(Lambda[i] > 0)
+                    NewNodePositions[k] = 2 * NodePositions[i] - NodePositions[nb_]
+                    NewElasticMatrix[k, k] = Mus[nb_]
+                elif Count[i] > 0:
+                    NewNodePositions[k] = Sum[i] / max(Count[i], 1.0)
+                else:
+                    for j in range(k):
+                        if Lambda[i, j] > 0:
+                            NewNodePositions[k] += NodePositions[j]
+                    NewNodePositions[k] /= Connectivities[i]
+                MeanLambda = LambdaSums[i] / Connectivities[i]
+                NewElasticMatrix[k, i] = MeanLambda
+                NewElasticMatrix[i, k] = MeanLambda
+                part, d = _AddNodePartition(
+                    X, SquaredX, NewNodePositions, partition, dists, TrimmingRadius2
+                )
+
+            elif Op == 1:
+                a = Starts[t]
+                b = Stops[t]
+                NewNodePositions = np.zeros((k + 1, m))
+                NewNodePositions[:k] = NodePositions
+                NewNodePositions[k] = (NodePositions[a] + NodePositions[b]) / 2
+                NewElasticMatrix = np.zeros((k + 1, k + 1))
+                NewElasticMatrix[:k, :k] = ElasticMatrix
+                l = ElasticMatrix[a, b]
+                NewElasticMatrix[a, b] = 0
+                NewElasticMatrix[b, a] = 0
+                NewElasticMatrix[a, k] = l
+                NewElasticMatrix[k, a] = l
+                NewElasticMatrix[k, b] = l
+                NewElasticMatrix[b, k] = l
+                if Mus[a] > 0 and Mus[b] > 0:
+                    NewElasticMatrix[k, k] = (Mus[a] + Mus[b]) / 2
+                else:
+                    NewElasticMatrix[k, k] = max(Mus[a], Mus[b])
+                part, d = _AddNodePartition(
+                    X, SquaredX, NewNodePositions, partition, dists, TrimmingRadius2
+                )
+
+            else:
+                if Op == 2:
+                    Removed = Targets[t]
+                    Moved = -1
+                else:
+                    Removed = Stops[t]
+                    Moved = Starts[t] - (Starts[t] > Removed)
+                newInds = np.empty(k - 1, dtype=np.int64)
+                for j in range(k - 1):
+                    newInds[j] = j + (j >= Removed)
+                NewNodePositions = np.empty((k - 1, m))
+                NewElasticMatrix = np.empty((k - 1, k - 1))
+                for i in range(k - 1):
+                    NewNodePositions[i] = NodePositions[newInds[i]]
+                    for j in range(k - 1):
+                        NewElasticMatrix[i, j] = ElasticMatrix[newInds[i], newInds[j]]
+                if Op == 3:
+                    # the stars of the edge are merged in the middle of the edge
+                    a = Starts[t]
+                    NewNodePositions[Moved] = (NodePositions[a] + NodePositions[Removed]) / 2
+                    for j in range(k - 1):
+                        l = max(Lambda[a, newInds[j]], Lambda[Removed, newInds[j]])
+                        NewElasticMatrix[Moved, j] = l
+                        NewElasticMatrix[j, Moved] = l
+                    NewElasticMatrix[Moved, Moved] = (Mus[a] + Mus[Removed]) / 2
+                part, d = _RemoveNodePartition(
+                    X,
+                    SquaredX,
+                    NewNodePositions,
+                    partition,
+                    dists,
+                    Removed,
+                    Moved,
+                    TrimmingRadius2,
+                )
+
+            Result = FastElasticGraphEmbedment(
+                X,
+                SquaredX,
+                NewNodePositions,
+                NewElasticMatrix,
+                part,
+                d,
+                MaxNumberOfIterations,
+                eps,
+                Mode,
+                TrimmingRadius2,
+                Penalized,
+                alpha,
+                beta,
+            )
+            if Result[1] < BestEnergy:
+                BestEnergy = Result[1]
+                Best = (
+                    Result[0],
+                    NewElasticMatrix,
+                    Result[1],
+                    Result[4],
+                    Result[5],
+                    Result[6],
+                    Result[3],
+                    o,
+                    Targets[t] if Op == 0 or Op == 2 else Starts[t] * k + Stops[t],
+                )
+    return Best
+
+
+def FastPathSupported(Grammars, PartitionStrategy="exact", NumNodes=np.inf, **Conditions):
+    """
+    # Can the grammar applications be compiled? The grammars must only contain operations of FASTPATH_OPERATIONS,
+    # the partitions must be exact and all the Conditions (features not supported by the compiled applications) False
+    """
+    return (
+        all(op in FASTPATH_OPERATIONS for Grammar in Grammars for op in Grammar)
+        and (
+            PartitionStrategy == "exact"
+            or (PartitionStrategy == "auto" and NumNodes < 500)
+        )
+        and not any(Conditions.values())
+    )
+
+
+def FastApplyGrammar(
+    X,
+    SquaredX,
+    PG,
+    Grammar,
+    MaxNumberOfIterations=10,
+    eps=0.01,
+    Mode=1,
+    TrimmingRadius=float("inf"),
+    FinalEnergy="Base",
+    alpha=0,
+    beta=0,
+):
+    """
+    #' Application of a grammar with FastApplyOptimalGraphGrammarOperation
+    #'
+    #' @param X, SquaredX the data and rowSums(X^2)
+    #' @param PG the current graph (as in ElPrincGraph)
+    #' @param Grammar list of the operations of FASTPATH_OPERATIONS
+    #'
+    #' @return the graph structure returned by ApplyOptimalGraphGrammarOperation, or "failed operation"
+    """
+    TrimmingRadius2 = float(TrimmingRadius) ** 2
+    SquaredX = np.ascontiguousarray(SquaredX, dtype=float).ravel()
+    NodePositions = np.ascontiguousarray(PG["NodePositions"], dtype=float)
+    if PG["PartData"] is not None:
+        partition = PG["PartData"][0].ravel().astype(np.int64)
+        dists = PG["PartData"][1].ravel().astype(float)
+    else:
+        partition, dists = FastPartitionData(X, SquaredX, NodePositions, TrimmingRadius2)
+
+    Codes = np.array([FASTPATH_OPERATIONS[op] for op in Grammar], dtype=np.int64)
+    (
+        NewNodePositions,
+        ElasticMatrix,
+        ElasticEnergy,
+        MSE,
+        EP,
+        RP,
+        Dist,
+        o,
+        Target,
+    ) = FastApplyOptimalGraphGrammarOperation(
+        X,
+        SquaredX,
+        NodePositions,
+        np.ascontiguousarray(PG["ElasticMatrix"], dtype=float),
+        partition,
+        dists,
+        Codes[:, 0].copy(),
+        Codes[:, 1].copy(),
+        MaxNumberOfIterations,
+        eps,
+        Mode,
+        TrimmingRadius2,
+        FinalEnergy == "Penalized",
+        alpha,
+        beta,
+    )
+    if o == -1:
+        return "failed operation"
+
+    # the retained nodes of a removal keep their adjustment state
+    AdjustVect = list(PG["AdjustVect"])
+    if Codes[o, 0] <= 1:
+        AdjustVect = AdjustVect + [False]
+    else:
+        Removed = Target if Codes[o, 0] == 2 else Target % len(NodePositions)
+        del AdjustVect[Removed]
+
+    partition, dists = FastPartitionData(X, SquaredX, NewNodePositions, TrimmingRadius2)
+    return dict(
+        NodePositions=NewNodePositions,
+        ElasticMatrix=ElasticMatrix,
+        ElasticEnergy=ElasticEnergy,
+        MSE=MSE,
+        EP=EP,
+        RP=RP,
+        AdjustVect=AdjustVect,
+        Dist=Dist[:, np.newaxis],
+        PartData=(partition[:, np.newaxis], dists[:, np.newaxis]),
+        Operation=Grammar[o],
+        NodeIDs=None,
+    )
@@ -8,6 +8,17 @@ from .core import (
     PrimitiveElasticGraphEmbedment_cp,
     DecodeElasticMatrix2,
 )
+from .lazygreedy import (
+    NewNodeIDs,
+    GrammarCacheKeys,
+    CachedDeltas,
+    UpdateGrammarCache,
+)
+from .shortlist import ShortlistCandidates, UpdateShortlistDiagnostics
+from .datacontext import CheckDataContext, GetSubsample
+from .budget import BudgetRemaining, ChargeBudget, BudgetExhausted
+from .executors import ExecutorBroadcast, ExecutorMap
+from .scheduler import PlanEmbedments, LimitBLASThreads
 from .._EMAdjustment import AdjustByConstant
 
 
@@ -19,6 +30,18 @@ def proxy_cp(Dict):
     return PrimitiveElasticGraphEmbedment_cp(**Dict)
 
 
+def _EmbedTask(Task, Shared):
+    NodePositions, ElasticMatrix, Parameters = Task
+    return PrimitiveElasticGraphEmbedment(
+        Shared["X"],
+        NodePositions,
+        ElasticMatrix,
+        SquaredX=Shared.get("SquaredX"),
+        PointWeights=Shared.get("PointWeights"),
+        **Parameters
+    )
+
+
 # Some elementary graph transformations -----------------------------------
 
 # def f_RemoveNode(NodePositions, ElasticMatrix,NodeNumber):
@@ -93,36 +116,134 @@ def proxy_cp(Dict):
 # Grammar function wrapper ------------------------------------------------
 
 
-def GraphGrammarOperation(X, NodePositions, ElasticMatrix, AdjustVect, Type, partition):
+def GraphGrammarOperation(
+    X,
+    NodePositions,
+    ElasticMatrix,
+    AdjustVect,
+    Type,
+    partition,
+    NodeStats=None,
+    NodeMaps=False,
+):
+    """
+    # Candidates of the grammar operation Type. If NodeMaps is True, the node maps of the candidates
+    # are also returned: Touched is a list with, for each candidate, the tuple of parent nodes the
+    # operation is applied to, and Retained is a list with, for each candidate, the vector giving the
+    # parent node of each node of the candidate (-1 for a new node)
+    """
     if Type == "addnode2node":
-        return AddNode2Node(X, NodePositions, ElasticMatrix, partition, AdjustVect)
+        return AddNode2Node(
+            X,
+            NodePositions,
+            ElasticMatrix,
+            partition,
+            AdjustVect,
+            NodeStats=NodeStats,
+            NodeMaps=NodeMaps,
+        )
     elif Type == "addnode2node_1":
         return AddNode2Node(
-            X, NodePositions, ElasticMatrix, partition, AdjustVect, Max_K=1
+            X,
+            NodePositions,
+            ElasticMatrix,
+            partition,
+            AdjustVect,
+            Max_K=1,
+            NodeStats=NodeStats,
+            NodeMaps=NodeMaps,
         )
     elif Type == "addnode2node_2":
         return AddNode2Node(
-            X, NodePositions, ElasticMatrix, partition, AdjustVect, Max_K=2
+            X,
+            NodePositions,
+            ElasticMatrix,
+            partition,
+            AdjustVect,
+            Max_K=2,
+            NodeStats=NodeStats,
+            NodeMaps=NodeMaps,
         )
     elif Type == "removenode":
-        return RemoveNode(NodePositions, ElasticMatrix, AdjustVect)
+        return RemoveNode(NodePositions, ElasticMatrix, AdjustVect, NodeMaps=NodeMaps)
     elif Type == "bisectedge":
-        return BisectEdge(NodePositions, ElasticMatrix, AdjustVect)
+        return BisectEdge(NodePositions, ElasticMatrix, AdjustVect, NodeMaps=NodeMaps)
     elif Type == "bisectedge_3":
-        return BisectEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=3)
+        return BisectEdge(
+            NodePositions, ElasticMatrix, AdjustVect, Min_K=3, NodeMaps=NodeMaps
+        )
     elif Type == "shrinkedge":
-        return ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect)
+        return ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, NodeMaps=NodeMaps)
     elif Type == "shrinkedge_3":
-        return ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=3)
+        return ShrinkEdge(
+            NodePositions, ElasticMatrix, AdjustVect, Min_K=3, NodeMaps=NodeMaps
+        )
     else:
         raise ValueError("Operation " + Type + " is not defined")
 
 
+def ComputeNodeStatistics(X, NodePositions, ElasticMatrix, partition, dists=None):
+    """
+    # Per-node statistics of a partitioned graph, computed once per grammar step
+    # and shared by the grammar operations and the candidate evaluation
+    #
+    # Inputs
+    #   X is n-by-m matrix of datapoints
+    #   NodePositions is k-by-m matrix of positions of the graph nodes
+    #   ElasticMatrix is k-by-k elastic matrix of the graph
+    #   partition is n-by-1 vector of the nearest node of each point (-1 if trimmed)
+    #   dists is n-by-1 vector of squared distances to the nearest node (optional)
+    #
+    # Outputs (dict)
+    #   Count is k vector, number of points associated with each node
+    #   Sum is k-by-m matrix, sum of the points associated with each node
+    #   DistSum is k vector, sum of dists of the points associated with each node
+    #       (None if dists is not given)
+    #   Degree is k vector, number of edges of each node
+    #   MeanLambda is k vector, mean elasticity of the edges of each node
+    #   Mu is k vector, star elasticities
+    """
+    nNodes = NodePositions.shape[0]
+    part = partition.ravel()
+    ind = part > -1
+    part = part[ind]
+    Count = np.bincount(part, minlength=nNodes)
+    Sum = np.zeros((nNodes, X.shape[1]))
+    for k in range(X.shape[1]):
+        Sum[:, k] = np.bincount(part, weights=X[ind, k], minlength=nNodes)
+    if dists is not None:
+        DistSum = np.bincount(part, weights=dists.ravel()[ind], minlength=nNodes)
+    else:
+        DistSum = None
+
+    Lambda = ElasticMatrix.copy()
+    np.fill_diagonal(Lambda, 0)
+    Degree = (Lambda > 0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        MeanLambda = Lambda.sum(axis=0) / Degree
+
+    return dict(
+        Count=Count,
+        Sum=Sum,
+        DistSum=DistSum,
+        Degree=Degree,
+        MeanLambda=MeanLambda,
+        Mu=ElasticMatrix.diagonal().copy(),
+    )
+
+
 # Grammar functions ------------------------------------------------
 
 
 def AddNode2Node(
-    X, NodePositions, ElasticMatrix, partition, AdjustVect, Max_K=float("inf")
+    X,
+    NodePositions,
+    ElasticMatrix,
+    partition,
+    AdjustVect,
+    Max_K=float("inf"),
+    NodeStats=None,
+    NodeMaps=False,
 ):
     """
     #' Adds a node to each graph node
@@ -135,6 +256,9 @@ def AddNode2Node(
     #' @param X
     #' @param NodePositions
     #' @param ElasticMatrix
+    #' @param NodeStats per-node statistics returned by ComputeNodeStatistics for this partition.
+    #' If None, they will be computed by the function
+    #' @param NodeMaps boolean, should the node maps of the candidates also be returned (see GraphGrammarOperation)?
     #' @return
     #' @export
     #'
@@ -144,24 +268,15 @@ def AddNode2Node(
     #'
     #' @examples
     """
+    if NodeStats is None:
+        NodeStats = ComputeNodeStatistics(X, NodePositions, ElasticMatrix, partition)
+
     nNodes = NodePositions.shape[0]
-    Mus = ElasticMatrix.diagonal()
+    Mus = NodeStats["Mu"]
+    Connectivities = NodeStats["Degree"]
     Lambda = ElasticMatrix.copy()
     np.fill_diagonal(Lambda, 0)
     indL = Lambda > 0
-    Connectivities = indL.sum(axis=0)
-    # add pointweights here if added
-    assoc = np.bincount(partition[partition > -1].ravel(), minlength=nNodes)
-    # Create prototypes for new NodePositions, ElasticMatrix and inds
-    npProt = np.vstack((NodePositions, np.zeros((1, NodePositions.shape[1]))))
-    emProt = np.vstack(
-        (np.hstack((Lambda, np.zeros((nNodes, 1)))), np.zeros((1, nNodes + 1)))
-    )
-    #     niProt = np.arange(nNodes+1)
-    #     niProt[nNodes] = 0
-
-    MuProt = np.zeros(nNodes + 1)
-    MuProt[:-1] = Mus
 
     if not np.isinf(Max_K):
         Degree = np.sum(ElasticMatrix > 0, axis=1)
@@ -174,47 +289,65 @@ def AddNode2Node(
     else:
         idx_nodes = np.array(range(nNodes))
 
-    # Put prototypes to corresponding places
-    NodePositionsArray = [npProt.copy() for i in range(len(idx_nodes))]
-    ElasticMatrices = [emProt.copy() for i in range(len(idx_nodes))]
-    #     NodeIndicesArray = np.repeat(niProt[:, np.newaxis], len(idx_nodes), axis=1)
-    AdjustVectArray = [AdjustVect + [False] for i in range(len(idx_nodes))]
-
-    for j, i in enumerate(idx_nodes):
-        MuProt[-1] = 0
-        # Compute mean edge elasticity for edges with node i
-        meanL = Lambda[i, indL[i,]].mean(axis=0)
-        # Add edge to elasticity matrix
-        ElasticMatrices[j][nNodes, i] = ElasticMatrices[j][i, nNodes] = meanL
-
-        if Connectivities[i] == 1:
-            # Add node to terminal node
-            ineighbour = np.nonzero(indL[i,])[0]
-            # Calculate new node position
-            NewNodePosition = (
-                2 * NodePositions[i,] - NodePositions[ineighbour,]
-            )
-            # Complete Elasticity Matrix
-            MuProt[nNodes] = Mus[ineighbour]
-        else:
-            # Add node to a star
-            # if 0 data points associated with this star
-            if assoc[i] == 0:
-                # then select mean of all leaves as new position
-                NewNodePosition = NodePositions[indL[:, i]].mean(axis=0)
-
-            else:
-                # Otherwise take the mean of the points associated with the
-                # central node
-                NewNodePosition = X[(partition == i).ravel()].mean(axis=0)
-        # fill node position
-        NodePositionsArray[j][nNodes, :] = NewNodePosition
-        np.fill_diagonal(ElasticMatrices[j], MuProt)
+    nGraphs = len(idx_nodes)
+    Conn = Connectivities[idx_nodes]
+    isLeaf = Conn == 1
+
+    # New node positions and star elasticities of all the candidates
+    NewNodePositions = np.zeros((nGraphs, NodePositions.shape[1]))
+    NewMus = np.zeros(nGraphs)
+
+    # Add node to terminal node: linear extrapolation from the neighbour
+    leaves = idx_nodes[isLeaf]
+    ineighbour = indL[leaves].argmax(axis=1)
+    NewNodePositions[isLeaf] = 2 * NodePositions[leaves] - NodePositions[ineighbour]
+    NewMus[isLeaf] = Mus[ineighbour]
+
+    # Add node to a star: mean of the points associated with the central node,
+    # or mean of all leaves if no data points are associated with this star
+    stars = idx_nodes[~isLeaf]
+    assoc = NodeStats["Count"][stars][:, np.newaxis]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        NewNodePositions[~isLeaf] = np.where(
+            assoc > 0,
+            NodeStats["Sum"][stars] / np.maximum(assoc, 1),
+            indL[stars].dot(NodePositions) / Conn[~isLeaf][:, np.newaxis],
+        )
 
-    return NodePositionsArray, ElasticMatrices, AdjustVectArray
+    # Put prototypes to corresponding places
+    j = np.arange(nGraphs)
+    NodePositionsArray = np.repeat(
+        np.vstack((NodePositions, np.zeros((1, NodePositions.shape[1]))))[np.newaxis],
+        nGraphs,
+        axis=0,
+    )
+    NodePositionsArray[:, nNodes] = NewNodePositions
+
+    emProt = np.zeros((nNodes + 1, nNodes + 1))
+    emProt[:nNodes, :nNodes] = Lambda
+    np.fill_diagonal(emProt[:nNodes, :nNodes], Mus)
+    ElasticMatrices = np.repeat(emProt[np.newaxis], nGraphs, axis=0)
+    # Add edge with the mean edge elasticity of node i
+    ElasticMatrices[j, nNodes, idx_nodes] = NodeStats["MeanLambda"][idx_nodes]
+    ElasticMatrices[j, idx_nodes, nNodes] = NodeStats["MeanLambda"][idx_nodes]
+    ElasticMatrices[j, nNodes, nNodes] = NewMus
+
+    AdjustVectArray = [AdjustVect + [False] for i in range(nGraphs)]
+
+    if NodeMaps:
+        Touched = [(i,) for i in idx_nodes]
+        Retained = [np.append(np.arange(nNodes), -1)] * nGraphs
+        return (
+            list(NodePositionsArray),
+            list(ElasticMatrices),
+            AdjustVectArray,
+            Touched,
+            Retained,
+        )
+    return list(NodePositionsArray), list(ElasticMatrices), AdjustVectArray
 
 
-def BisectEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1):
+def BisectEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1, NodeMaps=False):
     """
     # % This grammar operation inserts a node inside the middle of each edge
     # % The elasticity of the edges do not change
@@ -239,49 +372,53 @@ def BisectEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1):
         nGraphs = np.where(EdgDegree >= Min_K)[0]
     else:
         nGraphs = np.array(range(Edges.shape[0]))
-    # Create prototypes for new NodePositions, ElasticMatrix and inds
-    npProt = np.vstack((NodePositions, np.zeros((1, NodePositions.shape[1]))))
-    emProt = np.vstack(
-        (np.hstack((ElasticMatrix, np.zeros((nNodes, 1)))), np.zeros((1, nNodes + 1)))
-    )
-    #     niProt = np.arange(nNodes+1)
-    #     niProt[nNodes] = 0
+    start = Edges[nGraphs, 0]
+    stop = Edges[nGraphs, 1]
+    j = np.arange(len(nGraphs))
 
     # Allocate arrays and put prototypes in place
-    NodePositionsArray = [npProt.copy() for i in range(len(nGraphs))]
-    ElasticMatrices = [emProt.copy() for i in range(len(nGraphs))]
-    #     NodeIndicesArray = np.repeat(niProt[:, np.newaxis], len(nGraphs), axis=1)
-    AdjustVectArray = [AdjustVect + [False] for i in range(len(nGraphs))]
+    NodePositionsArray = np.repeat(
+        np.vstack((NodePositions, np.zeros((1, NodePositions.shape[1]))))[np.newaxis],
+        len(nGraphs),
+        axis=0,
+    )
+    NodePositionsArray[:, nNodes] = (NodePositions[start] + NodePositions[stop]) / 2
+
+    emProt = np.zeros((nNodes + 1, nNodes + 1))
+    emProt[:nNodes, :nNodes] = ElasticMatrix
+    ElasticMatrices = np.repeat(emProt[np.newaxis], len(nGraphs), axis=0)
+    Lambda = ElasticMatrix[start, stop]
+    # remove edge
+    ElasticMatrices[j, start, stop] = 0
+    ElasticMatrices[j, stop, start] = 0
+    # add 2 edges
+    ElasticMatrices[j, start, nNodes] = Lambda
+    ElasticMatrices[j, nNodes, start] = Lambda
+    ElasticMatrices[j, nNodes, stop] = Lambda
+    ElasticMatrices[j, stop, nNodes] = Lambda
+    # Define mus of edges
+    mu1 = Mus[start]
+    mu2 = Mus[stop]
+    ElasticMatrices[j, nNodes, nNodes] = np.where(
+        (mu1 > 0) & (mu2 > 0), (mu1 + mu2) / 2, np.maximum(mu1, mu2)
+    )
 
-    for j, i in enumerate(nGraphs):
-        NewNodePosition = (
-            NodePositions[Edges[i, 0],] + NodePositions[Edges[i, 1],]
-        ) / 2
-
-        # Fill NodePosition
-        NodePositionsArray[j][nNodes, :] = NewNodePosition
-        # correct elastic matrix
-        Lambda = ElasticMatrix[Edges[i, 0], Edges[i, 1]]
-        # remove edge
-        ElasticMatrices[j][Edges[i, 0], Edges[i, 1]] = 0
-        ElasticMatrices[j][Edges[i, 1], Edges[i, 0]] = 0
-        # add 2 edges
-        ElasticMatrices[j][Edges[i, 0], nNodes] = Lambda
-        ElasticMatrices[j][nNodes, Edges[i, 0]] = Lambda
-        ElasticMatrices[j][nNodes, Edges[i, 1]] = Lambda
-        ElasticMatrices[j][Edges[i, 1], nNodes] = Lambda
-        # Define mus of edges
-        mu1 = Mus[Edges[i, 0]]
-        mu2 = Mus[Edges[i, 1]]
-        if mu1 > 0 and mu2 > 0:
-            ElasticMatrices[j][nNodes, nNodes] = (mu1 + mu2) / 2
-        else:
-            ElasticMatrices[j][nNodes, nNodes] = max(mu1, mu2)
+    AdjustVectArray = [AdjustVect + [False] for i in range(len(nGraphs))]
 
-    return NodePositionsArray, ElasticMatrices, AdjustVectArray  # , NodeIndicesArray
+    if NodeMaps:
+        Touched = list(zip(start, stop))
+        Retained = [np.append(np.arange(nNodes), -1)] * len(nGraphs)
+        return (
+            list(NodePositionsArray),
+            list(ElasticMatrices),
+            AdjustVectArray,
+            Touched,
+            Retained,
+        )
+    return list(NodePositionsArray), list(ElasticMatrices), AdjustVectArray
 
 
-def RemoveNode(NodePositions, ElasticMatrix, AdjustVect):
+def RemoveNode(NodePositions, ElasticMatrix, AdjustVect, NodeMaps=False):
     """    
     ##  This grammar operation removes a leaf node (connectivity==1)
     """
@@ -290,34 +427,30 @@ def RemoveNode(NodePositions, ElasticMatrix, AdjustVect):
     Connectivities = (Lambda > 0).sum(axis=0)
     # Define sizes
     nNodes = ElasticMatrix.shape[0]
-    nGraphs = (Connectivities == 1).sum()
-    # Preallocate arrays
-    NodePositionsArray = [
-        np.zeros((nNodes - 1, NodePositions.shape[1])) for i in range(nGraphs)
-    ]
-    ElasticMatrices = [np.zeros((nNodes - 1, nNodes - 1)) for i in range(nGraphs)]
-    #     NodeIndicesArray = np.zeros((nNodes-1, nGraphs))
-    AdjustVectArray = [[] for i in range(nGraphs)]
-
-    k = 0
-    for i in range(Connectivities.shape[0]):
-        if Connectivities[i] == 1:
-            # if terminal node remove it
-            newInds = np.concatenate(
-                (np.arange(0, i, dtype=int), np.arange(i + 1, nNodes, dtype=int))
-            )
-            AdjustVectArray[k] = [AdjustVect[j] for j in newInds]
-            NodePositionsArray[k] = NodePositions[newInds, :]
-            tmp = np.repeat(False, nNodes)
-            tmp[newInds] = True
-            tmp2 = ElasticMatrix[tmp, :]
-            ElasticMatrices[k] = tmp2[:, tmp]
-            #             NodeIndicesArray[:, k] = newInds
-            k += 1
-    return NodePositionsArray, ElasticMatrices, AdjustVectArray  # , NodeIndicesArray
-
-
-def ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1):
+    # if terminal node remove it
+    leaves = np.where(Connectivities == 1)[0]
+    # indices of the retained nodes for each graph
+    newInds = np.arange(nNodes - 1)[np.newaxis]
+    newInds = newInds + (newInds >= leaves[:, np.newaxis])
+
+    NodePositionsArray = NodePositions[newInds]
+    ElasticMatrices = ElasticMatrix[newInds[:, :, np.newaxis], newInds[:, np.newaxis, :]]
+    AdjustVectArray = np.array(AdjustVect, dtype=bool)[newInds].tolist()
+
+    if NodeMaps:
+        # the leaf and its neighbour
+        Touched = [(i, Lambda[i].argmax()) for i in leaves]
+        return (
+            list(NodePositionsArray),
+            list(ElasticMatrices),
+            AdjustVectArray,
+            Touched,
+            list(newInds),
+        )
+    return list(NodePositionsArray), list(ElasticMatrices), AdjustVectArray
+
+
+def ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1, NodeMaps=False):
     """
     # %
     # % This grammar operation removes an edge from the graph
@@ -336,7 +469,6 @@ def ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1):
     Connectivities = (Lambda > 0).sum(axis=0)
     # get list of edges
     start, stop = np.triu(ElasticMatrix, 1).nonzero()
-    # Edges = np.concatenate((start[None], stop[None]))
     # define size
     nNodes = NodePositions.shape[0]
     # identify edges with minimal connectivity > 1
@@ -350,41 +482,41 @@ def ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K=1):
     stop = stop[ind]
     # calculate nb of graphs
     nGraphs = start.shape[0]
-
-    # preallocate array
-    NodePositionsArray = [
-        np.zeros((nNodes - 1, NodePositions.shape[1])) for i in range(nGraphs)
+    j = np.arange(nGraphs)
+
+    # Form index for retained nodes and extract corresponding part of
+    # node positions and elastic matrix
+    newInds = np.arange(nNodes - 1)[np.newaxis]
+    newInds = newInds + (newInds >= stop[:, np.newaxis])
+    # position of start[i] among the retained nodes
+    newStart = start - (start > stop)
+
+    NodePositionsArray = NodePositions[newInds]
+    NodePositionsArray[j, newStart] = (NodePositions[start] + NodePositions[stop]) / 2
+
+    # Reattaches all edges connected with stop[i] to start[i]
+    # and make a new star with an elasticity average of two merged stars
+    ElasticMatrices = ElasticMatrix[newInds[:, :, np.newaxis], newInds[:, np.newaxis, :]]
+    MergedLambda = np.maximum(Lambda[start], Lambda[stop])[
+        j[:, np.newaxis], newInds
     ]
-    ElasticMatrices = [np.zeros((nNodes - 1, nNodes - 1)) for i in range(nGraphs)]
-    #     NodeIndicesArray = np.zeros((nNodes-1, nGraphs))
-    AdjustVectArray = [[] for i in range(nGraphs)]
-
-    for i in range(nGraphs):
-        # create copy of elastic matrix
-        em = ElasticMatrix.copy()
-        # Reattaches all edges connected with stop[i] to start[i]
-        # and make a new star with an elasticity average of two merged stars
-        em[start[i],] = np.maximum(Lambda[start[i],], Lambda[stop[i],])
-        em[:, start[i]] = np.maximum(Lambda[:, start[i]], Lambda[:, stop[i]])
-        em[start[i], start[i]] = (Mus[start[i]] + Mus[stop[i]]) / 2
-        #         em[start[i], start[i]] = Mus[start[i]] + Mus[stop[i]] / 2  #### R bug ????
-        # Create copy of node positions
-        nodep = NodePositions.copy()
-        # modify node start[i]
-        nodep[start[i], :] = (nodep[start[i], :] + nodep[stop[i], :]) / 2
-        # Form index for retained nodes and extract corresponding part of
-        # node positions and elastic matrix
-        newInds = np.concatenate(
-            (np.arange(0, stop[i]), np.arange(stop[i] + 1, nNodes))
+    ElasticMatrices[j, newStart, :] = MergedLambda
+    ElasticMatrices[j, :, newStart] = MergedLambda
+    ElasticMatrices[j, newStart, newStart] = (Mus[start] + Mus[stop]) / 2
+
+    AdjustVectArray = np.array(AdjustVect, dtype=bool)[newInds].tolist()
+
+    if NodeMaps:
+        # stop is merged into start
+        Touched = list(zip(start, stop))
+        return (
+            list(NodePositionsArray),
+            list(ElasticMatrices),
+            AdjustVectArray,
+            Touched,
+            list(newInds),
         )
-
-        AdjustVectArray[i] = [AdjustVect[j] for j in newInds]
-
-        NodePositionsArray[i] = nodep[newInds, :]
-        ElasticMatrices[i] = em.take(newInds, axis=0).take(newInds, axis=1)
-    #         NodeIndicesArray[:, i] = newInds
-
-    return NodePositionsArray, ElasticMatrices, AdjustVectArray  # ,NodeIndicesArray
+    return list(NodePositionsArray), list(ElasticMatrices), AdjustVectArray
 
 
 def ApplyOptimalGraphGrammarOperation(
@@ -408,10 +540,30 @@ def ApplyOptimalGraphGrammarOperation(
     AdjustElasticMatrix=None,
     DisplayWarnings=True,
     n_cores=1,
-    MinParOp=20,
+    MinParOp="auto",
     multiproc_shared_variables=None,
     Xcp=None,
     SquaredXcp=None,
+    PartitionStrategy="exact",
+    PartData=None,
+    GrammarCache=None,
+    NodeIDs=None,
+    ParentEnergy=None,
+    ShortlistSize=None,
+    ShortlistProxies=None,
+    ShortlistDiagnostics=None,
+    ScreeningSize=None,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    DataContext=None,
+    BatchSize=1,
+    Budget=None,
+    PointWeights=None,
+    Executor=None,
+    MemoryBudget=None,
+    Solver="dense",
+    PartitionKernel="numpy",
+    CostModel=None,
 ):
 
     """
@@ -446,46 +598,573 @@ def ApplyOptimalGraphGrammarOperation(
     #' @param AdjustVect 
     #' @param AdjustElasticMatrix 
     #' @param ... 
-    #' @param MinParOp integer, the minimum number of operations to use parallel computation
+    #' @param MinParOp "auto" or integer, how the number of processes embedding the candidates is chosen (see PlanEmbedments).
+    #' "auto" uses a cost model of the embedments, an integer is the minimum number of operations to use parallel computation
+    #' @param PartitionStrategy string, partition strategy used when embedding the candidate graphs
+    #' ("exact", "graph" or "auto", see PrimitiveElasticGraphEmbedment). The graph-guided search
+    #' starts from the partition of the parent graph
+    #' @param PartData tuple (partition, dists) of the data on NodePositions, e.g. the PartData returned by the previous
+    #' grammar application. If None, it will be computed
+    #' @param GrammarCache cache returned by MakeGrammarCache. If not None, the candidates are evaluated lazily:
+    #' the candidates without a valid cached energy change are embedded first, then the other ones are embedded
+    #' by increasing cached energy change as long as it could improve the best energy found (and the cached value is
+    #' assumed otherwise). This is exact if the energy change of a candidate can only increase when the graph
+    #' is modified elsewhere, and an approximation otherwise
+    #' @param NodeIDs vector of the identifiers of the nodes used by GrammarCache (e.g., the NodeIDs returned by the previous
+    #' grammar application). If None, new identifiers are assigned
+    #' @param ParentEnergy the elastic energy of the graph (e.g., the ElasticEnergy returned by the previous grammar
+    #' application), needed to use GrammarCache
+    #' @param ShortlistSize integer or numeric between 0 and 1. If not None, the candidates of each operation are ranked by a
+    #' proxy of their energy decrease computed from the parent partition and only the ShortlistSize best ones
+    #' (or this fraction of them) are embedded (see ShortlistCandidates)
+    #' @param ShortlistProxies dict of proxy functions overriding the default ones (see ShortlistCandidates)
+    #' @param ShortlistDiagnostics accumulator returned by MakeShortlistDiagnostics. If not None, all the candidates are
+    #' embedded (the result does not depend on ShortlistSize) and the rank of the optimal candidate in the
+    #' shortlist is recorded
+    #' @param ScreeningSize integer. If not None (and smaller than the number of points), the candidates are first embedded on
+    #' a fixed random subsample of ScreeningSize points and only the ScreeningFinalists best ones are embedded on the full data
+    #' (see ScreenCandidates)
+    #' @param ScreeningFinalists integer, number of candidates embedded on the full data after screening
+    #' @param ScreeningGap numeric, if the relative energy gap between the best screened candidate and the best non-finalist is
+    #' smaller than ScreeningGap, the leading candidates are screened again on a subsample twice as large
+    #' @param DataContext dataset context of X (see MakeDataContext) holding the screening subsample. If None, it will be created
+    #' @param BatchSize integer, maximum number of operations applied at once. If > 1, the best candidates that only add a node and
+    #' whose neighbourhoods (modified nodes and their neighbours) are disjoint are applied together to the graph, which is then
+    #' embedded once (see BatchGraphGrammarOperations)
+    #' @param Budget compute budget returned by MakeBudget. If not None, the candidates are embedded by rounds while the budget lasts
+    #' and the optimal graph is selected among the embedded candidates (the screening embedments are not charged).
+    #' If the budget is exhausted before any candidate is embedded, "budget exhausted" is returned
+    #' @param PointWeights numerical vector, the weights of the points used by the embedments (see PrimitiveElasticGraphEmbedment).
+    #' If None, all the points have the same weight
+    #' @param Executor executor created by MakeExecutor. If not None, the candidates are embedded by the executor (using its
+    #' number of workers instead of n_cores), X, SquaredX and PointWeights being broadcast once to its workers
+    #' @param MemoryBudget numeric, memory (in bytes) available to the processes embedding the candidates, which limits
+    #' their number (see PlanEmbedments). If None, the memory is not limited
+    #' @param Solver solver of the node positions of the embedments (see PrimitiveElasticGraphEmbedment)
+    #' @param PartitionKernel kernel of the exact partitions of the embedments (see PrimitiveElasticGraphEmbedment)
+    #' @param CostModel dict of the constants of the cost model of PlanEmbedments (e.g. measured by RunAutotune).
+    #' If None, the default constants are used
     #'
     #' @return
     #'
     #' @examples
     """
 
-    NodePositionsArrayAll = []
-    ElasticMatricesAll = []
-    AdjustVectAll = []
-
-    #    if SquaredX is None and SquaredXcp is None:
-    #        SquaredX = (X**2).sum(axis=1,keepdims=1)
+    if Executor is not None:
+        n_cores = Executor["n_cores"]
 
-    if Xcp is None:
-        partition, _ = PartitionData(
+    if PartData is not None:
+        partition, dists = PartData
+    elif Xcp is None:
+        partition, dists = PartitionData(
             X, NodePositions, MaxBlockSize, SquaredX, TrimmingRadius
         )
     else:
-        partition, _ = PartitionData_cp(
+        partition, dists = PartitionData_cp(
             Xcp, NodePositions, MaxBlockSize, SquaredXcp, TrimmingRadius
         )
 
+    Candidates = GenerateGraphGrammarCandidates(
+        X,
+        NodePositions,
+        ElasticMatrix,
+        opTypes,
+        AdjustVect,
+        partition,
+        dists,
+        SquaredX=SquaredX,
+        verbose=verbose,
+        MaxBlockSize=MaxBlockSize,
+        TrimmingRadius=TrimmingRadius,
+        AvoidSolitary=AvoidSolitary,
+        AdjustElasticMatrix=AdjustElasticMatrix,
+        Xcp=Xcp,
+        SquaredXcp=SquaredXcp,
+        NodeMaps=GrammarCache is not None
+        or BatchSize > 1
+        or ShortlistSize is not None
+        or ShortlistDiagnostics is not None
+        or PartitionStrategy != "exact",
+    )
+    if Candidates == "failed operation":
+        return Candidates
+
+    Parameters = EmbedmentParameters(
+        MaxNumberOfIterations=MaxNumberOfIterations,
+        eps=eps,
+        Mode=Mode,
+        FinalEnergy=FinalEnergy,
+        alpha=alpha,
+        beta=beta,
+        EmbPointProb=EmbPointProb,
+        DisplayWarnings=DisplayWarnings,
+        MaxBlockSize=MaxBlockSize,
+        TrimmingRadius=TrimmingRadius,
+        SquaredX=SquaredX,
+        PartitionStrategy=PartitionStrategy,
+        InitPartition=None if PartitionStrategy == "exact" else partition,
+        Xcp=Xcp,
+        SquaredXcp=SquaredXcp,
+        PointWeights=PointWeights,
+        Solver=Solver,
+        PartitionKernel=PartitionKernel,
+    )
+    nCandidates = len(Candidates["NodePositions"])
+    results = [None] * nCandidates
+
+    if GrammarCache is not None:
+        if NodeIDs is None:
+            NodeIDs = NewNodeIDs(GrammarCache, len(NodePositions))
+        Keys = GrammarCacheKeys(Candidates, NodeIDs)
+
+    if ShortlistSize is not None or ShortlistDiagnostics is not None:
+        Shortlist, Ranks = ShortlistCandidates(
+            Candidates,
+            NodePositions,
+            ElasticMatrix,
+            len(X),
+            ShortlistSize,
+            ShortlistProxies,
+        )
+    if ShortlistSize is not None and ShortlistDiagnostics is None:
+        Allowed = set(Shortlist)
+    else:
+        Allowed = set(range(nCandidates))
+
+    if (
+        GrammarCache is not None
+        and ParentEnergy is not None
+        and ShortlistDiagnostics is None
+    ):
+        Cached = {
+            i: d for i, d in CachedDeltas(GrammarCache, Keys).items() if i in Allowed
+        }
+    else:
+        Cached = {}
+
+    Fresh = [i for i in sorted(Allowed) if i not in Cached]
+    if (
+        ScreeningSize is not None
+        and ScreeningSize < len(X)
+        and Xcp is None
+        and ShortlistDiagnostics is None
+    ):
+        Fresh = ScreenCandidates(
+            X,
+            Candidates,
+            Fresh,
+            Parameters,
+            partition,
+            CheckDataContext(DataContext, X),
+            ScreeningSize,
+            ScreeningFinalists,
+            ScreeningGap,
+            n_cores,
+            MinParOp,
+            Executor,
+            MemoryBudget,
+            CostModel,
+        )
+    for i, r in zip(
+        Fresh,
+        EmbedCandidates(
+            X,
+            Candidates,
+            Fresh,
+            Parameters,
+            n_cores,
+            MinParOp,
+            Xcp,
+            Budget,
+            Executor,
+            MemoryBudget,
+            CostModel,
+        ),
+    ):
+        results[i] = r
+
+    # lazy evaluation of the cached candidates that could beat the best energy
+    Order = sorted(Cached, key=Cached.get)
+    while len(Order) > 0 and not BudgetExhausted(Budget):
+        minEnergy = min([np.inf] + [r[1] for r in results if r is not None])
+        Batch = [
+            i for i in Order[: max(n_cores, 1)] if ParentEnergy + Cached[i] < minEnergy
+        ]
+        if len(Batch) == 0:
+            break
+        for i, r in zip(
+            Batch,
+            EmbedCandidates(
+                X,
+                Candidates,
+                Batch,
+                Parameters,
+                n_cores,
+                MinParOp,
+                Xcp,
+                Budget,
+                Executor,
+                MemoryBudget,
+                CostModel,
+            ),
+        ):
+            results[i] = r
+        Order = Order[len(Batch) :]
+
+    idx = SelectOptimalCandidate(results)
+    if results[idx] is None:
+        return "budget exhausted"
+
+    if ShortlistDiagnostics is not None:
+        UpdateShortlistDiagnostics(ShortlistDiagnostics, Candidates, Shortlist, Ranks, idx)
+
+    Optimal = (Candidates, results[idx], idx)
+    if BatchSize > 1:
+        BatchCandidates = BatchGraphGrammarOperations(
+            NodePositions, ElasticMatrix, AdjustVect, Candidates, results, idx, BatchSize
+        )
+        if BatchCandidates is not None:
+            result = EmbedCandidates(
+                X, BatchCandidates, [0], Parameters, 1, MinParOp, Xcp, Budget
+            )[0]
+            # the joint embedment is kept only if it improves on the optimal candidate
+            if result is not None and result[1] <= results[idx][1]:
+                Optimal = (BatchCandidates, result, 0)
+
+    if GrammarCache is not None:
+        NodeIDs = UpdateGrammarCache(
+            GrammarCache,
+            Keys,
+            results,
+            ParentEnergy,
+            Optimal[0],
+            Optimal[2],
+            NodeIDs,
+        )
+
+    Optimal = OptimalGraph(
+        X,
+        *Optimal,
+        MaxBlockSize=MaxBlockSize,
+        SquaredX=SquaredX,
+        TrimmingRadius=TrimmingRadius,
+        Xcp=Xcp,
+        SquaredXcp=SquaredXcp,
+    )
+    Optimal["NodeIDs"] = NodeIDs
+    return Optimal
+
+
+def BatchGraphGrammarOperations(
+    NodePositions, ElasticMatrix, AdjustVect, Candidates, results, idx, BatchSize
+):
+    """
+    # Combine the optimal candidate idx with the next best evaluated candidates (at most BatchSize
+    # operations in total) that only add a node to the graph and whose neighbourhoods are disjoint
+    #
+    # Returns None if no other candidate can be combined, otherwise a candidate dict (as returned by
+    # GenerateGraphGrammarCandidates with NodeMaps=True) containing the combined graph, whose first
+    # nodes are the nodes of the parent graph (with their initial positions) followed by the new nodes
+    """
+    nNodes = len(NodePositions)
+    Adjacency = ElasticMatrix > 0
+    np.fill_diagonal(Adjacency, False)
+
+    def Neighbourhood(i):
+        Touched = list(Candidates["Touched"][i])
+        return set(Touched) | set(np.where(Adjacency[Touched].any(axis=0))[0])
+
+    def AddsNode(i):
+        Retained = Candidates["Retained"][i]
+        return len(Retained) == nNodes + 1 and Retained[-1] == -1
+
+    if not AddsNode(idx):
+        return None
+
+    Evaluated = [i for i in range(len(results)) if results[i] is not None and i != idx]
+    Order = sorted(Evaluated, key=lambda i: results[i][1])
+    Batch = [idx]
+    Used = Neighbourhood(idx)
+    for i in Order:
+        if len(Batch) >= BatchSize:
+            break
+        if AddsNode(i) and Used.isdisjoint(Neighbourhood(i)):
+            Batch.append(i)
+            Used |= Neighbourhood(i)
+
+    if len(Batch) == 1:
+        return None
+
+    # apply the changes of each operation on the parent graph
+    nNew = len(Batch)
+    CombinedPositions = np.vstack(
+        [NodePositions] + [Candidates["NodePositions"][i][nNodes:] for i in Batch]
+    )
+    CombinedMatrix = np.zeros((nNodes + nNew, nNodes + nNew))
+    CombinedMatrix[:nNodes, :nNodes] = ElasticMatrix
+    for j, i in enumerate(Batch):
+        EM = Candidates["ElasticMatrices"][i]
+        CombinedMatrix[:nNodes, :nNodes] += EM[:nNodes, :nNodes] - ElasticMatrix
+        CombinedMatrix[nNodes + j, :nNodes] = EM[nNodes, :nNodes]
+        CombinedMatrix[:nNodes, nNodes + j] = EM[:nNodes, nNodes]
+        CombinedMatrix[nNodes + j, nNodes + j] = EM[nNodes, nNodes]
+
+    return dict(
+        NodePositions=[CombinedPositions],
+        ElasticMatrices=[CombinedMatrix],
+        AdjustVects=[list(AdjustVect) + [False] * nNew],
+        Operations=["+".join(Candidates["Operations"][i] for i in Batch)],
+        Touched=[tuple(sorted(set().union(*[Candidates["Touched"][i] for i in Batch])))],
+        Retained=[np.append(np.arange(nNodes), -np.ones(nNew, dtype=int))],
+    )
+
+
+def ScreenCandidates(
+    X,
+    Candidates,
+    Indices,
+    Parameters,
+    partition,
+    DataContext,
+    ScreeningSize,
+    ScreeningFinalists=3,
+    ScreeningGap=0.01,
+    n_cores=1,
+    MinParOp="auto",
+    Executor=None,
+    MemoryBudget=None,
+    CostModel=None,
+):
+    """
+    # Embed the candidates Indices on a random subsample of X and return the ScreeningFinalists best ones.
+    # The subsample is the same for all the candidates and grammar applications (see GetSubsample).
+    # While the best energy and the best energy outside of the finalists differ by less than ScreeningGap
+    # (relative), the 2*ScreeningFinalists best candidates are screened again with twice as many points
+    """
+    Size = ScreeningSize
+    Indices = list(Indices)
+    while len(Indices) > ScreeningFinalists:
+        Sample, Xsub, SquaredXsub = GetSubsample(DataContext, Size)
+        SubParameters = dict(Parameters, SquaredX=SquaredXsub)
+        if SubParameters.get("InitPartition") is not None:
+            SubParameters["InitPartition"] = partition[Sample]
+        if SubParameters["PointWeights"] is not None:
+            SubParameters["PointWeights"] = np.reshape(Parameters["PointWeights"], -1)[Sample]
+        Energies = np.array(
+            [
+                r[1]
+                for r in EmbedCandidates(
+                    Xsub,
+                    Candidates,
+                    Indices,
+                    SubParameters,
+                    n_cores,
+                    MinParOp,
+                    Executor=Executor,
+                    MemoryBudget=MemoryBudget,
+                    CostModel=CostModel,
+                )
+            ]
+        )
+        Order = np.argsort(Energies, kind="stable")
+        Indices = [Indices[i] for i in Order]
+        Gap = (Energies[Order[ScreeningFinalists]] - Energies[Order[0]]) / abs(
+            Energies[Order[0]]
+        )
+        if Gap >= ScreeningGap or 2 * Size >= len(X):
+            break
+        Size = 2 * Size
+        Indices = Indices[: 2 * ScreeningFinalists]
+
+    return sorted(Indices[:ScreeningFinalists])
+
+
+def EmbedCandidates(
+    X,
+    Candidates,
+    Indices,
+    Parameters,
+    n_cores=1,
+    MinParOp="auto",
+    Xcp=None,
+    Budget=None,
+    Executor=None,
+    MemoryBudget=None,
+    CostModel=None,
+):
+    """
+    # Embed the candidates Indices (in parallel if n_cores > 1 and there are enough candidates,
+    # see PlanEmbedments) and return the list of the results of PrimitiveElasticGraphEmbedment.
+    # With an Executor (see MakeExecutor), the parallel embedments are run by the executor,
+    # the large arrays of the fit (X, SquaredX, PointWeights) being broadcast once.
+    # With a Budget (see MakeBudget), the candidates are embedded by rounds (one candidate, or enough
+    # candidates to use the parallel pool) until the budget is exhausted, and the results of the
+    # candidates left out are None
+    """
+    if Budget is not None:
+        if n_cores <= 1:
+            Round = 1
+        elif MinParOp == "auto":
+            Round = 2 * n_cores
+        else:
+            Round = 2 * (MinParOp + 1)
+        results = []
+        while len(results) < len(Indices):
+            n = min(Round, BudgetRemaining(Budget), len(Indices) - len(results))
+            if n == 0:
+                break
+            results.extend(
+                EmbedCandidates(
+                    X,
+                    Candidates,
+                    Indices[len(results) : len(results) + n],
+                    Parameters,
+                    n_cores,
+                    MinParOp,
+                    Xcp,
+                    Executor=Executor,
+                    MemoryBudget=MemoryBudget,
+                    CostModel=CostModel,
+                )
+            )
+            ChargeBudget(Budget, n)
+        return results + [None] * (len(Indices) - len(results))
+
+    Plan = PlanEmbedments(
+        X,
+        Candidates["NodePositions"][Indices[0]].shape[0] if len(Indices) > 0 else 0,
+        len(Indices),
+        n_cores,
+        MinParOp,
+        MemoryBudget,
+        Parameters["MaxBlockSize"],
+        SharedX=Executor is not None and Xcp is None,
+        CostModel=CostModel,
+    )
+    Parallel = Plan["Workers"] > 1
+    if Parallel and Executor is not None and Xcp is None:
+        Large = ("SquaredX", "PointWeights")
+        Shared = ExecutorBroadcast(
+            Executor,
+            dict(
+                {Name: Parameters[Name] for Name in Large if Parameters[Name] is not None},
+                X=X,
+            ),
+        )
+        Parameters = {Name: v for Name, v in Parameters.items() if Name not in Large}
+        return ExecutorMap(
+            Executor,
+            _EmbedTask,
+            [
+                (
+                    Candidates["NodePositions"][i],
+                    Candidates["ElasticMatrices"][i],
+                    CandidateParameters(Parameters, Candidates, i),
+                )
+                for i in Indices
+            ],
+            Shared,
+            ChunkSize=Plan["ChunkSize"],
+        )
+
+    if Parallel:
+        with mp.Pool(
+            Plan["Workers"], initializer=LimitBLASThreads, initargs=(Plan["BLASThreads"],)
+        ) as pool:
+            return pool.map(
+                proxy if Xcp is None else proxy_cp,
+                [
+                    dict(
+                        X=X,
+                        NodePositions=Candidates["NodePositions"][i],
+                        ElasticMatrix=Candidates["ElasticMatrices"][i],
+                        **CandidateParameters(Parameters, Candidates, i)
+                    )
+                    for i in Indices
+                ],
+                chunksize=Plan["ChunkSize"],
+            )
+
+    Embedment = (
+        PrimitiveElasticGraphEmbedment if Xcp is None else PrimitiveElasticGraphEmbedment_cp
+    )
+    return [
+        Embedment(
+            X,
+            NodePositions=Candidates["NodePositions"][i],
+            ElasticMatrix=Candidates["ElasticMatrices"][i],
+            **CandidateParameters(Parameters, Candidates, i)
+        )
+        for i in Indices
+    ]
+
+
+def GenerateGraphGrammarCandidates(
+    X,
+    NodePositions,
+    ElasticMatrix,
+    opTypes,
+    AdjustVect,
+    partition,
+    dists=None,
+    SquaredX=None,
+    verbose=False,
+    MaxBlockSize=100000000,
+    TrimmingRadius=float("inf"),
+    AvoidSolitary=False,
+    AdjustElasticMatrix=None,
+    Xcp=None,
+    SquaredXcp=None,
+    NodeMaps=False,
+):
+    """
+    # Generate the candidate graphs of a grammar application
+    #
+    # Applies all the operations in opTypes to the graph (partitioned by partition/dists),
+    # discards the configurations with solitary nodes if AvoidSolitary is True and
+    # adjusts the elastic matrices if AdjustElasticMatrix is set.
+    #
+    # Returns "failed operation" if no valid configuration is left, otherwise a dict with
+    # the lists NodePositions, ElasticMatrices, AdjustVects and Operations (grammar operation) of the
+    # candidates. If NodeMaps is True, the dict also contains the lists Touched and Retained
+    # (see GraphGrammarOperation) and the NodeStats of the parent graph
+    """
+    NodePositionsArrayAll = []
+    ElasticMatricesAll = []
+    AdjustVectAll = []
+    OperationsAll = []
+    TouchedAll = []
+    RetainedAll = []
+
+    # computed once and shared by all the grammar operations
+    NodeStats = ComputeNodeStatistics(
+        X, NodePositions, ElasticMatrix, partition, dists
+    )
+
     for i in range(len(opTypes)):
         if verbose:
             print(" Operation type : ", opTypes[i])
 
-        NodePositionsArray, ElasticMatrices, AdjustVectArray = GraphGrammarOperation(
-            X, NodePositions, ElasticMatrix, AdjustVect, opTypes[i], partition
+        Operation = GraphGrammarOperation(
+            X,
+            NodePositions,
+            ElasticMatrix,
+            AdjustVect,
+            opTypes[i],
+            partition,
+            NodeStats=NodeStats,
+            NodeMaps=NodeMaps,
         )
+        NodePositionsArray, ElasticMatrices, AdjustVectArray = Operation[:3]
 
-        #         NodePositionsArrayAll = np.concatenate((NodePositionsArrayAll,
-        #                                                NodePositionsArray), axis=2)
-        #         ElasticMatricesAll = np.concatenate((ElasticMatricesAll,
-        #                                              ElasticMatrices), axis=2)
-        #     NodeIndicesArrayAll = np.concatenate((NodeIndicesArrayAll,
-        #                                           NodeIndicesArray), axis=1)
         NodePositionsArrayAll.extend(NodePositionsArray)
         ElasticMatricesAll.extend(ElasticMatrices)
         AdjustVectAll.extend(AdjustVectArray)
+        OperationsAll.extend([opTypes[i]] * len(NodePositionsArray))
+
+        if NodeMaps:
+            TouchedAll.extend(Operation[3])
+            RetainedAll.extend(Operation[4])
 
     if verbose:
         print("Optimizing graphs")
@@ -494,39 +1173,30 @@ def ApplyOptimalGraphGrammarOperation(
 
     if AvoidSolitary:
         Valid_configurations = []
-        if Xcp is None:
-            for i in range(len(NodePositionsArrayAll)):
-                partition = PartitionData(
+        for i in range(len(NodePositionsArrayAll)):
+            if Xcp is None:
+                part = PartitionData(
                     X=X,
                     MaxBlockSize=MaxBlockSize,
                     NodePositions=NodePositionsArrayAll[i],
                     SquaredX=SquaredX,
                     TrimmingRadius=TrimmingRadius,
                 )[0]
-                if all(
-                    np.isin(
-                        np.array(range(NodePositionsArrayAll[i].shape[0])),
-                        partition[partition > -1],
-                    )
-                ):
-                    Valid_configurations.append(i)
-
-        else:
-            for i in range(len(NodePositionsArrayAll)):
-                partition = PartitionData_cp(
-                    Xcp,
-                    MaxBlockSize,
-                    NodePositionsArrayAll[i],
-                    SquaredXcp,
+            else:
+                part = PartitionData_cp(
+                    Xcp=Xcp,
+                    MaxBlockSize=MaxBlockSize,
+                    NodePositions=NodePositionsArrayAll[i],
+                    SquaredXcp=SquaredXcp,
                     TrimmingRadius=TrimmingRadius,
                 )[0]
-                if all(
-                    np.isin(
-                        np.array(range(NodePositionsArrayAll[i].shape[0])),
-                        partition[partition > -1],
-                    )
-                ):
-                    Valid_configurations.append(i)
+            if all(
+                np.isin(
+                    np.array(range(NodePositionsArrayAll[i].shape[0])),
+                    part[part > -1],
+                )
+            ):
+                Valid_configurations.append(i)
 
         if verbose:
             print(
@@ -537,9 +1207,6 @@ def ApplyOptimalGraphGrammarOperation(
             )
         if Valid_configurations == []:
             return "failed operation"
-    #     NodePositionArrayAll = NodePositionArrayAll[...,Valid_configurations]
-    #     ElasticMatricesAll = ElasticMatricesAll[...,Valid_configurations]
-    #     AdjustVectAll = AdjustVectAll[Valid_configurations]
 
     if AdjustElasticMatrix:
         for i in Valid_configurations:
@@ -547,236 +1214,161 @@ def ApplyOptimalGraphGrammarOperation(
                 ElasticMatricesAll[i], AdjustVectAll[i]
             )
 
-    if n_cores > 1 and len(Valid_configurations) // (MinParOp + 1) > 1:
-
-        #             X_remote, X_shape, SquaredX_remote, SquaredX_shape = multiproc_shared_variables
-        #             ####### Multiprocessing
-        #             with Pool(processes=n_cores,
-        #                       initializer=init_worker,
-        #                       initargs=(X_remote,
-        #                                 X_shape,
-        #                                 SquaredX_remote,
-        #                                 SquaredX_shape,
-        #                                 NodePositionsArrayAll,
-        #                                 ElasticMatricesAll,
-        #                                 MaxNumberOfIterations,
-        #                                 TrimmingRadius,
-        #                                 eps,
-        #                                 Mode,
-        #                                 FinalEnergy,
-        #                                 alpha,
-        #                                 beta,
-        #                                 EmbPointProb,
-        #                                 DisplayWarnings,
-        #                                 None,
-        #                                 MaxBlockSize,
-        #                                 False)) as pool:
-
-        #                 results = pool.map(proxy_multiproc,Valid_configurations)
-
-        with mp.Pool(n_cores) as pool:
-            if Xcp is None:
-                results = pool.map(
-                    proxy,
-                    [
-                        dict(
-                            X=X,
-                            NodePositions=NodePositionsArrayAll[i],
-                            ElasticMatrix=ElasticMatricesAll[i],
-                            MaxNumberOfIterations=MaxNumberOfIterations,
-                            eps=eps,
-                            Mode=Mode,
-                            FinalEnergy=FinalEnergy,
-                            alpha=alpha,
-                            beta=beta,
-                            prob=EmbPointProb,
-                            DisplayWarnings=DisplayWarnings,
-                            PointWeights=None,
-                            MaxBlockSize=MaxBlockSize,
-                            verbose=False,
-                            TrimmingRadius=TrimmingRadius,
-                            SquaredX=SquaredX,
-                        )
-                        for i in Valid_configurations
-                    ],
-                )
-            else:
-                results = pool.map(
-                    proxy_cp,
-                    [
-                        dict(
-                            X=X,
-                            NodePositions=NodePositionsArrayAll[i],
-                            ElasticMatrix=ElasticMatricesAll[i],
-                            MaxNumberOfIterations=MaxNumberOfIterations,
-                            eps=eps,
-                            Mode=Mode,
-                            FinalEnergy=FinalEnergy,
-                            alpha=alpha,
-                            beta=beta,
-                            prob=EmbPointProb,
-                            DisplayWarnings=DisplayWarnings,
-                            PointWeights=None,
-                            MaxBlockSize=MaxBlockSize,
-                            verbose=False,
-                            TrimmingRadius=TrimmingRadius,
-                            SquaredX=SquaredX,
-                            Xcp=Xcp,
-                            SquaredXcp=SquaredXcp,
-                        )
-                        for i in Valid_configurations
-                    ],
-                )
+    Candidates = dict(
+        NodePositions=[NodePositionsArrayAll[i] for i in Valid_configurations],
+        ElasticMatrices=[ElasticMatricesAll[i] for i in Valid_configurations],
+        AdjustVects=[AdjustVectAll[i] for i in Valid_configurations],
+        Operations=[OperationsAll[i] for i in Valid_configurations],
+    )
+    if NodeMaps:
+        Candidates.update(
+            NodeStats=NodeStats,
+            Touched=[TouchedAll[i] for i in Valid_configurations],
+            Retained=[RetainedAll[i] for i in Valid_configurations],
+        )
+    return Candidates
 
-        list_energies = [r[1] for r in results]
-        idx = list_energies.index(min(list_energies))
-        NewNodePositions, minEnergy, partition, Dist, MSE, EP, RP = results[idx]
-        AdjustVect = AdjustVectAll[idx]
-        NewElasticMatrix = ElasticMatricesAll[idx]
-
-        ########################
-
-        ######### Ray multiprocessing
-    #             ray.init(num_cpus=n_cores)
-    #             Xrm = ray.put(X)
-    #             SquaredXrm=ray.put(SquaredX)
-    #             NodePositionsArrayAllrm = ray.put(NodePositionsArrayAll)
-    #             ElasticMatricesAllrm = ray.put(ElasticMatricesAll)
-    #             MaxNumberOfIterationsrm = ray.put(MaxNumberOfIterations)
-    #             epsrm = ray.put(eps)
-    #             Moderm= ray.put(Mode)
-    #             FinalEnergyrm= ray.put(FinalEnergy)
-    #             alpharm= ray.put(alpha)
-    #             betarm= ray.put(beta)
-    #             EmbPointProbrm= ray.put(EmbPointProb)
-    #             DisplayWarningsrm= ray.put(DisplayWarnings)
-    #             MaxBlockSizerm= ray.put(MaxBlockSize)
-    #             TrimmingRadiusrm= ray.put(TrimmingRadius)
-    #             result_ids = [ray_PrimitiveElasticGraphEmbedment.remote(Xrm,
-    #                                                NodePositionsArrayAllrm[i],
-    #                                                ElasticMatricesAll[i], MaxNumberOfIterationsrm, epsrm,
-    #                                                Mode=Moderm, FinalEnergy=FinalEnergyrm,
-    #                                                alpha=alpharm,beta=betarm,prob=EmbPointProbrm,
-    #                                                DisplayWarnings=DisplayWarningsrm,
-    #                                                PointWeights=None,
-    #                                                MaxBlockSize=MaxBlockSizerm,
-    #                                                verbose=False,
-    #                                                TrimmingRadius=TrimmingRadiusrm, SquaredX=SquaredXrm) for i in Valid_configurations]
-
-    #             result_ids = [ray_PrimitiveElasticGraphEmbedment.remote(X,
-    #                                                NodePositionsArrayAll[i],
-    #                                                ElasticMatricesAll[i], MaxNumberOfIterations, eps,
-    #                                                Mode=Mode, FinalEnergy=FinalEnergy,
-    #                                                alpha=alpha,beta=beta,prob=EmbPointProb,
-    #                                                DisplayWarnings=DisplayWarnings,
-    #                                                PointWeights=None,
-    #                                                MaxBlockSize=MaxBlockSize,
-    #                                                verbose=False,
-    #                                                TrimmingRadius=TrimmingRadius, SquaredX=SquaredX) for i in Valid_configurations]
-
-    #             resultlist = ray.get([i[1] for i in result_ids])
-    #             idx = resultlist.index(min(resultlist))
-    #             NewNodePositions, minEnergy, partition, Dist, MSE, EP, RP = ray.get(result_ids[idx])
-    #             AdjustVect = AdjustVectAll[idx]
-    #             NewElasticMatrix = ElasticMatricesAll[idx]
-    #             ray.shutdown()
-    #########################
 
+def EmbedmentParameters(
+    MaxNumberOfIterations=100,
+    eps=0.01,
+    Mode=1,
+    FinalEnergy="Base",
+    alpha=1,
+    beta=1,
+    EmbPointProb=1,
+    DisplayWarnings=True,
+    MaxBlockSize=100000000,
+    TrimmingRadius=float("inf"),
+    SquaredX=None,
+    PartitionStrategy="exact",
+    InitPartition=None,
+    Xcp=None,
+    SquaredXcp=None,
+    PointWeights=None,
+    Solver="dense",
+    PartitionKernel="numpy",
+):
+    """
+    # Keyword arguments of PrimitiveElasticGraphEmbedment (or PrimitiveElasticGraphEmbedment_cp
+    # if Xcp is given) shared by all the candidates of a grammar application
+    """
+    Parameters = dict(
+        MaxNumberOfIterations=MaxNumberOfIterations,
+        eps=eps,
+        Mode=Mode,
+        FinalEnergy=FinalEnergy,
+        alpha=alpha,
+        beta=beta,
+        prob=EmbPointProb,
+        DisplayWarnings=DisplayWarnings,
+        PointWeights=PointWeights,
+        MaxBlockSize=MaxBlockSize,
+        verbose=False,
+        TrimmingRadius=TrimmingRadius,
+        SquaredX=SquaredX,
+    )
+    if Xcp is None:
+        Parameters.update(
+            PartitionStrategy=PartitionStrategy,
+            InitPartition=InitPartition,
+            Solver=Solver,
+            PartitionKernel=PartitionKernel,
+        )
     else:
-        minEnergy = np.inf
+        Parameters.update(Xcp=Xcp, SquaredXcp=SquaredXcp)
+    return Parameters
 
-        if Xcp is None:
-            for i in Valid_configurations:
-                # TODO add pointweights ?
-                (
-                    nodep,
-                    ElasticEnergy,
-                    part,
-                    dist,
-                    mse,
-                    ep,
-                    rp,
-                ) = PrimitiveElasticGraphEmbedment(
-                    X,
-                    NodePositionsArrayAll[i],
-                    ElasticMatricesAll[i],
-                    MaxNumberOfIterations,
-                    eps,
-                    Mode=Mode,
-                    FinalEnergy=FinalEnergy,
-                    alpha=alpha,
-                    beta=beta,
-                    prob=EmbPointProb,
-                    DisplayWarnings=DisplayWarnings,
-                    PointWeights=None,
-                    MaxBlockSize=MaxBlockSize,
-                    verbose=False,
-                    TrimmingRadius=TrimmingRadius,
-                    SquaredX=SquaredX,
-                )
 
-                if ElasticEnergy < minEnergy:
-                    NewNodePositions = nodep
-                    NewElasticMatrix = ElasticMatricesAll[i]
-                    partition = part
-                    AdjustVect = AdjustVectAll[i]
-                    minEnergy = ElasticEnergy
-                    MSE = mse
-                    EP = ep
-                    RP = rp
-                    Dist = dist
+def CandidatePartition(partition, Touched, Retained):
+    """
+    # Start partition of the graph-guided partition (see PartitionDataGraph) of a candidate: the
+    # partition of the parent graph with the parent nodes renumbered as in the candidate (Touched and
+    # Retained are the node maps of the candidate, see GraphGrammarOperation). The points of a parent
+    # node that is not retained start from the first retained node of Touched (the neighbour of a
+    # removed leaf, the node an edge is shrunk into)
+    """
+    Retained = np.asarray(Retained)
+    Kept = np.where(Retained >= 0)[0]
+    # the candidate only appends nodes to the parent graph
+    if len(Kept) < len(Retained) and np.array_equal(Retained[Kept], Kept):
+        return partition
 
-        else:
-            for i in Valid_configurations:
-                # TODO add pointweights ?
-                (
-                    nodep,
-                    ElasticEnergy,
-                    part,
-                    dist,
-                    mse,
-                    ep,
-                    rp,
-                ) = PrimitiveElasticGraphEmbedment_cp(
-                    X,
-                    NodePositionsArrayAll[i],
-                    ElasticMatricesAll[i],
-                    MaxNumberOfIterations,
-                    eps,
-                    Mode=Mode,
-                    FinalEnergy=FinalEnergy,
-                    alpha=alpha,
-                    beta=beta,
-                    prob=EmbPointProb,
-                    DisplayWarnings=DisplayWarnings,
-                    PointWeights=None,
-                    MaxBlockSize=MaxBlockSize,
-                    verbose=False,
-                    TrimmingRadius=TrimmingRadius,
-                    SquaredX=SquaredX,
-                    Xcp=Xcp,
-                    SquaredXcp=SquaredXcp,
-                )
+    NewIndex = np.full(max(Retained.max(), partition.max(), max(Touched)) + 1, -1)
+    NewIndex[Retained[Kept]] = Kept
+    Survivors = [NewIndex[t] for t in Touched if NewIndex[t] >= 0]
+    NewIndex[NewIndex < 0] = Survivors[0] if len(Survivors) > 0 else -1
+    return np.where(partition >= 0, NewIndex[partition], -1)
 
-                if ElasticEnergy < minEnergy:
-                    NewNodePositions = nodep
-                    NewElasticMatrix = ElasticMatricesAll[i]
-                    partition = part
-                    AdjustVect = AdjustVectAll[i]
-                    minEnergy = ElasticEnergy
-                    MSE = mse
-                    EP = ep
-                    RP = rp
-                    Dist = dist
+
+def CandidateParameters(Parameters, Candidates, i):
+    """
+    # Keyword arguments of the embedment of the candidate i: Parameters (see EmbedmentParameters)
+    # with the start partition of the parent graph renumbered for the candidate (see CandidatePartition).
+    # Without node maps, the start partition is dropped
+    """
+    if Parameters.get("InitPartition") is None:
+        return Parameters
+    if "Retained" not in Candidates:
+        return dict(Parameters, InitPartition=None)
+    return dict(
+        Parameters,
+        InitPartition=CandidatePartition(
+            Parameters["InitPartition"],
+            Candidates["Touched"][i],
+            Candidates["Retained"][i],
+        ),
+    )
+
+
+def SelectOptimalCandidate(results):
+    """
+    # Index of the embedded candidate with the minimal elastic energy
+    # (the first one in case of ties, candidates whose result is None are ignored)
+    """
+    list_energies = [np.inf if r is None else r[1] for r in results]
+    return list_energies.index(min(list_energies))
+
+
+def OptimalGraph(
+    X,
+    Candidates,
+    result,
+    idx,
+    MaxBlockSize=100000000,
+    SquaredX=None,
+    TrimmingRadius=float("inf"),
+    Xcp=None,
+    SquaredXcp=None,
+    PartData=None,
+):
+    """
+    # Graph structure returned by a grammar application, built from the embedment
+    # result of the optimal candidate idx
+    """
+    NewNodePositions, minEnergy, partition, Dist, MSE, EP, RP = result
+
+    # partition of the data on the optimal graph, reused by the next grammar
+    # application and by the reports (the partition returned by the embedment
+    # refers to the node positions before the last fit)
+    if PartData is None and Xcp is None:
+        PartData = PartitionData(
+            X, NewNodePositions, MaxBlockSize, SquaredX, TrimmingRadius
+        )
+    elif PartData is None:
+        PartData = PartitionData_cp(
+            Xcp, NewNodePositions, MaxBlockSize, SquaredXcp, TrimmingRadius
+        )
 
     return dict(
         NodePositions=NewNodePositions,
-        ElasticMatrix=NewElasticMatrix,
+        ElasticMatrix=Candidates["ElasticMatrices"][idx],
         ElasticEnergy=minEnergy,
         MSE=MSE,
         EP=EP,
         RP=RP,
-        AdjustVect=AdjustVect,
+        AdjustVect=Candidates["AdjustVects"][idx],
         Dist=Dist,
+        PartData=PartData,
+        Operation=Candidates["Operations"][idx],
     )
-
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+def MakeGrammarCache(KHops=2, MaxAge=10):
+    """
+    #' Create the cross-step cache of the candidate energies used by the lazy-greedy grammar optimization
+    #'
+    #' The nodes of the graph receive identifiers that are kept across grammar applications, and each candidate
+    #' is identified by its operation and the identifiers of the nodes it is applied to. The cache stores the
+    #' energy change of each evaluated candidate with respect to its parent graph. After each application, the
+    #' entries of the candidates within KHops edges of the nodes modified by the optimal operation are removed.
+    #'
+    #' @param KHops integer, radius (in edges) of the region invalidated around the optimal operation
+    #' @param MaxAge integer, number of grammar applications after which a cached energy change is re-evaluated
+    #'
+    #' @return a dict describing the cache
+    """
+    return dict(
+        Entries={},
+        KHops=KHops,
+        MaxAge=MaxAge,
+        NextID=0,
+        Step=0,
+        Candidates=0,
+        Evaluated=0,
+    )
+
+
+def GrammarCacheReport(GrammarCache):
+    """
+    # Number of candidates generated and embedded over all the grammar applications
+    """
+    return dict(
+        Candidates=GrammarCache["Candidates"],
+        Evaluated=GrammarCache["Evaluated"],
+        EvaluatedFraction=GrammarCache["Evaluated"] / GrammarCache["Candidates"]
+        if GrammarCache["Candidates"] > 0
+        else np.nan,
+    )
+
+
+def NewNodeIDs(GrammarCache, n):
+    NodeIDs = np.arange(GrammarCache["NextID"], GrammarCache["NextID"] + n)
+    GrammarCache["NextID"] += n
+    return NodeIDs
+
+
+def GrammarCacheKeys(Candidates, NodeIDs):
+    """
+    # Keys (operation, identifiers of the nodes the operation is applied to) of the candidates
+    # returned by GenerateGraphGrammarCandidates with NodeMaps=True
+    """
+    return [
+        (Operation, tuple(sorted(NodeIDs[list(Touched)])))
+        for Operation, Touched in zip(Candidates["Operations"], Candidates["Touched"])
+    ]
+
+
+def CachedDeltas(GrammarCache, Keys):
+    """
+    # Cached energy change of the candidates, as a dict {candidate index: delta}
+    """
+    Cached = {}
+    for i, Key in enumerate(Keys):
+        Entry = GrammarCache["Entries"].get(Key)
+        if Entry is not None and GrammarCache["Step"] - Entry[1] <= GrammarCache["MaxAge"]:
+            Cached[i] = Entry[0]
+    return Cached
+
+
+def UpdateGrammarCache(
+    GrammarCache, Keys, results, ParentEnergy, Candidates, idx, NodeIDs
+):
+    """
+    # Store the energy changes of the evaluated candidates (results[i] is None if candidate i
+    # was not evaluated) with respect to ParentEnergy, invalidate the region modified by the optimal candidate idx
+    # and return the node identifiers of the optimal graph
+    """
+    Evaluated = [i for i in range(len(results)) if results[i] is not None]
+    # energy changes can only be cached relative to a known energy
+    if ParentEnergy is not None:
+        for i in Evaluated:
+            GrammarCache["Entries"][Keys[i]] = (
+                results[i][1] - ParentEnergy,
+                GrammarCache["Step"],
+            )
+    GrammarCache["Candidates"] += len(Keys)
+    GrammarCache["Evaluated"] += len(Evaluated)
+    GrammarCache["Step"] += 1
+
+    Retained = Candidates["Retained"][idx]
+    New = Retained < 0
+    NewIDs = np.empty(len(Retained), dtype=int)
+    NewIDs[~New] = NodeIDs[Retained[~New]]
+    NewIDs[New] = NewNodeIDs(GrammarCache, New.sum())
+
+    # nodes of the optimal graph within KHops edges of the modified ones
+    Adjacency = Candidates["ElasticMatrices"][idx] > 0
+    np.fill_diagonal(Adjacency, False)
+    Region = New | np.isin(Retained, Candidates["Touched"][idx])
+    for k in range(GrammarCache["KHops"]):
+        Region = Region | Adjacency[Region].any(axis=0)
+    RegionIDs = set(NewIDs[Region]) | set(NodeIDs[list(Candidates["Touched"][idx])])
+
+    GrammarCache["Entries"] = {
+        Key: Entry
+        for Key, Entry in GrammarCache["Entries"].items()
+        if RegionIDs.isdisjoint(Key[1])
+    }
+
+    return NewIDs
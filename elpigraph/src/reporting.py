@@ -1,6 +1,9 @@
 import numpy as np
+import hashlib
+import igraph
 from .core import DecodeElasticMatrix, PartitionData
 from .distutils import ComputePrimitiveGraphElasticEnergy
+from .autotune import TunedBlockSize
 
 def getPrimitiveGraphStructureBarCode(ElasticMatrix):
     #Mus = ElasticMatrix.diagonal()
@@ -20,7 +23,20 @@ def getPrimitiveGraphStructureBarCode(ElasticMatrix):
     return code
                          
 
-def project_point_onto_graph(X, NodePositions, Edges, Partition = None):
+def getPrimitiveGraphTopologyKey(ElasticMatrix):
+    '''
+    #' Key identifying the topology of a graph: its barcode and a hash of its edge set with the nodes
+    #' in canonical order (igraph canonical_permutation). Isomorphic graphs have the same key
+    '''
+    Edges = np.array(np.triu(ElasticMatrix, 1).nonzero()).T
+    Permutation = igraph.Graph(n=ElasticMatrix.shape[0], edges=Edges.tolist()).canonical_permutation()
+    Edges = np.sort(np.argsort(Permutation)[Edges], axis=1)
+    Edges = Edges[np.lexsort(Edges.T[::-1])]
+    return (getPrimitiveGraphStructureBarCode(ElasticMatrix),
+            hashlib.sha1(np.ascontiguousarray(Edges, dtype=np.int64).tobytes()).hexdigest())
+
+
+def project_point_onto_graph(X, NodePositions, Edges, Partition = None, SquaredX = None):
     '''                           
     #' Project data points on the precipal graph
     #'
@@ -31,6 +47,7 @@ def project_point_onto_graph(X, NodePositions, Edges, Partition = None):
     #' match the rows of NodePositions
     #' @param Partition a Partition vector associating points to at most one of the nodes of the graph.
     #' It can be NULL, in which case it will be computed by the algorithm
+    #' @param SquaredX rowSums(X^2), used if Partition has to be computed. If NULL, it will be computed
     #'
     #' @return A list with several elements:
     #' \itemize{
@@ -53,7 +70,9 @@ def project_point_onto_graph(X, NodePositions, Edges, Partition = None):
     #' @examples
     '''
     if Partition is None:
-        Partition = PartitionData(X, NodePositions, MaxBlockSize, SquaredX=np.sum(X**2,axis=1,keepdims=1))[0]
+        if SquaredX is None:
+            SquaredX = np.sum(X**2,axis=1,keepdims=1)
+        Partition = PartitionData(X, NodePositions, TunedBlockSize(), SquaredX=SquaredX)[0]
 
     X_projected = np.zeros(X.shape)
     ProjectionValues = np.array([np.inf]*len(X))
@@ -139,7 +158,7 @@ def project_point_onto_edge(X, NodePositions, Edge, ExtProj = False):
 
 
 
-def ReportOnPrimitiveGraphEmbedment(X, NodePositions, ElasticMatrix, PartData=None, ComputeMSEP = False):
+def ReportOnPrimitiveGraphEmbedment(X, NodePositions, ElasticMatrix, PartData=None, ComputeMSEP = False, TotalVariance = None):
     ''' 
     # %   This function computes various measurements concerning a primitive
     # %   graph embedment
@@ -168,6 +187,9 @@ def ReportOnPrimitiveGraphEmbedment(X, NodePositions, ElasticMatrix, PartData=No
     # %           URN is UR * nodes
     # %           URN2 is UR * nodes^2
     # %           URSD is standard deviation of UR
+    # %
+    # %   TotalVariance (sum of the variances of the columns of X) can be
+    # %   given to avoid computing it at each report
     '''
     Mus = ElasticMatrix.diagonal()
     Lambda = ElasticMatrix.copy()
@@ -178,13 +200,14 @@ def ReportOnPrimitiveGraphEmbedment(X, NodePositions, ElasticMatrix, PartData=No
     counts = np.bincount(Connectivities)[1:]
     DecodedMat = DecodeElasticMatrix(ElasticMatrix)
 
-    TotalVariance = np.sum(np.var(X,axis=0,ddof=1))
+    if TotalVariance is None:
+        TotalVariance = np.sum(np.var(X,axis=0,ddof=1))
     BARCODE = getPrimitiveGraphStructureBarCode(ElasticMatrix)
 
     if PartData is None:
         PartData = PartitionData(X = X, 
                                  NodePositions = NodePositions,
-                                 MaxBlockSize = 1000000,
+                                 MaxBlockSize = TunedBlockSize(),
                                  SquaredX= np.sum(X**2,axis=1,keepdims=1))
 
 
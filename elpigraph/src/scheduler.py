@@ -0,0 +1,164 @@
+import os
+import numpy as np
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# cost model of the candidate embedments, see PlanEmbedments
+FLOPS = 2e9  # distance computations (multiply-adds) per second on one core
+EXPECTED_ITERATIONS = 5  # EM iterations of an embedment
+WORKER_START_TIME = 0.05  # seconds to start a worker process
+TRANSFER_RATE = 1e9  # bytes per second sent to a worker process
+
+
+def AvailableCores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def LimitBLASThreads(Threads):
+    """
+    # Limit the number of threads of the BLAS libraries of the current process, e.g. in the initializer of a
+    # worker process so that n workers do not each start one BLAS thread per core. This requires threadpoolctl
+    # (without it, the plans have no BLASThreads)
+    """
+    if Threads is None or threadpool_limits is None:
+        return
+    threadpool_limits(limits=Threads, user_api="blas")
+
+
+def _BLASThreads(Workers):
+    # the available cores divided among the workers, None if the BLAS threads cannot be limited
+    if threadpool_limits is None:
+        return None
+    return max(1, AvailableCores() // Workers)
+
+
+def WorkerMemory(X, NumNodes, MaxBlockSize=100000000, SharedX=False):
+    """
+    #' Estimated memory used by a worker embedding graphs on X
+    #'
+    #' @param X numerical 2D matrix, the n-by-m data matrix
+    #' @param NumNodes integer, number of nodes of the graphs
+    #' @param MaxBlockSize integer, number of points of the distance blocks of PartitionData
+    #' @param SharedX boolean, is X shared with the worker (see ExecutorBroadcast) rather than copied?
+    #'
+    #' @return the estimated number of bytes: the copy of X (unless shared), the vectors of the points
+    #' (rowSums(X^2), partition, distances, weights), the largest distance block and the node matrices
+    """
+    n, m = X.shape
+    Bytes = (
+        4 * n * 8
+        + min(n, MaxBlockSize) * NumNodes * 8
+        + 4 * NumNodes * max(NumNodes, m) * 8
+    )
+    if not SharedX:
+        Bytes += n * m * 8
+    return Bytes
+
+
+def _MemoryWorkers(Workers, X, NumNodes, MemoryBudget, MaxBlockSize, SharedX):
+    # largest number of workers (at most Workers, at least 1) fitting in MemoryBudget
+    if MemoryBudget is None:
+        return Workers
+    Bytes = WorkerMemory(X, NumNodes, MaxBlockSize, SharedX)
+    return int(max(1, min(Workers, MemoryBudget // Bytes)))
+
+
+def PlanWorkers(X, NumNodes, nTasks, n_cores, MemoryBudget=None, MaxBlockSize=100000000):
+    """
+    #' Number of worker processes and of BLAS threads per worker for nTasks independent graph constructions
+    #' (replicas, regularization paths)
+    #'
+    #' @param X numerical 2D matrix, the n-by-m data matrix
+    #' @param NumNodes integer, number of nodes of the graphs
+    #' @param nTasks integer, number of graphs
+    #' @param n_cores integer, maximum number of workers
+    #' @param MemoryBudget numeric, memory (in bytes) available to the workers, each one holding a copy of X
+    #' (see WorkerMemory). If None, the memory is not limited
+    #' @param MaxBlockSize integer, number of points of the distance blocks of PartitionData
+    #'
+    #' @return a dict with the elements Workers and BLASThreads (the available cores divided among the workers,
+    #' None without threadpoolctl)
+    """
+    Workers = _MemoryWorkers(
+        max(1, min(n_cores, nTasks)), X, NumNodes, MemoryBudget, MaxBlockSize, False
+    )
+    return dict(Workers=Workers, BLASThreads=_BLASThreads(Workers))
+
+
+def PlanEmbedments(
+    X,
+    NumNodes,
+    nCandidates,
+    n_cores,
+    MinParOp="auto",
+    MemoryBudget=None,
+    MaxBlockSize=100000000,
+    SharedX=False,
+    CostModel=None,
+):
+    """
+    #' Decide how the candidates of a grammar application are embedded
+    #'
+    #' With MinParOp = "auto", the number of workers minimizes the estimated time of the embedments:
+    #' w * (WORKER_START_TIME + size(X) / TRANSFER_RATE) + ceiling(nCandidates / w) * t, where
+    #' t = n * NumNodes * m * EXPECTED_ITERATIONS / FLOPS is the time of one embedment (w = 1 is the serial
+    #' embedment, without any overhead). The candidates are then sent by chunks of ceiling(nCandidates / w)
+    #' so that each worker receives X once. With an integer MinParOp, the n_cores workers are used if there are
+    #' more than 2 * (MinParOp + 1) candidates. In both cases the number of workers is limited by MemoryBudget
+    #' and the available cores are divided among the workers for BLAS
+    #'
+    #' @param X numerical 2D matrix, the n-by-m data matrix
+    #' @param NumNodes integer, number of nodes of the candidates
+    #' @param nCandidates integer, number of candidates to embed
+    #' @param n_cores integer, maximum number of workers
+    #' @param MinParOp "auto" or integer, see above
+    #' @param MemoryBudget numeric, memory (in bytes) available to the workers (see WorkerMemory). If None,
+    #' the memory is not limited
+    #' @param MaxBlockSize integer, number of points of the distance blocks of PartitionData
+    #' @param SharedX boolean, is X broadcast once to the workers (see ExecutorBroadcast) rather than sent with the candidates?
+    #' @param CostModel dict with the elements FLOPS, WORKER_START_TIME and TRANSFER_RATE replacing the default constants
+    #' (e.g. measured by RunAutotune)
+    #'
+    #' @return a dict with the elements Workers (1 for a serial embedment), BLASThreads (per worker, None without threadpoolctl) and ChunkSize
+    #' (number of candidates sent at once to a worker, None for the default of multiprocessing.Pool.map)
+    """
+    if n_cores <= 1 or nCandidates < 2:
+        return dict(Workers=1, BLASThreads=None, ChunkSize=None)
+
+    if MinParOp == "auto":
+        Model = dict(
+            FLOPS=FLOPS, WORKER_START_TIME=WORKER_START_TIME, TRANSFER_RATE=TRANSFER_RATE
+        )
+        if CostModel is not None:
+            Model.update(CostModel)
+        n, m = X.shape
+        Time = n * NumNodes * m * EXPECTED_ITERATIONS / Model["FLOPS"]
+        Start = Model["WORKER_START_TIME"] + (
+            0 if SharedX else n * m * 8 / Model["TRANSFER_RATE"]
+        )
+        MaxWorkers = _MemoryWorkers(
+            min(n_cores, nCandidates), X, NumNodes, MemoryBudget, MaxBlockSize, SharedX
+        )
+        Costs = [nCandidates * Time] + [
+            w * Start + np.ceil(nCandidates / w) * Time for w in range(2, MaxWorkers + 1)
+        ]
+        Workers = int(np.argmin(Costs)) + 1
+        ChunkSize = int(np.ceil(nCandidates / Workers))
+    else:
+        Workers = n_cores if nCandidates // (MinParOp + 1) > 1 else 1
+        Workers = _MemoryWorkers(Workers, X, NumNodes, MemoryBudget, MaxBlockSize, SharedX)
+        ChunkSize = None
+
+    if Workers == 1:
+        return dict(Workers=1, BLASThreads=None, ChunkSize=None)
+    return dict(
+        Workers=Workers,
+        BLASThreads=_BLASThreads(Workers),
+        ChunkSize=ChunkSize,
+    )
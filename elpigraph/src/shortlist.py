@@ -0,0 +1,143 @@
+import numpy as np
+
+
+# Proxies of the energy decrease of the candidates -------------------------
+#
+# Computed from the statistics of the parent partition (see ComputeNodeStatistics),
+# higher values indicate more promising candidates. Touched is the list of the tuples
+# of parent nodes the operation is applied to (see GraphGrammarOperation) and nPoints
+# the number of data points (the MSE term of the energy is normalized by nPoints)
+
+
+def _EdgeTerms(NodePositions, ElasticMatrix, Touched):
+    Touched = np.array(Touched, dtype=int).reshape(len(Touched), -1)
+    a, b = Touched[:, 0], Touched[:, 1]
+    L2 = np.sum((NodePositions[a] - NodePositions[b]) ** 2, axis=1)
+    return a, b, ElasticMatrix[a, b] * L2, L2
+
+
+def AddNode2NodeProxy(NodePositions, ElasticMatrix, NodeStats, Touched, nPoints):
+    """
+    # local MSE of the node receiving the new node
+    """
+    i = np.array(Touched, dtype=int).reshape(len(Touched), -1)[:, 0]
+    return NodeStats["DistSum"][i] / nPoints
+
+
+def BisectEdgeProxy(NodePositions, ElasticMatrix, NodeStats, Touched, nPoints):
+    """
+    # stretching energy released by halving the edge
+    """
+    a, b, EdgeEnergy, L2 = _EdgeTerms(NodePositions, ElasticMatrix, Touched)
+    return EdgeEnergy / 2
+
+
+def RemoveNodeProxy(NodePositions, ElasticMatrix, NodeStats, Touched, nPoints):
+    """
+    # stretching energy of the leaf edge minus the MSE increase of moving its points to the neighbour
+    """
+    a, b, EdgeEnergy, L2 = _EdgeTerms(NodePositions, ElasticMatrix, Touched)
+    return EdgeEnergy - NodeStats["Count"][a] * L2 / nPoints
+
+
+def ShrinkEdgeProxy(NodePositions, ElasticMatrix, NodeStats, Touched, nPoints):
+    """
+    # short edges are the cheapest to contract (their nodes and points move the least)
+    """
+    a, b, EdgeEnergy, L2 = _EdgeTerms(NodePositions, ElasticMatrix, Touched)
+    return -L2
+
+
+SHORTLIST_PROXIES = dict(
+    addnode2node=AddNode2NodeProxy,
+    bisectedge=BisectEdgeProxy,
+    removenode=RemoveNodeProxy,
+    shrinkedge=ShrinkEdgeProxy,
+)
+
+
+def ShortlistCandidates(
+    Candidates, NodePositions, ElasticMatrix, nPoints, ShortlistSize=None, Proxies=None
+):
+    """
+    #' Select the candidates of a grammar application to be embedded
+    #'
+    #' The candidates of each operation are ranked by the proxy of the operation and only the best ones are kept
+    #'
+    #' @param Candidates candidates returned by GenerateGraphGrammarCandidates with NodeMaps=True
+    #' @param NodePositions, ElasticMatrix the parent graph
+    #' @param nPoints integer, number of data points
+    #' @param ShortlistSize integer (number of candidates kept for each operation) or numeric between 0 and 1
+    #' (fraction of the candidates kept for each operation). If None, all the candidates are kept
+    #' @param Proxies dict {operation: function} overriding the proxies of SHORTLIST_PROXIES. Operations
+    #' are looked up by full name (e.g., "bisectedge_3") and then by base name (e.g., "bisectedge").
+    #' The functions take (NodePositions, ElasticMatrix, NodeStats, Touched, nPoints) and return a score for each
+    #' candidate, higher values being more promising
+    #'
+    #' @return a tuple (Shortlist, Ranks) with the sorted indices of the selected candidates and the rank of each candidate
+    #' among the candidates of the same operation. A ValueError is raised if an operation has no proxy
+    """
+    if Proxies is None:
+        Proxies = {}
+    Operations = np.array(Candidates["Operations"])
+    Ranks = np.zeros(len(Operations), dtype=int)
+    Selected = np.zeros(len(Operations), dtype=bool)
+
+    for Operation in np.unique(Operations):
+        ind = np.where(Operations == Operation)[0]
+        Base = Operation.split("_")[0]
+        Proxy = (
+            Proxies.get(Operation) or Proxies.get(Base) or SHORTLIST_PROXIES.get(Base)
+        )
+        if Proxy is None:
+            raise ValueError("No shortlist proxy for the operation " + str(Operation))
+        Scores = Proxy(
+            NodePositions,
+            ElasticMatrix,
+            Candidates["NodeStats"],
+            [Candidates["Touched"][i] for i in ind],
+            nPoints,
+        )
+        Order = ind[np.argsort(-Scores, kind="stable")]
+        Ranks[Order] = np.arange(len(Order))
+
+        if ShortlistSize is None:
+            n = len(ind)
+        elif ShortlistSize < 1:
+            n = int(np.ceil(ShortlistSize * len(ind)))
+        else:
+            n = int(ShortlistSize)
+        Selected[Order[:n]] = True
+
+    return np.where(Selected)[0], Ranks
+
+
+def MakeShortlistDiagnostics():
+    """
+    # Accumulator of the offline evaluation of the shortlist: for each grammar application, all the
+    # candidates are embedded and the rank of the optimal one and whether it was shortlisted are recorded
+    """
+    return dict(Steps=0, Hits=0, Ranks=[], Operations=[])
+
+
+def UpdateShortlistDiagnostics(ShortlistDiagnostics, Candidates, Shortlist, Ranks, idx):
+    ShortlistDiagnostics["Steps"] += 1
+    ShortlistDiagnostics["Hits"] += int(idx in Shortlist)
+    ShortlistDiagnostics["Ranks"].append(int(Ranks[idx]))
+    ShortlistDiagnostics["Operations"].append(Candidates["Operations"][idx])
+
+
+def ShortlistReport(ShortlistDiagnostics):
+    """
+    # Summary of the offline evaluation: HitRate is the fraction of the grammar applications
+    # whose optimal candidate was in the shortlist
+    """
+    return dict(
+        Steps=ShortlistDiagnostics["Steps"],
+        Hits=ShortlistDiagnostics["Hits"],
+        HitRate=ShortlistDiagnostics["Hits"] / ShortlistDiagnostics["Steps"]
+        if ShortlistDiagnostics["Steps"] > 0
+        else np.nan,
+        Ranks=ShortlistDiagnostics["Ranks"],
+        Operations=ShortlistDiagnostics["Operations"],
+    )
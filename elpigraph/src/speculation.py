@@ -0,0 +1,403 @@
+import numpy as np
+import multiprocessing as mp
+
+from .core import PartitionData, PrimitiveElasticGraphEmbedment
+from .budget import BudgetRemaining, ChargeBudget
+from .grammar_operations import (
+    GenerateGraphGrammarCandidates,
+    EmbedmentParameters,
+    CandidateParameters,
+    SelectOptimalCandidate,
+    OptimalGraph,
+)
+
+# number of cancellation flags, reused as a ring by the successive batches
+NSLOTS = 4096
+
+_worker = {}
+
+
+def _InitSpeculativeWorker(X, SquaredX, Flags):
+    _worker["X"] = X
+    _worker["SquaredX"] = SquaredX
+    _worker["Flags"] = Flags
+
+
+def _SpeculativeEmbedment(Args):
+    Slot, Dict = Args
+    # a running embedment cannot be interrupted, cancelled tasks are dropped
+    # when a worker picks them up
+    if _worker["Flags"][Slot]:
+        return None
+    return PrimitiveElasticGraphEmbedment(
+        _worker["X"], SquaredX=_worker["SquaredX"], **Dict
+    )
+
+
+def MakeSpeculativeScheduler(
+    X, SquaredX, n_cores, Speculation=2, SpeculationStart=0.5
+):
+    """
+    #' Create the scheduler used for the speculative execution of the grammar applications
+    #'
+    #' The scheduler holds a pool of n_cores workers (which receive X and SquaredX once) and
+    #' the state of the speculative batches. It must be released with CloseSpeculativeScheduler
+    #'
+    #' @param X numerical 2D matrix, the n-by-m matrix with the position of n m-dimensional points
+    #' @param SquaredX rowSums(X^2)
+    #' @param n_cores integer, number of worker processes
+    #' @param Speculation integer, number of best candidates of a step on which the next step is started
+    #' @param SpeculationStart numeric between 0 and 1, fraction of the candidates of a step that must be
+    #' evaluated before the speculation is launched
+    #'
+    #' @return a dict describing the scheduler
+    """
+    Flags = mp.Array("b", NSLOTS, lock=False)
+    Pool = mp.Pool(
+        n_cores, initializer=_InitSpeculativeWorker, initargs=(X, SquaredX, Flags)
+    )
+    return dict(
+        Pool=Pool,
+        Flags=Flags,
+        NextSlot=0,
+        Speculation=Speculation,
+        SpeculationStart=SpeculationStart,
+        Pending=None,
+        Steps=0,
+        Launched=0,
+        Hits=0,
+        Cancelled=0,
+        Unsettled=[],
+    )
+
+
+def CloseSpeculativeScheduler(Scheduler):
+    Scheduler["Pool"].terminate()
+    Scheduler["Pool"].join()
+
+
+def SpeculationReport(Scheduler):
+    """
+    # Statistics of the speculative execution: number of steps for which a speculation was launched,
+    # number of speculative batches launched and cancelled, number of steps whose winner had been
+    # speculated and HitRate = Hits/Steps
+    """
+    return dict(
+        Steps=Scheduler["Steps"],
+        Launched=Scheduler["Launched"],
+        Hits=Scheduler["Hits"],
+        Cancelled=Scheduler["Cancelled"],
+        HitRate=Scheduler["Hits"] / Scheduler["Steps"]
+        if Scheduler["Steps"] > 0
+        else np.nan,
+    )
+
+
+def _SubmitBatch(
+    Scheduler, X, NodePositions, ElasticMatrix, AdjustVect, opTypes, Parameters
+):
+    """
+    # Generate the candidates obtained by applying opTypes to a graph and queue their embedment
+    """
+    PartData = PartitionData(
+        X,
+        NodePositions,
+        Parameters["MaxBlockSize"],
+        Parameters["SquaredX"],
+        Parameters["TrimmingRadius"],
+    )
+    return _QueueBatch(
+        Scheduler,
+        X,
+        NodePositions,
+        ElasticMatrix,
+        AdjustVect,
+        opTypes,
+        Parameters,
+        PartData,
+    )
+
+
+def _QueueBatch(
+    Scheduler,
+    X,
+    NodePositions,
+    ElasticMatrix,
+    AdjustVect,
+    opTypes,
+    Parameters,
+    PartData,
+):
+    Batch = dict(
+        NodePositions=NodePositions,
+        ElasticMatrix=ElasticMatrix,
+        AdjustVect=AdjustVect,
+        opTypes=opTypes,
+        PartData=PartData,
+        Slot=None,
+        Results=[],
+    )
+    Batch["Candidates"] = GenerateGraphGrammarCandidates(
+        X,
+        NodePositions,
+        ElasticMatrix,
+        opTypes,
+        AdjustVect,
+        PartData[0],
+        PartData[1],
+        SquaredX=Parameters["SquaredX"],
+        MaxBlockSize=Parameters["MaxBlockSize"],
+        TrimmingRadius=Parameters["TrimmingRadius"],
+        AvoidSolitary=Parameters["AvoidSolitary"],
+        AdjustElasticMatrix=Parameters["AdjustElasticMatrix"],
+        NodeMaps=Parameters["PartitionStrategy"] != "exact",
+    )
+    if Batch["Candidates"] == "failed operation":
+        return Batch
+
+    Slot = Scheduler["NextSlot"]
+    Scheduler["NextSlot"] = (Slot + 1) % NSLOTS
+    Scheduler["Flags"][Slot] = 0
+    Batch["Slot"] = Slot
+
+    EmbParameters = EmbedmentParameters(
+        MaxNumberOfIterations=Parameters["MaxNumberOfIterations"],
+        eps=Parameters["eps"],
+        Mode=Parameters["Mode"],
+        FinalEnergy=Parameters["FinalEnergy"],
+        alpha=Parameters["alpha"],
+        beta=Parameters["beta"],
+        EmbPointProb=Parameters["EmbPointProb"],
+        DisplayWarnings=Parameters["DisplayWarnings"],
+        MaxBlockSize=Parameters["MaxBlockSize"],
+        TrimmingRadius=Parameters["TrimmingRadius"],
+        PartitionStrategy=Parameters["PartitionStrategy"],
+        InitPartition=None
+        if Parameters["PartitionStrategy"] == "exact"
+        else PartData[0],
+        PointWeights=Parameters["PointWeights"],
+        Solver=Parameters["Solver"],
+        PartitionKernel=Parameters["PartitionKernel"],
+    )
+    # X and SquaredX are held by the workers
+    del EmbParameters["SquaredX"]
+
+    for i in range(len(Batch["Candidates"]["NodePositions"])):
+        Batch["Results"].append(
+            Scheduler["Pool"].apply_async(
+                _SpeculativeEmbedment,
+                (
+                    (
+                        Slot,
+                        dict(
+                            NodePositions=Batch["Candidates"]["NodePositions"][i],
+                            ElasticMatrix=Batch["Candidates"]["ElasticMatrices"][i],
+                            **CandidateParameters(EmbParameters, Batch["Candidates"], i)
+                        ),
+                    ),
+                ),
+            )
+        )
+    return Batch
+
+
+def _CancelBatch(Scheduler, Batch):
+    if Batch["Slot"] is not None:
+        Scheduler["Flags"][Batch["Slot"]] = 1
+        Scheduler["Unsettled"].append(Batch)
+    Scheduler["Cancelled"] += 1
+
+
+def _SettleBudget(Scheduler, Budget):
+    """
+    # Charge the embedments of the cancelled batches that ran (the tasks that were already
+    # running or picked up before the cancellation), once they are finished
+    """
+    Unsettled = []
+    for Batch in Scheduler["Unsettled"]:
+        if all(r.ready() for r in Batch["Results"]):
+            ChargeBudget(Budget, sum(r.get() is not None for r in Batch["Results"]))
+        else:
+            Unsettled.append(Batch)
+    # the batches hold arrays and cannot be compared, hence no list.remove
+    Scheduler["Unsettled"] = Unsettled
+
+
+def _MatchBatch(Batch, NodePositions, ElasticMatrix, AdjustVect, opTypes):
+    return (
+        np.array_equal(Batch["NodePositions"], NodePositions)
+        and np.array_equal(Batch["ElasticMatrix"], ElasticMatrix)
+        and np.array_equal(Batch["AdjustVect"], AdjustVect)
+        and list(Batch["opTypes"]) == list(opTypes)
+    )
+
+
+def ApplyOptimalGraphGrammarOperationSpeculative(
+    Scheduler,
+    X,
+    NodePositions,
+    ElasticMatrix,
+    opTypes,
+    AdjustVect=None,
+    NextParent=None,
+    SquaredX=None,
+    MaxBlockSize=100000000,
+    MaxNumberOfIterations=100,
+    eps=0.01,
+    TrimmingRadius=float("inf"),
+    Mode=1,
+    FinalEnergy="Base",
+    alpha=1,
+    beta=1,
+    EmbPointProb=1,
+    AvoidSolitary=False,
+    AdjustElasticMatrix=None,
+    DisplayWarnings=True,
+    PartitionStrategy="exact",
+    PartData=None,
+    PointWeights=None,
+    Solver="dense",
+    PartitionKernel="numpy",
+    Budget=None,
+):
+    """
+    #' Application of the grammar operation with speculative execution of the next step.
+    #' This in an internal function that should not be used in by the end-user
+    #'
+    #' The candidates are evaluated by the pool of the scheduler. Once a fraction SpeculationStart of them is
+    #' evaluated, the best Speculation candidates found so far are used as parents of the next grammar
+    #' application, whose candidates are queued behind the ones still running (i.e., they use the cores left idle
+    #' by the tail of the step). When the optimal candidate is known, its speculative batch (if any) is kept
+    #' and reused by the next call, the other ones are cancelled.
+    #' The result is the same as the one of ApplyOptimalGraphGrammarOperation.
+    #'
+    #' @param Scheduler the scheduler returned by MakeSpeculativeScheduler
+    #' @param NextParent function taking the NodePositions, ElasticMatrix and AdjustVect of a candidate and
+    #' returning the NodePositions, ElasticMatrix, AdjustVect and opTypes of the next grammar application
+    #' if this candidate is selected, or None if there is no next grammar application. If None, no speculation is done
+    #' @param PartData tuple (partition, dists) of the data on NodePositions. If None, it will be computed
+    #' @param Budget compute budget (see MakeBudget). All the candidates of the application are charged once they
+    #' are embedded, as are the embedments of the cancelled speculative batches that ran. No speculation is
+    #' launched when the budget cannot pay for the next application, and the pending batch is cancelled once
+    #' the budget is exhausted
+    #'
+    #' See ApplyOptimalGraphGrammarOperation for the other parameters
+    #'
+    #' @return the optimal graph (or "failed operation"), as returned by ApplyOptimalGraphGrammarOperation
+    """
+    if AdjustVect is None:
+        AdjustVect = [False] * len(NodePositions)
+
+    Parameters = dict(
+        SquaredX=SquaredX,
+        MaxBlockSize=MaxBlockSize,
+        MaxNumberOfIterations=MaxNumberOfIterations,
+        eps=eps,
+        TrimmingRadius=TrimmingRadius,
+        Mode=Mode,
+        FinalEnergy=FinalEnergy,
+        alpha=alpha,
+        beta=beta,
+        EmbPointProb=EmbPointProb,
+        AvoidSolitary=AvoidSolitary,
+        AdjustElasticMatrix=AdjustElasticMatrix,
+        DisplayWarnings=DisplayWarnings,
+        PartitionStrategy=PartitionStrategy,
+        PointWeights=PointWeights,
+        Solver=Solver,
+        PartitionKernel=PartitionKernel,
+    )
+
+    Batch = Scheduler["Pending"]
+    Scheduler["Pending"] = None
+    if Batch is not None and _MatchBatch(
+        Batch, NodePositions, ElasticMatrix, AdjustVect, opTypes
+    ):
+        Scheduler["Hits"] += 1
+    else:
+        if Batch is not None:
+            _CancelBatch(Scheduler, Batch)
+        if PartData is None:
+            Batch = _SubmitBatch(
+                Scheduler,
+                X,
+                NodePositions,
+                ElasticMatrix,
+                AdjustVect,
+                opTypes,
+                Parameters,
+            )
+        else:
+            Batch = _QueueBatch(
+                Scheduler,
+                X,
+                NodePositions,
+                ElasticMatrix,
+                AdjustVect,
+                opTypes,
+                Parameters,
+                PartData,
+            )
+
+    if Batch["Candidates"] == "failed operation":
+        return Batch["Candidates"]
+
+    Results = Batch["Results"]
+    nStart = max(1, int(np.ceil(Scheduler["SpeculationStart"] * len(Results))))
+    _SettleBudget(Scheduler, Budget)
+    # the next application is only speculated if the budget can pay for it
+    if NextParent is None or BudgetRemaining(Budget) <= len(Results):
+        Speculated = {}
+    else:
+        Speculated = None
+
+    while True:
+        Ready = [i for i in range(len(Results)) if Results[i].ready()]
+        if Speculated is None and len(Ready) >= nStart:
+            # start the next step from the best candidates evaluated so far
+            Energies = [Results[i].get()[1] for i in Ready]
+            Speculated = {}
+            for j in np.argsort(Energies, kind="stable")[: Scheduler["Speculation"]]:
+                i = Ready[j]
+                Next = NextParent(
+                    Results[i].get()[0],
+                    Batch["Candidates"]["ElasticMatrices"][i],
+                    Batch["Candidates"]["AdjustVects"][i],
+                )
+                if Next is not None:
+                    Speculated[i] = _SubmitBatch(Scheduler, X, *Next, Parameters)
+            if len(Speculated) > 0:
+                Scheduler["Steps"] += 1
+                Scheduler["Launched"] += len(Speculated)
+        if len(Ready) == len(Results):
+            break
+        Results[[i for i in range(len(Results)) if i not in Ready][0]].wait(0.01)
+
+    results = [r.get() for r in Results]
+    idx = SelectOptimalCandidate(results)
+    ChargeBudget(Budget, len(Results))
+    _SettleBudget(Scheduler, Budget)
+    Exhausted = BudgetRemaining(Budget) == 0
+
+    for i, SpeculatedBatch in Speculated.items():
+        if i == idx and not Exhausted:
+            Scheduler["Pending"] = SpeculatedBatch
+        else:
+            _CancelBatch(Scheduler, SpeculatedBatch)
+
+    # the speculative batch already holds the partition of the optimal graph
+    if Scheduler["Pending"] is not None:
+        PartData = Scheduler["Pending"]["PartData"]
+    else:
+        PartData = None
+
+    return OptimalGraph(
+        X,
+        Batch["Candidates"],
+        results[idx],
+        idx,
+        MaxBlockSize=MaxBlockSize,
+        SquaredX=SquaredX,
+        TrimmingRadius=TrimmingRadius,
+        PartData=PartData,
+    )
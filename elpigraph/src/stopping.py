@@ -0,0 +1,53 @@
+import numpy as np
+
+
+def ElbowIndex(Values):
+    """
+    # Index of the elbow of a curve, i.e. the point furthest from the chord joining its extremities
+    # (both axes being rescaled to [0, 1])
+    """
+    Values = np.asarray(Values, dtype=float)
+    if len(Values) < 3 or Values[-1] == Values[0]:
+        return 0
+    x = np.arange(len(Values)) / (len(Values) - 1)
+    y = (Values - Values[0]) / (Values[-1] - Values[0])
+    return int(np.argmax(y - x))
+
+
+def StoppingRuleFired(Rule, Values, Window=3, Threshold=0.001):
+    """
+    #' Check a stopping rule of the graph growth
+    #'
+    #' @param Rule string, the stopping rule:
+    #' \describe{
+    #'   \item{"FVE"}{the relative gain of FVE over the last Window steps is below Threshold (Values is the FVE of each step)}
+    #'   \item{"Elbow"}{the elbow of the energy curve has not moved for Window steps and is at least Window steps behind
+    #'   (Values is the ENERGY of each step)}
+    #'   \item{"HeldOut"}{the MSE of the held-out points has not decreased for Window steps (Values is the held-out MSE
+    #'   of each step)}
+    #' }
+    #' @param Values numerical vector, the monitored value after each step
+    #' @param Window integer, number of steps considered
+    #' @param Threshold numeric, threshold of the "FVE" rule
+    #'
+    #' @return boolean, should the growth stop?
+    """
+    if Rule == "FVE":
+        if len(Values) <= Window:
+            return False
+        Gain = (Values[-1] - Values[-1 - Window]) / abs(Values[-1 - Window])
+        return Gain < Threshold
+
+    elif Rule == "Elbow":
+        if len(Values) <= Window + 2:
+            return False
+        Elbows = [ElbowIndex(Values[: len(Values) - i]) for i in range(Window + 1)]
+        return len(set(Elbows)) == 1 and len(Values) - 1 - Elbows[0] >= Window
+
+    elif Rule == "HeldOut":
+        if len(Values) <= Window:
+            return False
+        return int(np.argmin(Values)) < len(Values) - Window
+
+    else:
+        raise ValueError("Stopping rule " + str(Rule) + " is not defined")
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def autotune_cache(tmp_path, monkeypatch):
+    # the tests never read nor write the autotuning cache of the user
+    CacheFile = str(tmp_path / "autotune.json")
+    monkeypatch.setenv("ELPIGRAPH_AUTOTUNE_CACHE", CacheFile)
+    return CacheFile
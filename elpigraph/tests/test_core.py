@@ -0,0 +1,796 @@
+import pytest
+import numpy as np
+import elpigraph
+from elpigraph.src.core import PartitionData, PartitionDataGraph, Encode2ElasticMatrix
+
+
+@pytest.fixture
+def data():
+    X = np.genfromtxt("./data/tree_data.csv", delimiter=",")
+    return X
+
+
+@pytest.fixture
+def tree(data):
+    return elpigraph.computeElasticPrincipalTree(data, NumNodes=30, verbose=False)[0]
+
+
+def test_partition_graph(data, tree):
+    SquaredX = (data ** 2).sum(axis=1, keepdims=True)
+    partition, dists = PartitionData(
+        data, tree["NodePositions"], 10 ** 8, SquaredX, float("inf")
+    )
+    # starting from the exact partition of slightly moved nodes
+    gpartition, gdists = PartitionDataGraph(
+        data,
+        tree["NodePositions"] + 0.01,
+        tree["ElasticMatrix"],
+        SquaredX,
+        partition,
+    )
+    epartition, edists = PartitionData(
+        data, tree["NodePositions"] + 0.01, 10 ** 8, SquaredX, float("inf")
+    )
+    assert np.mean(gpartition == epartition) > 0.99
+    assert np.all(gdists >= edists - 1e-10)
+
+    # trimmed points are restarted with an exact scan
+    gpartition, gdists = PartitionDataGraph(
+        data,
+        tree["NodePositions"],
+        tree["ElasticMatrix"],
+        SquaredX,
+        -np.ones_like(partition),
+        TrimmingRadius=0.5,
+    )
+    epartition, edists = PartitionData(
+        data, tree["NodePositions"], 10 ** 8, SquaredX, 0.5
+    )
+    assert np.array_equal(gpartition, epartition)
+    assert np.allclose(gdists, edists)
+
+
+def test_speculation(data, tree):
+    pg = elpigraph.computeElasticPrincipalTree(
+        data,
+        NumNodes=30,
+        n_cores=2,
+        MinParOp=1,
+        Speculation=2,
+        verbose=False,
+    )[0]
+    assert np.allclose(pg["NodePositions"], tree["NodePositions"])
+    assert pg["SpeculationReport"]["Launched"] > 0
+
+
+def test_speculation_cancelled(data):
+    # several cancelled batches are pending at once
+    params = dict(NumNodes=40, verbose=False)
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, n_cores=4, MinParOp=1, Speculation=3, SpeculationStart=0.2, **params
+    )[0]
+    Serial = elpigraph.computeElasticPrincipalTree(data, **params)[0]
+    assert np.allclose(pg["NodePositions"], Serial["NodePositions"])
+    assert pg["SpeculationReport"]["Cancelled"] >= 2
+
+
+def test_lazy_greedy(data, tree):
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, LazyGreedy=True, verbose=False
+    )[0]
+    assert pg["LazyGreedyReport"]["EvaluatedFraction"] < 1
+    assert np.isclose(
+        pg["FinalReport"]["ENERGY"], tree["FinalReport"]["ENERGY"], rtol=0.05
+    )
+
+
+def test_shortlist(data, tree):
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, ShortlistSize=5, ShortlistDiagnostics=True, verbose=False
+    )[0]
+    # in diagnostics mode all the candidates are embedded
+    assert np.allclose(pg["NodePositions"], tree["NodePositions"])
+    assert pg["ShortlistReport"]["Steps"] > 0
+    assert 0 <= pg["ShortlistReport"]["HitRate"] <= 1
+
+
+def test_shortlist_size(data, tree, monkeypatch):
+    import elpigraph.src.grammar_operations as grammar_operations
+    from elpigraph.src.shortlist import ShortlistCandidates
+
+    Embedments = []
+    Embed = grammar_operations.PrimitiveElasticGraphEmbedment
+
+    def CountEmbedment(*args, **kwargs):
+        Embedments.append(1)
+        return Embed(*args, **kwargs)
+
+    monkeypatch.setattr(
+        grammar_operations, "PrimitiveElasticGraphEmbedment", CountEmbedment
+    )
+    Counts = []
+    for ShortlistSize in [None, 2]:
+        del Embedments[:]
+        pg = elpigraph.computeElasticPrincipalTree(
+            data,
+            NumNodes=30,
+            ShortlistSize=ShortlistSize,
+            FastPath=False,
+            verbose=False,
+        )[0]
+        Counts.append(len(Embedments))
+    # the shortlist embeds a fraction of the candidates for a close energy
+    assert Counts[1] < Counts[0] / 4
+    assert np.isclose(
+        pg["FinalReport"]["ENERGY"], tree["FinalReport"]["ENERGY"], rtol=0.02
+    )
+
+    # proxies of the operations without a default one
+    Candidates = dict(
+        Operations=["myop", "myop", "myop"], Touched=[(0,), (1,), (2,)], NodeStats=None
+    )
+    Shortlist, Ranks = ShortlistCandidates(
+        Candidates,
+        None,
+        None,
+        1,
+        ShortlistSize=1,
+        Proxies=dict(myop=lambda NP, EM, Stats, Touched, n: np.array([0, 2, 1])),
+    )
+    assert list(Shortlist) == [1] and list(Ranks) == [2, 0, 1]
+    with pytest.raises(ValueError):
+        ShortlistCandidates(Candidates, None, None, 1, ShortlistSize=1)
+
+
+def test_stopping_rule(data, tree):
+    pg = elpigraph.computeElasticPrincipalTree(
+        data,
+        NumNodes=30,
+        StoppingRule="FVE",
+        StoppingThreshold=0.01,
+        StoreGraphEvolution=True,
+        verbose=False,
+    )[0]
+    Step = pg["StoppingReport"]["Step"]
+    assert Step is not None
+    assert pg["NodePositions"].shape[0] < 30
+    # the growth before the rule fired is the one of the full growth
+    assert pg["ReportTable"]["FVE"] == tree["ReportTable"]["FVE"][:Step]
+    assert len(pg["AllNodePositions"]) == Step
+
+
+def test_budget(data):
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, MaxEvaluations=100, verbose=False
+    )[0]
+    assert pg["BudgetReport"]["Exhausted"]
+    assert pg["BudgetReport"]["Evaluations"] == 100
+    assert pg["NodePositions"].shape[0] == pg["BudgetReport"]["NumNodes"] < 30
+    assert pg["FinalReport"]["NNODES"] == pg["BudgetReport"]["NumNodes"]
+
+
+def test_graph_steps(data):
+    Steps = elpigraph.src.BaseElPi.ElPrincGraphSteps(
+        data,
+        Lambda=0.01,
+        Mu=0.1,
+        ElasticMatrix=Encode2ElasticMatrix(np.array([[0, 1]]), 0.01, 0.1),
+        NodePositions=data[[0, 1]],
+        AdjustVect=[False, False],
+        NumNodes=10,
+        GrowGrammars=np.array([["bisectedge", "addnode2node"]]),
+        GrammarOptimization=False,
+    )
+    Snapshots = list(Steps)
+    assert [s.Step for s in Snapshots] == list(range(1, 9))
+    assert Snapshots[-1].NodePositions.shape[0] == 10
+    assert len(Snapshots[-1].Edges) == 9
+    assert not Snapshots[-1].NodePositions.flags.writeable
+
+
+def test_checkpoint(data, tree, tmp_path):
+    CheckpointFile = str(tmp_path / "checkpoint.pkl")
+    # interrupted construction, the last checkpoint is written after 10 steps
+    elpigraph.computeElasticPrincipalTree(
+        data,
+        NumNodes=30,
+        MaxEvaluations=500,
+        CheckpointFile=CheckpointFile,
+        CheckpointEvery=5,
+        verbose=False,
+    )
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, ResumeFrom=CheckpointFile, verbose=False
+    )[0]
+    assert np.array_equal(pg["NodePositions"], tree["NodePositions"])
+    assert pg["ReportTable"] == tree["ReportTable"]
+
+
+def test_parallel_replicas(data):
+    Replicas = [
+        elpigraph.computeElasticPrincipalTree(
+            data,
+            NumNodes=10,
+            nReps=2,
+            ProbPoint=0.8,
+            n_cores=2,
+            ParallelRep=ParallelRep,
+            ReplicaSeed=0,
+            verbose=False,
+        )
+        for ParallelRep in [False, True]
+    ]
+    for a, b in zip(*Replicas):
+        assert np.array_equal(a["NodePositions"], b["NodePositions"])
+
+
+def test_local_consensus(data):
+    pgs = elpigraph.computeElasticPrincipalTree(
+        data,
+        NumNodes=10,
+        nReps=3,
+        ProbPoint=0.8,
+        ConsensusMode="Local",
+        ReplicaSeed=0,
+        verbose=False,
+    )
+    assert len(pgs) == 4
+    Energies = [pg["FinalReport"]["ENERGY"] for pg in pgs[:-1]]
+    Best = pgs[int(np.argmin(Energies))]
+    assert pgs[-1]["NodePositions"].shape == Best["NodePositions"].shape
+
+
+def test_sweep(data):
+    Grid = dict(Lambda=[0.01, 0.02], Mu=[0.05, 0.1])
+    Sweep = elpigraph.sweepElasticPrincipalGraph(data, Grid, NumNodes=10)
+    Table = Sweep["Table"]
+    assert len(Table) == len(Sweep["Graphs"]) == 4
+    assert list(Table["Path"]) == [0, 0, 1, 1]
+    # the first point of a path is constructed from scratch
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=10, Lambda=0.01, Mu=0.1, verbose=False
+    )[0]
+    assert np.isclose(Table["ENERGY"][2], pg["FinalReport"]["ENERGY"], rtol=1e-12)
+    assert all(len(pg["NodePositions"]) == 10 for pg in Sweep["Graphs"])
+
+
+def test_sweep_warm_start(data):
+    Grid = dict(Lambda=[0.001, 0.01, 0.1])
+    Scratch = [
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=30, Lambda=Lambda, verbose=False
+        )[0]["FinalReport"]["ENERGY"]
+        for Lambda in Grid["Lambda"]
+    ]
+    # by default every point of the path is constructed from scratch
+    Table = elpigraph.sweepElasticPrincipalGraph(data, Grid, NumNodes=30)["Table"]
+    assert np.allclose(Table["ENERGY"].astype(float), Scratch, rtol=1e-12)
+    # the warm-started points keep the topology of the previous point
+    Table = elpigraph.sweepElasticPrincipalGraph(
+        data, Grid, WarmStart=True, NumNodes=30
+    )["Table"]
+    Energies = Table["ENERGY"].astype(float)
+    assert np.isclose(Energies[0], Scratch[0], rtol=1e-12)
+    assert all(Energies[1:] > np.array(Scratch[1:]))
+
+
+def test_many(data):
+    Datasets = [data[::2], np.zeros((1, 2)), data[1::2]]
+    Many = [
+        elpigraph.computeElasticPrincipalGraphMany(
+            Datasets, n_cores=n_cores, Seed=0, NumNodes=10
+        )
+        for n_cores in [1, 2]
+    ]
+    for Result in Many:
+        assert Result["Graphs"][1] is None and Result["Errors"][1] is not None
+        assert Result["Errors"][0] is None and Result["Errors"][2] is None
+    for a, b in zip(Many[0]["Graphs"][::2], Many[1]["Graphs"][::2]):
+        assert np.array_equal(a[0]["NodePositions"], b[0]["NodePositions"])
+
+
+def test_many_plan(data, monkeypatch):
+    import elpigraph._batch as batch
+    from elpigraph.src.scheduler import PlanWorkers
+
+    Executors = []
+    MakeExecutor = batch.MakeExecutor
+
+    def RecordExecutor(*args, **kwargs):
+        Executors.append((args, kwargs))
+        return MakeExecutor(*args, **kwargs)
+
+    monkeypatch.setattr(batch, "MakeExecutor", RecordExecutor)
+    Datasets = [data[::2], data[1::2], data[:100]]
+    Result = elpigraph.computeElasticPrincipalGraphMany(Datasets, n_cores=2, NumNodes=10)
+    assert all(Error is None for Error in Result["Errors"])
+    # the pool and its BLAS threads are planned for the largest dataset
+    Plan = PlanWorkers(data[::2], 10, 3, 2)
+    assert Executors == [
+        (("multiprocessing", Plan["Workers"]), dict(BLASThreads=Plan["BLASThreads"]))
+    ]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        dict(),
+        dict(TrimmingRadius=0.6, Mode=2, FinalEnergy="Penalized", alpha=0.01, beta=0.03),
+    ],
+)
+def test_fast_path(data, params):
+    pgs = [
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=20, FastPath=FastPath, verbose=False, **params
+        )[0]
+        for FastPath in [False, True]
+    ]
+    assert np.allclose(pgs[0]["NodePositions"], pgs[1]["NodePositions"])
+    assert pgs[0]["ReportTable"] == pgs[1]["ReportTable"]
+    with pytest.raises(ValueError):
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=20, FastPath=True, LazyGreedy=True, verbose=False
+        )
+
+
+@pytest.mark.parametrize("Backend", ["serial", "multiprocessing", "dask"])
+def test_executor(data, Backend):
+    if Backend == "dask":
+        pytest.importorskip("distributed")
+    params = dict(NumNodes=10, MinParOp=1, FastPath=False, verbose=False)
+    pg = elpigraph.computeElasticPrincipalTree(data, **params)[0]
+    Executor = elpigraph.MakeExecutor(Backend, n_cores=2)
+    try:
+        pg_exec = elpigraph.computeElasticPrincipalTree(
+            data, Executor=Executor, **params
+        )[0]
+        # X and SquaredX are broadcast once for all the grammar applications
+        assert Executor["nBroadcasts"] == (Backend != "serial")
+        assert Executor["Broadcasts"] == {}
+        replicas = elpigraph.computeElasticPrincipalTree(
+            data, nReps=2, ReplicaSeed=0, Executor=Executor, **params
+        )
+    finally:
+        elpigraph.CloseExecutor(Executor)
+    assert np.allclose(pg["NodePositions"], pg_exec["NodePositions"])
+    reference = elpigraph.computeElasticPrincipalTree(
+        data, nReps=2, ReplicaSeed=0, ParallelRep=False, **params
+    )
+    for a, b in zip(replicas, reference):
+        assert np.allclose(a["NodePositions"], b["NodePositions"])
+
+
+def test_scheduler(data):
+    from elpigraph.src.scheduler import PlanEmbedments, WorkerMemory
+
+    # a few small embedments are not worth starting processes
+    assert PlanEmbedments(data, 10, 20, n_cores=4)["Workers"] == 1
+    X = np.zeros((200000, 50))
+    Plan = PlanEmbedments(X, 50, 100, n_cores=4)
+    assert Plan["Workers"] == 4 and Plan["ChunkSize"] == 25
+    # the memory budget limits the number of processes
+    Budget = 2.5 * WorkerMemory(X, 50)
+    assert PlanEmbedments(X, 50, 100, n_cores=4, MemoryBudget=Budget)["Workers"] == 2
+    # integer MinParOp: n_cores processes if there are enough candidates
+    assert PlanEmbedments(data, 10, 50, n_cores=4, MinParOp=20)["Workers"] == 4
+    assert PlanEmbedments(data, 10, 40, n_cores=4, MinParOp=20)["Workers"] == 1
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=10, n_cores=2, FastPath=False, verbose=False
+    )[0]
+    pg_serial = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=10, FastPath=False, verbose=False
+    )[0]
+    assert np.allclose(pg["NodePositions"], pg_serial["NodePositions"])
+
+
+def test_scheduler_without_threadpoolctl(monkeypatch):
+    from elpigraph.src import scheduler
+
+    monkeypatch.setattr(scheduler, "threadpool_limits", None)
+    X = np.zeros((200000, 50))
+    # the BLAS threads of the workers cannot be limited
+    assert scheduler.PlanEmbedments(X, 50, 100, n_cores=4)["BLASThreads"] is None
+    assert scheduler.PlanWorkers(X, 50, 4, n_cores=4)["BLASThreads"] is None
+    scheduler.LimitBLASThreads(1)
+
+
+def test_autotune(data, autotune_cache):
+    from elpigraph.src.autotune import GetAutotune, MachineKey, TunedBlockSize
+    from elpigraph.src.core import ComputeSpringLaplacianMatrix
+    from elpigraph.src.distutils import FitGraph2DataGivenPartition
+    import json
+    import os
+
+    # the benchmarks are only run on request
+    elpigraph.computeElasticPrincipalTree(data, NumNodes=5, verbose=False)
+    TunedBlockSize()
+    assert not os.path.exists(autotune_cache)
+
+    CacheFile = autotune_cache
+    Configuration = GetAutotune(CacheFile=CacheFile)
+    with open(CacheFile) as f:
+        assert json.load(f)[MachineKey()] == Configuration
+    assert set(Configuration) == {"MaxBlockSize", "NumbaPartitionMaxDim", "Solver", "CostModel"}
+
+    # the tuned kernels and solvers give the same results as the default ones
+    SquaredX = (data ** 2).sum(axis=1, keepdims=True)
+    NodePositions = data[:20]
+    partition, dists = PartitionData(data, NodePositions, 100000000, SquaredX)
+    partition_nb, dists_nb = PartitionData(
+        data, NodePositions, 1000, SquaredX, Kernel="numba"
+    )
+    assert np.array_equal(partition, partition_nb) and np.allclose(dists, dists_nb)
+    ElasticMatrix = Encode2ElasticMatrix(
+        np.array([[i, i + 1] for i in range(19)]), 0.01, 0.1
+    )
+    SpringLaplacianMatrix = ComputeSpringLaplacianMatrix(ElasticMatrix)
+    PointWeights = np.ones((len(data), 1))
+    Dense = FitGraph2DataGivenPartition(
+        data, PointWeights, SpringLaplacianMatrix, partition, "dense"
+    )
+    for Solver in ["sparse", "banded", [[0, "dense"], [10, "banded"]]]:
+        assert np.allclose(
+            Dense,
+            FitGraph2DataGivenPartition(
+                data, PointWeights, SpringLaplacianMatrix, partition, Solver
+            ),
+        )
+
+    pgs = [
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=20, Autotune=Autotune, FastPath=False, verbose=False
+        )[0]
+        for Autotune in [False, True]
+    ]
+    assert np.allclose(pgs[0]["NodePositions"], pgs[1]["NodePositions"])
+
+
+def test_randomized_pca(data):
+    from elpigraph.src.PCA import PCA, RandomizedPCA
+
+    rs = np.random.RandomState(0)
+    X = rs.randn(300, 5).dot(rs.randn(5, 200)) + 0.01 * rs.randn(300, 200)
+    vglobal, PCAData, explainedVariances = PCA(X)
+    v, P, e = RandomizedPCA(X, VarianceFraction=0.9)
+    k = np.min(np.where(np.cumsum(explainedVariances) / explainedVariances.sum() >= 0.9)) + 1
+    assert len(e) == k
+    assert np.allclose(e, explainedVariances[:k])
+    assert np.allclose(np.abs(v), np.abs(vglobal[:, :k]))
+    assert np.allclose(np.abs(P), np.abs(PCAData[:, :k]))
+    # many components: exact thin SVD
+    v, P, e = RandomizedPCA(X, n_components=250)
+    assert len(e) == 200 and np.allclose(e, explainedVariances)
+
+    pgs = [
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=10, ReduceDimension=0.9, PCAAlgorithm=PCAAlgorithm, verbose=False
+        )[0]
+        for PCAAlgorithm in ["full", "randomized"]
+    ]
+    assert np.allclose(pgs[0]["NodePositions"], pgs[1]["NodePositions"])
+
+
+def test_preprocessing_cache(data, tmp_path):
+    from elpigraph.src.datacontext import CachedPreprocessing, PreprocessingCacheReport
+
+    params = dict(NumNodes=10, ReduceDimension=0.9, verbose=False)
+    elpigraph.ClearPreprocessingCache()
+    try:
+        pg = elpigraph.computeElasticPrincipalTree(data, **params)[0]
+        # the PCA of a copy of the data is taken from the cache
+        pg_cached = elpigraph.computeElasticPrincipalTree(data.copy(), **params)[0]
+        Report = PreprocessingCacheReport()
+        assert Report["Hits"] >= 1 and Report["Entries"] >= 1
+        assert np.array_equal(pg["NodePositions"], pg_cached["NodePositions"])
+        # the cached arrays are shared by the callers, hence read-only
+        Value = CachedPreprocessing("0", ("Test",), lambda: (np.zeros(3), np.ones(2)))
+        assert CachedPreprocessing("0", ("Test",), None) is Value
+        assert not any(v.flags.writeable for v in Value)
+
+        # on-disk tier, shared with a new process (emulated by clearing the memory)
+        elpigraph.ConfigurePreprocessingCache(Directory=str(tmp_path))
+        elpigraph.computeElasticPrincipalTree(data + 1, **params)
+        assert len(list(tmp_path.glob("*.pkl"))) >= 1
+        elpigraph.ClearPreprocessingCache()
+        elpigraph.computeElasticPrincipalTree(data + 1, **params)
+        assert PreprocessingCacheReport()["DiskHits"] >= 1
+        elpigraph.ClearPreprocessingCache()
+        CachedPreprocessing("0", ("Test",), lambda: (np.zeros(3), np.ones(2)))
+        elpigraph.ClearPreprocessingCache()
+        Value = CachedPreprocessing("0", ("Test",), None)
+        assert not any(v.flags.writeable for v in Value)
+        # size-based eviction
+        elpigraph.ConfigurePreprocessingCache(Directory=str(tmp_path), MaxDisk=0)
+        elpigraph.computeElasticPrincipalTree(data + 2, **params)
+        assert len(list(tmp_path.glob("*.pkl"))) == 0
+    finally:
+        elpigraph.ConfigurePreprocessingCache()
+        elpigraph.ClearPreprocessingCache()
+
+
+def test_candidate_partition(data, tree):
+    from elpigraph.src.grammar_operations import (
+        ApplyOptimalGraphGrammarOperation,
+        CandidatePartition,
+        GenerateGraphGrammarCandidates,
+    )
+
+    SquaredX = (data ** 2).sum(axis=1, keepdims=True)
+    NodePositions, ElasticMatrix = tree["NodePositions"], tree["ElasticMatrix"]
+    AdjustVect = [False] * len(NodePositions)
+    partition, dists = PartitionData(
+        data, NodePositions, 10 ** 8, SquaredX, float("inf")
+    )
+    for op in ["removenode", "shrinkedge", "addnode2node", "bisectedge"]:
+        Candidates = GenerateGraphGrammarCandidates(
+            data,
+            NodePositions,
+            ElasticMatrix,
+            [op],
+            AdjustVect,
+            partition,
+            dists,
+            SquaredX=SquaredX,
+            NodeMaps=True,
+        )
+        for Touched, Retained, CandidatePositions, CandidateMatrix in zip(
+            Candidates["Touched"],
+            Candidates["Retained"],
+            Candidates["NodePositions"],
+            Candidates["ElasticMatrices"],
+        ):
+            start = CandidatePartition(partition, Touched, Retained)
+            assert start.min() >= 0 and start.max() < len(CandidatePositions)
+            # the points of the retained nodes keep their node
+            Moved = ~np.isin(partition, Retained)
+            assert np.array_equal(Retained[start[~Moved]], partition[~Moved])
+            # the points of a removed or merged node start from its retained neighbour
+            Survivor = [t for t in Touched if t in Retained][0]
+            assert np.all(Retained[start[Moved]] == Survivor)
+            gpartition, gdists = PartitionDataGraph(
+                data, CandidatePositions, CandidateMatrix, SquaredX, start
+            )
+            epartition, edists = PartitionData(
+                data, CandidatePositions, 10 ** 8, SquaredX, float("inf")
+            )
+            assert np.mean(gpartition == epartition) > 0.99
+
+    Results = [
+        ApplyOptimalGraphGrammarOperation(
+            data,
+            NodePositions,
+            ElasticMatrix,
+            ["removenode", "shrinkedge"],
+            AdjustVect=AdjustVect,
+            SquaredX=SquaredX,
+            PartitionStrategy=Strategy,
+        )
+        for Strategy in ["exact", "graph"]
+    ]
+    assert np.allclose(Results[0]["NodePositions"], Results[1]["NodePositions"])
+    assert np.allclose(Results[0]["ElasticMatrix"], Results[1]["ElasticMatrix"])
+
+
+def test_graph_partition_exact_scan(data, tree):
+    from elpigraph.src.core import PrimitiveElasticGraphEmbedment
+
+    SquaredX = (data ** 2).sum(axis=1, keepdims=True)
+    params = dict(eps=1, SquaredX=SquaredX)
+    Exact = PrimitiveElasticGraphEmbedment(
+        data, tree["NodePositions"], tree["ElasticMatrix"], **params
+    )
+    # a wrong starting partition and a single EM iteration: the exact scan done at
+    # convergence recovers the exact embedment
+    Graph = PrimitiveElasticGraphEmbedment(
+        data,
+        tree["NodePositions"],
+        tree["ElasticMatrix"],
+        PartitionStrategy="graph",
+        BeamWidth=1,
+        InitPartition=np.zeros((len(data), 1), dtype=int),
+        **params
+    )
+    assert np.array_equal(Exact[2], Graph[2])
+    assert np.allclose(Exact[0], Graph[0])
+    assert np.isclose(Exact[1], Graph[1])
+
+
+def test_screening(data, tree):
+    Energy = tree["FinalReport"]["ENERGY"]
+    # screening on at least all the points, or keeping all the candidates, is the exact search
+    for Parameters in [
+        dict(ScreeningSize=len(data)),
+        dict(ScreeningSize=10 * len(data)),
+        dict(ScreeningSize=100, ScreeningFinalists=1000),
+    ]:
+        pg = elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=30, verbose=False, **Parameters
+        )[0]
+        assert np.array_equal(pg["NodePositions"], tree["NodePositions"])
+    # within 2% of the exact search on a fifth of the points
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, ScreeningSize=100, verbose=False
+    )[0]
+    assert len(pg["NodePositions"]) == 30
+    assert pg["FinalReport"]["ENERGY"] <= 1.02 * Energy
+
+
+def test_multiresolution(data, tree):
+    Energy = tree["FinalReport"]["ENERGY"]
+    # levels larger than the data are ignored
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, MultiresolutionLevels=[10 * len(data)], verbose=False
+    )[0]
+    assert np.array_equal(pg["NodePositions"], tree["NodePositions"])
+    assert pg["MultiresolutionLevels"] == [len(data)]
+
+    # within 5% of the direct fit
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, MultiresolutionLevels=[100, 300], verbose=False
+    )[0]
+    assert pg["MultiresolutionLevels"] == [100, 300, len(data)]
+    assert len(pg["NodePositions"]) == 30
+    assert pg["FinalReport"]["ENERGY"] <= 1.05 * Energy
+
+    # coarse level with fewer points than nodes: the refit keeps the nodes,
+    # the repair step brings the energy within 50% of the direct fit
+    for Steps, Tolerance in [(0, np.inf), (1, 1.5)]:
+        pg = elpigraph.computeElasticPrincipalTree(
+            data,
+            NumNodes=30,
+            MultiresolutionLevels=[20],
+            MultiresolutionSteps=Steps,
+            verbose=False,
+        )[0]
+        assert len(pg["NodePositions"]) == 30
+        assert np.all(np.isfinite(pg["NodePositions"]))
+        assert pg["FinalReport"]["ENERGY"] <= Tolerance * Energy
+
+
+def test_growth_batch(data, tree):
+    Energy = tree["FinalReport"]["ENERGY"]
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, GrowthBatch=1, verbose=False
+    )[0]
+    assert np.array_equal(pg["NodePositions"], tree["NodePositions"])
+    # batches larger than the number of nodes still to be added do not overshoot NumNodes
+    for NumNodes in [7, 30]:
+        for Parameters in [
+            dict(GrowthBatch=4),
+            dict(GrowthBatch=100, GrowthBatchAdaptive=False),
+        ]:
+            pg = elpigraph.computeElasticPrincipalTree(
+                data, NumNodes=NumNodes, verbose=False, **Parameters
+            )[0]
+            assert len(pg["NodePositions"]) == NumNodes
+            if NumNodes == 30:
+                assert pg["FinalReport"]["ENERGY"] <= 1.05 * Energy
+
+
+def test_topology_memo(data, tree):
+    from elpigraph.src.reporting import getPrimitiveGraphTopologyKey
+
+    # the key does not depend on the numbering of the nodes
+    Permutation = np.random.RandomState(0).permutation(30)
+    ElasticMatrix = tree["ElasticMatrix"]
+    Permuted = ElasticMatrix[np.ix_(Permutation, Permutation)]
+    assert getPrimitiveGraphTopologyKey(ElasticMatrix) == getPrimitiveGraphTopologyKey(
+        Permuted
+    )
+    Path = Encode2ElasticMatrix(np.array([[0, 1], [1, 2], [2, 3]]), 1, 0)
+    Star = Encode2ElasticMatrix(np.array([[0, 1], [0, 2], [0, 3]]), 1, 0)
+    assert getPrimitiveGraphTopologyKey(Path) != getPrimitiveGraphTopologyKey(Star)
+
+    pg = elpigraph.fineTuneBR(
+        data,
+        MaxSteps=30,
+        NumNodes=30,
+        InitNodePositions=tree["NodePositions"],
+        InitEdges=tree["Edges"][0],
+        TopologyMemo=True,
+        verbose=False,
+    )[0]
+    Report = pg["TopologyMemoReport"]
+    assert Report["CycleLength"] is not None and Report["AvoidedSteps"] > 0
+    assert all(
+        set(v) == {"Step", "Energy", "Operations"} for v in Report["Memo"].values()
+    )
+    # the lowest-energy embedment of the cycle is returned
+    Steps = [v["Step"] for v in Report["Memo"].values()]
+    FirstStep = max(Steps) + 1 - Report["CycleLength"]
+    Cycle = [v["Energy"] for v in Report["Memo"].values() if v["Step"] >= FirstStep]
+    assert pg["FinalReport"]["ENERGY"] <= min(Cycle) + 1e-12
+
+
+def test_speculation_budget(data):
+    pg = elpigraph.computeElasticPrincipalTree(
+        data,
+        NumNodes=30,
+        n_cores=2,
+        MinParOp=1,
+        Speculation=2,
+        MaxEvaluations=50,
+        verbose=False,
+    )[0]
+    # the speculative applications are charged and the growth stops with the budget
+    Report = pg["BudgetReport"]
+    assert Report["Exhausted"]
+    assert 50 <= Report["Evaluations"] < 100
+    assert len(pg["NodePositions"]) < 30
+
+
+def test_gpu_defaults(data, tree, monkeypatch):
+    try:
+        import cupy
+    except ImportError:
+        # numpy stands in for cupy
+        import types
+
+        cupy = types.ModuleType("cupy")
+        cupy.__dict__.update(np.__dict__)
+        cupy.asnumpy = np.asarray
+        for Module in [
+            "elpigraph._BaseElPiWrapper",
+            "elpigraph.src.BaseElPi",
+            "elpigraph.src.core",
+            "elpigraph.src.PCA",
+        ]:
+            monkeypatch.setattr(Module + ".cupy", cupy, raising=False)
+    # ParallelRep="auto" falls back to the serial construction on the GPU
+    pg = elpigraph.computeElasticPrincipalTree(
+        data, NumNodes=30, GPU=True, verbose=False
+    )[0]
+    assert np.allclose(pg["NodePositions"], tree["NodePositions"])
+    with pytest.raises(ValueError):
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=30, GPU=True, ParallelRep=True, verbose=False
+        )
+
+
+def test_local_consensus_weights(data):
+    Subsets = [np.array([0, 1]), np.array([1, 2])]
+    Graphs = elpigraph.computeElasticPrincipalTree(
+        data,
+        NumNodes=10,
+        nReps=2,
+        ProbPoint=0.8,
+        Subsets=Subsets,
+        ConsensusMode="Local",
+        ReplicaSeed=0,
+        verbose=False,
+    )
+    # each node is weighted by its points among all the points of its subset
+    Weights = []
+    for G in Graphs[:-1]:
+        X = data[:, Subsets[G["SubSetID"]]]
+        partition = PartitionData(
+            X, G["NodePositions"], 10 ** 8, (X ** 2).sum(axis=1, keepdims=True)
+        )[0]
+        Weights.append(
+            np.bincount(partition.ravel(), minlength=len(G["NodePositions"]))
+        )
+    assert np.array_equal(Graphs[-1]["ConsensusWeights"], np.concatenate(Weights))
+    assert Graphs[-1]["ConsensusWeights"].sum() == len(Subsets) * 2 * len(data)
+
+
+def test_fastpath_n_cores(data, monkeypatch):
+    import elpigraph.src.BaseElPi as BaseElPi
+
+    Calls = []
+    FastApplyGrammar = BaseElPi.FastApplyGrammar
+    monkeypatch.setattr(
+        BaseElPi,
+        "FastApplyGrammar",
+        lambda *args, **kwargs: Calls.append(1) or FastApplyGrammar(*args, **kwargs),
+    )
+    # "auto" keeps an explicit n_cores > 1, FastPath=True overrides it
+    for n_cores, FastPath, Compiled in [
+        (1, "auto", True),
+        (2, "auto", False),
+        (2, True, True),
+    ]:
+        del Calls[:]
+        elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=10, n_cores=n_cores, FastPath=FastPath, verbose=False
+        )
+        assert (len(Calls) > 0) == Compiled
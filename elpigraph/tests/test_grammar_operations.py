@@ -0,0 +1,253 @@
+import pytest
+import numpy as np
+import elpigraph
+from elpigraph.src.core import PartitionData, DecodeElasticMatrix2, Encode2ElasticMatrix
+from elpigraph.src.grammar_operations import (
+    AddNode2Node,
+    BisectEdge,
+    RemoveNode,
+    ShrinkEdge,
+)
+
+
+@pytest.fixture
+def data():
+    X = np.genfromtxt("./data/tree_data.csv", delimiter=",")
+    return X
+
+
+@pytest.fixture
+def tree(data):
+    return elpigraph.computeElasticPrincipalTree(data, NumNodes=30, verbose=False)[0]
+
+
+# Loop implementations of the grammar operations the vectorized ones are checked against
+
+
+def LoopAddNode2Node(X, NodePositions, ElasticMatrix, partition, Max_K=float("inf")):
+    nNodes = NodePositions.shape[0]
+    Mus = ElasticMatrix.diagonal()
+    Lambda = ElasticMatrix.copy()
+    np.fill_diagonal(Lambda, 0)
+    indL = Lambda > 0
+    Connectivities = indL.sum(axis=0)
+    assoc = np.bincount(partition[partition > -1].ravel(), minlength=nNodes)
+
+    if not np.isinf(Max_K):
+        Degree = np.sum(ElasticMatrix > 0, axis=1)
+        Degree[Degree > 1] = Degree[Degree > 1] - 1
+        if np.sum(Degree <= Max_K) > 1:
+            idx_nodes = np.where(Degree <= Max_K)[0]
+        else:
+            raise ValueError("AddNode2Node impossible with the current parameters!")
+    else:
+        idx_nodes = np.arange(nNodes)
+
+    NodePositionsArray, ElasticMatrices = [], []
+    for i in idx_nodes:
+        NP = np.vstack((NodePositions, np.zeros((1, NodePositions.shape[1]))))
+        EM = np.zeros((nNodes + 1, nNodes + 1))
+        EM[:nNodes, :nNodes] = Lambda
+        MuProt = np.append(Mus, 0.0)
+        EM[nNodes, i] = EM[i, nNodes] = Lambda[i, indL[i]].mean()
+        if Connectivities[i] == 1:
+            ineighbour = np.nonzero(indL[i])[0][0]
+            NP[nNodes] = 2 * NodePositions[i] - NodePositions[ineighbour]
+            MuProt[nNodes] = Mus[ineighbour]
+        elif assoc[i] == 0:
+            NP[nNodes] = NodePositions[indL[:, i]].mean(axis=0)
+        else:
+            NP[nNodes] = X[(partition == i).ravel()].mean(axis=0)
+        np.fill_diagonal(EM, MuProt)
+        NodePositionsArray.append(NP)
+        ElasticMatrices.append(EM)
+    return NodePositionsArray, ElasticMatrices
+
+
+def LoopBisectEdge(NodePositions, ElasticMatrix, Min_K=1):
+    Mus = ElasticMatrix.diagonal()
+    Edges = DecodeElasticMatrix2(ElasticMatrix)[0]
+    nNodes = NodePositions.shape[0]
+    Degree = np.bincount(Edges.flatten())
+
+    NodePositionsArray, ElasticMatrices = [], []
+    for a, b in Edges:
+        if max(Degree[a], Degree[b]) < Min_K:
+            continue
+        NP = np.vstack((NodePositions, (NodePositions[a] + NodePositions[b]) / 2))
+        EM = np.zeros((nNodes + 1, nNodes + 1))
+        EM[:nNodes, :nNodes] = ElasticMatrix
+        Lambda = ElasticMatrix[a, b]
+        EM[a, b] = EM[b, a] = 0
+        EM[a, nNodes] = EM[nNodes, a] = EM[b, nNodes] = EM[nNodes, b] = Lambda
+        if Mus[a] > 0 and Mus[b] > 0:
+            EM[nNodes, nNodes] = (Mus[a] + Mus[b]) / 2
+        else:
+            EM[nNodes, nNodes] = max(Mus[a], Mus[b])
+        NodePositionsArray.append(NP)
+        ElasticMatrices.append(EM)
+    return NodePositionsArray, ElasticMatrices
+
+
+def LoopRemoveNode(NodePositions, ElasticMatrix):
+    Lambda = ElasticMatrix.copy()
+    np.fill_diagonal(Lambda, 0)
+    Connectivities = (Lambda > 0).sum(axis=0)
+    nNodes = ElasticMatrix.shape[0]
+
+    NodePositionsArray, ElasticMatrices = [], []
+    for i in range(nNodes):
+        if Connectivities[i] == 1:
+            newInds = np.delete(np.arange(nNodes), i)
+            NodePositionsArray.append(NodePositions[newInds])
+            ElasticMatrices.append(ElasticMatrix[np.ix_(newInds, newInds)])
+    return NodePositionsArray, ElasticMatrices
+
+
+def LoopShrinkEdge(NodePositions, ElasticMatrix, Min_K=1):
+    Mus = ElasticMatrix.diagonal()
+    Lambda = ElasticMatrix.copy()
+    np.fill_diagonal(Lambda, 0)
+    Connectivities = (Lambda > 0).sum(axis=0)
+    nNodes = NodePositions.shape[0]
+
+    NodePositionsArray, ElasticMatrices = [], []
+    for a, b in zip(*np.triu(ElasticMatrix, 1).nonzero()):
+        Degree = (Connectivities[a], Connectivities[b])
+        if min(Degree) <= 1 or max(Degree) < Min_K:
+            continue
+        em = ElasticMatrix.copy()
+        em[a] = np.maximum(Lambda[a], Lambda[b])
+        em[:, a] = np.maximum(Lambda[:, a], Lambda[:, b])
+        em[a, a] = (Mus[a] + Mus[b]) / 2
+        nodep = NodePositions.copy()
+        nodep[a] = (nodep[a] + nodep[b]) / 2
+        newInds = np.delete(np.arange(nNodes), b)
+        NodePositionsArray.append(nodep[newInds])
+        ElasticMatrices.append(em[np.ix_(newInds, newInds)])
+    return NodePositionsArray, ElasticMatrices
+
+
+def RandomTree(rng, nNodes, Shape="random"):
+    if Shape == "path":
+        Parents = np.arange(nNodes - 1)
+    elif Shape == "star":
+        Parents = np.zeros(nNodes - 1, dtype=int)
+    else:
+        Parents = np.array([rng.integers(i + 1) for i in range(nNodes - 1)])
+    Edges = np.vstack((Parents, np.arange(1, nNodes))).T
+    ElasticMatrix = Encode2ElasticMatrix(
+        Edges, rng.uniform(0.5, 2, len(Edges)), rng.uniform(0, 1, nNodes)
+    )
+    # some stars with a zero elasticity
+    ElasticMatrix[np.diag_indices(nNodes)] *= rng.uniform(size=nNodes) > 0.3
+    return rng.normal(size=(nNodes, 3)), ElasticMatrix
+
+
+def AssertSameCandidates(Candidates, Reference):
+    assert len(Candidates[0]) == len(Reference[0])
+    for NP, EM, RefNP, RefEM in zip(Candidates[0], Candidates[1], *Reference):
+        assert np.allclose(NP, RefNP)
+        assert np.allclose(EM, RefEM)
+
+
+@pytest.mark.parametrize(
+    "nNodes,Shape",
+    [
+        (2, "path"),
+        (3, "path"),
+        (8, "path"),
+        (6, "star"),
+        (12, "random"),
+        (40, "random"),
+    ],
+)
+def test_grammar_operations(nNodes, Shape):
+    rng = np.random.default_rng(nNodes)
+    NodePositions, ElasticMatrix = RandomTree(rng, nNodes, Shape)
+    X = rng.normal(size=(200, 3))
+    SquaredX = (X ** 2).sum(axis=1, keepdims=True)
+    partition = PartitionData(X, NodePositions, 10 ** 8, SquaredX, 1.0)[0]
+    AdjustVect = [False] * nNodes
+
+    for Max_K in [float("inf"), 1, 2]:
+        try:
+            Reference = LoopAddNode2Node(
+                X, NodePositions, ElasticMatrix, partition, Max_K
+            )
+        except ValueError:
+            with pytest.raises(ValueError):
+                AddNode2Node(
+                    X, NodePositions, ElasticMatrix, partition, AdjustVect, Max_K
+                )
+            continue
+        AssertSameCandidates(
+            AddNode2Node(X, NodePositions, ElasticMatrix, partition, AdjustVect, Max_K),
+            Reference,
+        )
+    for Min_K in [1, 2, 3]:
+        AssertSameCandidates(
+            BisectEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K),
+            LoopBisectEdge(NodePositions, ElasticMatrix, Min_K),
+        )
+        AssertSameCandidates(
+            ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, Min_K),
+            LoopShrinkEdge(NodePositions, ElasticMatrix, Min_K),
+        )
+    AssertSameCandidates(
+        RemoveNode(NodePositions, ElasticMatrix, AdjustVect),
+        LoopRemoveNode(NodePositions, ElasticMatrix),
+    )
+
+
+def test_node_maps():
+    rng = np.random.default_rng(0)
+    NodePositions, ElasticMatrix = RandomTree(rng, 20)
+    X = rng.normal(size=(200, 3))
+    partition = PartitionData(
+        X, NodePositions, 10 ** 8, (X ** 2).sum(axis=1, keepdims=True), 1.0
+    )[0]
+    AdjustVect = [False] * 20
+    for Operation in [
+        AddNode2Node(
+            X, NodePositions, ElasticMatrix, partition, AdjustVect, 2, NodeMaps=True
+        ),
+        BisectEdge(NodePositions, ElasticMatrix, AdjustVect, 3, NodeMaps=True),
+        RemoveNode(NodePositions, ElasticMatrix, AdjustVect, NodeMaps=True),
+        ShrinkEdge(NodePositions, ElasticMatrix, AdjustVect, NodeMaps=True),
+    ]:
+        NodePositionsArray, _, _, Touched, Retained = Operation
+        assert len(Touched) == len(Retained) == len(NodePositionsArray)
+        for NP, Nodes, Parent in zip(NodePositionsArray, Touched, Retained):
+            # the untouched nodes keep their position
+            Kept = (Parent >= 0) & ~np.isin(Parent, Nodes)
+            assert np.array_equal(NP[Kept], NodePositions[Parent[Kept]])
+
+
+def test_alter_structure_partition(data, tree):
+    PartData = dict(PartData=tree["PartData"], SquaredX=tree["SquaredX"])
+    for PD in [{}, PartData]:
+        np.random.seed(0)
+        Extended = elpigraph.ExtendLeaves(data, tree, DoSA=False, **PD)
+        Collapsed = elpigraph.CollapseBranches(data, tree, ControlPar=50, **PD)
+        Shifted = elpigraph.ShiftBranching(data, tree, **PD)
+        if PD:
+            assert np.array_equal(Extended["NodePositions"], Reference[0])
+            assert np.array_equal(Collapsed["Nodes"], Reference[1])
+            assert np.array_equal(Shifted["NodePositions"], Reference[2])
+        Reference = (
+            Extended["NodePositions"],
+            Collapsed["Nodes"],
+            Shifted["NodePositions"],
+        )
+
+
+def test_data_context_reuse(data, tree):
+    DataContext = elpigraph.MakeDataContext(data)
+    for i in range(2):
+        pg = elpigraph.computeElasticPrincipalTree(
+            data, NumNodes=30, DataContext=DataContext, verbose=False
+        )[0]
+        assert np.array_equal(pg["NodePositions"], tree["NodePositions"])
+        assert pg["FinalReport"]["ENERGY"] == tree["FinalReport"]["ENERGY"]
+    elpigraph.CloseDataContext(DataContext)
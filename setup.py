@@ -49,6 +49,7 @@ setup(
         "python_igraph >=0.7.1",
         "networkx >=2.0",
         "matplotlib",
+        "threadpoolctl >=2.0.0",
     ],
     project_urls={  # Optional
         "Bug Reports": "https://github.com/j-bac/elpigraph-python/issues",